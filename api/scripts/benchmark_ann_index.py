@@ -0,0 +1,113 @@
+"""近似最近邻索引的召回率/延迟基准测试
+
+在合成语料上对比平坦索引与 sq8 / pq / ivf_flat / ivf_sq8 / ivf_pq / hnsw 的构建耗时、
+单条查询延迟、recall@k 和每个向量的内存占用，帮助选择 nlist / nprobe / efSearch 等参数。
+
+用法:
+    poetry run python scripts/benchmark_ann_index.py --size 100000 --queries 500
+"""
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.rag.faiss_document_store import (
+    create_faiss_index,
+    estimate_index_bytes,
+    TRAINED_INDEX_TYPES
+)
+
+def make_corpus(size: int, dimension: int, clusters: int = 256, seed: int = 42,
+                sample_seed: int = 0) -> np.ndarray:
+    """生成带聚类结构的合成向量，近似真实嵌入的分布
+
+    相同 seed 共享聚类中心，sample_seed 不同则采样出不同的点（用于生成查询）。
+    """
+    centers = np.random.default_rng(seed).standard_normal((clusters, dimension)).astype("float32")
+    rng = np.random.default_rng(sample_seed)
+    assignments = rng.integers(0, clusters, size)
+    vectors = centers[assignments] + 0.3 * rng.standard_normal((size, dimension)).astype("float32")
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors
+
+def recall_at_k(ground_truth: np.ndarray, results: np.ndarray) -> float:
+    """计算 recall@k：近似结果命中精确 top-k 的比例"""
+    hits = sum(
+        len(set(truth) & set(found))
+        for truth, found in zip(ground_truth, results)
+    )
+    return hits / ground_truth.size
+
+def run_config(name: str, index_type: str, params: dict, corpus: np.ndarray,
+               queries: np.ndarray, ground_truth: np.ndarray, top_k: int) -> dict:
+    index = create_faiss_index(index_type, corpus.shape[1], **params)
+
+    start = time.perf_counter()
+    if index_type in TRAINED_INDEX_TYPES:
+        index.train(corpus)
+    index.add(corpus)
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    results = np.empty((len(queries), top_k), dtype="int64")
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        _, indices = index.search(query.reshape(1, -1), top_k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results[i] = indices[0]
+
+    return {
+        "name": name,
+        "build_s": build_seconds,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "recall": recall_at_k(ground_truth, results),
+        "bytes_per_vector": estimate_index_bytes(index) / index.ntotal
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="FAISS 索引召回率/延迟基准测试")
+    parser.add_argument("--size", type=int, default=100000, help="语料向量数")
+    parser.add_argument("--dimension", type=int, default=384, help="向量维度")
+    parser.add_argument("--queries", type=int, default=200, help="查询数")
+    parser.add_argument("--top-k", type=int, default=10, help="recall@k 中的 k")
+    parser.add_argument("--nlist", type=int, default=1024, help="IVF 聚类中心数")
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.size, args.dimension)
+    queries = make_corpus(args.queries, args.dimension, sample_seed=7)
+
+    # 平坦索引的结果作为精确基准
+    flat = create_faiss_index("l2", args.dimension)
+    flat.add(corpus)
+    _, ground_truth = flat.search(queries, args.top_k)
+
+    configs = [
+        ("flat", "l2", {}),
+        ("sq8", "sq8", {}),
+        ("pq m=48", "pq", {"pq_m": 48})
+    ]
+    for nprobe in (1, 8, 32):
+        configs.append((f"ivf_flat nprobe={nprobe}", "ivf_flat",
+                        {"nlist": args.nlist, "nprobe": nprobe}))
+    configs.append((f"ivf_sq8 nprobe=32", "ivf_sq8", {"nlist": args.nlist, "nprobe": 32}))
+    for nprobe in (8, 32):
+        configs.append((f"ivf_pq m=48 nprobe={nprobe}", "ivf_pq",
+                        {"nlist": args.nlist, "nprobe": nprobe, "pq_m": 48}))
+    for ef_search in (16, 64, 128):
+        configs.append((f"hnsw M=32 efSearch={ef_search}", "hnsw",
+                        {"hnsw_m": 32, "ef_search": ef_search}))
+
+    print(f"语料: {args.size} x {args.dimension}, 查询: {args.queries}, k={args.top_k}")
+    print(f"{'配置':<28}{'构建(s)':>10}{'p50(ms)':>10}{'p99(ms)':>10}{'recall':>10}{'字节/向量':>12}")
+    for name, index_type, params in configs:
+        result = run_config(name, index_type, params, corpus, queries, ground_truth, args.top_k)
+        print(f"{result['name']:<28}{result['build_s']:>10.2f}{result['p50_ms']:>10.3f}"
+              f"{result['p99_ms']:>10.3f}{result['recall']:>10.3f}{result['bytes_per_vector']:>12.0f}")
+    print("注: 字节/向量在数值上等于每百万向量的索引内存（MB）")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""嵌入后端基准测试
+
+对比 PyTorch SentenceTransformer 与 ONNX Runtime（fp32 / int8 量化）后端的编码吞吐量，
+并以 PyTorch 的结果为基准计算每条文本向量的余弦相似度（平均值和最小值），
+用于确认 ONNX 后端产生的向量与原模型等价。需要先运行 scripts/export_onnx_model.py。
+
+用法:
+    poetry run python scripts/benchmark_embedding_backends.py --texts 2000 --batch-size 64
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.rag.embedding_backends import (
+    ONNXEmbeddingBackend,
+    default_onnx_model_dir,
+    ONNX_QUANTIZED_MODEL_FILE
+)
+
+def make_texts(count: int, seed: int = 0) -> list:
+    """生成长度不一的中英文混合文本，近似真实文档块"""
+    rng = np.random.default_rng(seed)
+    words = [
+        "信号", "滤波器", "频谱", "采样", "噪声", "功率", "相位", "调制", "卷积", "傅里叶变换",
+        "signal", "filter", "spectrum", "sampling", "noise", "power", "phase", "FFT", "window", "gain"
+    ]
+    return [
+        " ".join(rng.choice(words, size=rng.integers(5, 120)))
+        for _ in range(count)
+    ]
+
+def measure(backend, texts: list, batch_size: int, repeats: int):
+    backend.encode(texts[:batch_size], batch_size=batch_size)  # 预热
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        embeddings = backend.encode(texts, batch_size=batch_size)
+        best = min(best, time.perf_counter() - start)
+    return np.asarray(embeddings, dtype="float32"), len(texts) / best
+
+def cosine_agreement(reference: np.ndarray, embeddings: np.ndarray) -> dict:
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    embeddings = embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+    cosines = (reference * embeddings).sum(axis=1)
+    return {"mean": float(cosines.mean()), "min": float(cosines.min())}
+
+def main():
+    parser = argparse.ArgumentParser(description="嵌入后端吞吐量与一致性基准测试")
+    parser.add_argument("--model", default="paraphrase-MiniLM-L3-v2")
+    parser.add_argument("--cache-dir", default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache"
+    ))
+    parser.add_argument("--model-dir", help="ONNX 模型目录，默认 <cache-dir>/onnx/<模型名>")
+    parser.add_argument("--texts", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, help="ONNX Runtime 线程数")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    from sentence_transformers import SentenceTransformer
+
+    texts = make_texts(args.texts)
+    model_dir = args.model_dir or default_onnx_model_dir(args.model, args.cache_dir)
+    backends = {
+        "pytorch": SentenceTransformer(args.model, device="cpu", cache_folder=args.cache_dir),
+        "onnx": ONNXEmbeddingBackend(model_dir, threads=args.threads)
+    }
+    if os.path.exists(os.path.join(model_dir, ONNX_QUANTIZED_MODEL_FILE)):
+        backends["onnx_int8"] = ONNXEmbeddingBackend(model_dir, quantized=True, threads=args.threads)
+
+    results = {}
+    reference = None
+    for name, backend in backends.items():
+        embeddings, throughput = measure(backend, texts, args.batch_size, args.repeats)
+        if reference is None:
+            reference = embeddings
+        results[name] = {"texts_per_sec": throughput, "cosine": cosine_agreement(reference, embeddings)}
+
+    print(f"模型: {args.model}, 文本数: {args.texts}, 批大小: {args.batch_size}")
+    print(f"{'后端':<12}{'吞吐(条/s)':>12}{'加速比':>8}{'平均余弦':>10}{'最小余弦':>10}")
+    baseline = results["pytorch"]["texts_per_sec"]
+    for name, result in results.items():
+        print(
+            f"{name:<12}{result['texts_per_sec']:>12.1f}{result['texts_per_sec'] / baseline:>8.2f}"
+            f"{result['cosine']['mean']:>10.4f}{result['cosine']['min']:>10.4f}"
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "texts": args.texts, "results": results}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""Ollama 连接复用基准测试
+
+在本机启动一个模拟 Ollama 的 HTTP 服务（立即返回固定回答），对比每次请求新建
+aiohttp.ClientSession（旧实现）与 OllamaProvider 长连接池的单次请求开销，
+分别测量串行请求和并发请求的 p50/p99 延迟与吞吐量。
+
+用法:
+    poetry run python scripts/benchmark_ollama_session.py --requests 500 --concurrency 16
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import aiohttp
+import numpy as np
+from aiohttp import web
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.providers.ollama_provider import OllamaProvider
+
+async def start_stand_in_server(delay_ms: float) -> web.AppRunner:
+    async def generate(request: web.Request) -> web.Response:
+        body = await request.json()
+        if delay_ms:
+            await asyncio.sleep(delay_ms / 1000)
+        return web.json_response({"model": body["model"], "response": "ok", "done": True})
+
+    async def tags(request: web.Request) -> web.Response:
+        return web.json_response({"models": [{"name": "llama3"}]})
+
+    app = web.Application()
+    app.router.add_post("/api/generate", generate)
+    app.router.add_get("/api/tags", tags)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", 0).start()
+    return runner
+
+async def generate_with_new_session(base_url: str, prompt: str) -> str:
+    """旧实现：每次请求新建会话，需要重新建立TCP连接"""
+    async with aiohttp.ClientSession() as session:
+        async with session.post(
+            f"{base_url}/api/generate",
+            json={"model": "llama3", "prompt": prompt, "stream": False}
+        ) as response:
+            return (await response.json())["response"]
+
+async def measure(call, requests: int, concurrency: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i: int):
+        async with semaphore:
+            start = time.perf_counter()
+            await call(f"prompt {i}")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[one(i) for i in range(requests)])
+    elapsed = time.perf_counter() - start
+    return {
+        "throughput": requests / elapsed,
+        "mean_ms": float(np.mean(latencies)),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99))
+    }
+
+async def main_async(args):
+    runner = await start_stand_in_server(args.delay_ms)
+    port = runner.addresses[0][1]
+    base_url = f"http://127.0.0.1:{port}"
+    provider = OllamaProvider()
+    provider.base_url = base_url
+
+    try:
+        print(f"模拟服务: {base_url}, 请求数: {args.requests}, 服务端延迟: {args.delay_ms}ms")
+        print(f"{'模式':<20}{'并发':>6}{'吞吐(req/s)':>14}{'平均(ms)':>10}{'p50(ms)':>10}{'p99(ms)':>10}")
+        for concurrency in (1, args.concurrency):
+            results = {
+                "每次新建会话": await measure(
+                    lambda prompt: generate_with_new_session(base_url, prompt), args.requests, concurrency
+                ),
+                "长连接池": await measure(
+                    lambda prompt: provider.generate(prompt, model="llama3"), args.requests, concurrency
+                )
+            }
+            for name, result in results.items():
+                print(f"{name:<20}{concurrency:>6}{result['throughput']:>14.1f}{result['mean_ms']:>10.3f}"
+                      f"{result['p50_ms']:>10.3f}{result['p99_ms']:>10.3f}")
+            saved = results["每次新建会话"]["mean_ms"] - results["长连接池"]["mean_ms"]
+            print(f"  每个请求节省: {saved:.3f} ms")
+    finally:
+        await provider.close()
+        await runner.cleanup()
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama 连接复用基准测试")
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--delay-ms", type=float, default=0.0, help="模拟服务端处理耗时")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
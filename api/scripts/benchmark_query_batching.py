@@ -0,0 +1,96 @@
+"""查询嵌入微批处理基准测试
+
+模拟多个并发客户端逐条请求查询嵌入，对比逐条 encode 与 MicroBatchEmbedder 合并后的
+吞吐量、p50/p99 延迟和批大小分布。默认使用离线的模拟编码器（固定调用开销 + 每条文本开销），
+也可以通过 --model 使用真实的 SentenceTransformer 模型。
+
+用法:
+    poetry run python scripts/benchmark_query_batching.py --clients 64 --requests 20
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.rag.batching import MicroBatchEmbedder
+from src.core.rag.executor import OffloadExecutor
+
+class StubEncoder:
+    """模拟编码器：每次调用耗时 call_ms + item_ms * 文本数"""
+    def __init__(self, dimension: int, call_ms: float, item_ms: float):
+        self.dimension = dimension
+        self.call_ms = call_ms
+        self.item_ms = item_ms
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        time.sleep((self.call_ms + self.item_ms * len(texts)) / 1000)
+        return np.zeros((len(texts), self.dimension), dtype="float32")
+
+def load_encoder(args):
+    if args.model:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(args.model, device="cpu")
+    return StubEncoder(args.dimension, args.call_ms, args.item_ms)
+
+async def run_clients(embed, clients: int, requests: int) -> dict:
+    latencies = []
+
+    async def client(client_id: int):
+        for i in range(requests):
+            start = time.perf_counter()
+            await embed(f"客户端 {client_id} 的第 {i} 个查询")
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(c) for c in range(clients)])
+    elapsed = time.perf_counter() - start
+    return {
+        "throughput": clients * requests / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99))
+    }
+
+async def main_async(args):
+    encoder = load_encoder(args)
+    executor = OffloadExecutor(kind="thread", max_workers=args.workers)
+
+    async def encode_batch(texts):
+        return await executor.run(encoder.encode, texts, convert_to_numpy=True)
+
+    async def embed_single(text):
+        return (await encode_batch([text]))[0]
+
+    unbatched = await run_clients(embed_single, args.clients, args.requests)
+
+    batcher = MicroBatchEmbedder(encode_batch, max_batch_size=args.max_batch_size,
+                                 max_wait_ms=args.max_wait_ms)
+    batched = await run_clients(batcher.embed, args.clients, args.requests)
+    executor.shutdown()
+
+    print(f"并发客户端: {args.clients}, 每客户端请求: {args.requests}, 工作线程: {args.workers}")
+    print(f"{'模式':<12}{'吞吐(q/s)':>12}{'p50(ms)':>10}{'p99(ms)':>10}")
+    for name, result in (("逐条编码", unbatched), ("微批处理", batched)):
+        print(f"{name:<12}{result['throughput']:>12.1f}{result['p50_ms']:>10.2f}{result['p99_ms']:>10.2f}")
+    stats = batcher.stats()
+    print(f"批次数: {stats['batches']}, 平均批大小: {stats['avg_batch_size']:.1f}")
+    print(f"批大小分布: {stats['batch_size_histogram']}")
+
+def main():
+    parser = argparse.ArgumentParser(description="查询嵌入微批处理基准测试")
+    parser.add_argument("--clients", type=int, default=64, help="并发客户端数")
+    parser.add_argument("--requests", type=int, default=20, help="每个客户端的请求数")
+    parser.add_argument("--workers", type=int, default=2, help="编码线程数")
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--call-ms", type=float, default=8.0, help="模拟编码器每次调用的固定开销")
+    parser.add_argument("--item-ms", type=float, default=0.5, help="模拟编码器每条文本的开销")
+    parser.add_argument("--model", help="使用真实的 SentenceTransformer 模型名")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""RAG 检索层基准测试
+
+在 1万 / 10万 / 100万 条合成文档块上，对每种索引类型测量 FAISSDocumentStore 的导入吞吐量、
+检索 p50/p99 延迟、recall@k 和内存占用，以及 RAGManager 检索并组装上下文的延迟。
+向量预先生成，由离线的模拟嵌入模型按文档编号返回，不需要下载模型。
+
+结果可以写入 JSON（包含当前 git 提交），用 --baseline 指定另一次的结果文件即可逐项对比。
+
+用法:
+    poetry run python scripts/benchmark_retrieval.py --sizes 10000,100000 --output bench.json
+    poetry run python scripts/benchmark_retrieval.py --sizes 10000,100000 --baseline bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+import numpy as np
+import faiss
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from scripts.benchmark_ann_index import make_corpus, recall_at_k
+from src.core.rag import faiss_document_store
+from src.core.rag.document_store import Document
+from src.core.rag.faiss_document_store import FAISSDocumentStore, min_training_size
+from src.core.rag.rag_manager import RAGManager
+from src.core.prompt.prompt_manager import PromptManager
+from src.core.context.context_manager import ContextManager
+
+WORDS = np.array([
+    "信号", "滤波器", "频谱", "采样", "噪声", "功率", "相位", "调制", "卷积", "傅里叶变换",
+    "signal", "filter", "spectrum", "sampling", "noise", "power", "phase", "FFT", "window", "gain"
+])
+
+class StubEmbedder:
+    """模拟嵌入模型：文本以 "doc:<编号>" 或 "query:<编号>" 开头，返回预先生成的向量"""
+    def __init__(self, corpus: np.ndarray, queries: np.ndarray):
+        self.vectors = {"doc": corpus, "query": queries}
+        self.dimension = corpus.shape[1]
+
+    def encode(self, texts, **kwargs) -> np.ndarray:
+        result = np.zeros((len(texts), self.dimension), dtype="float32")
+        for i, text in enumerate(texts):
+            kind, _, number = text.split(" ", 1)[0].partition(":")
+            if kind in self.vectors:
+                result[i] = self.vectors[kind][int(number)]
+        return result
+
+def make_text(kind: str, number: int, rng: np.random.Generator) -> str:
+    return f"{kind}:{number} " + " ".join(rng.choice(WORDS, size=rng.integers(20, 60)))
+
+def percentiles(latencies: list) -> dict:
+    return {
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99))
+    }
+
+def index_options(index_type: str, size: int, args) -> dict:
+    """按语料规模选择索引参数
+
+    nlist 约为 4 * sqrt(N)，但不超过 N / 39，保证语料足够训练；训练样本数不超过语料规模，
+    否则近似索引一直停留在未训练的平坦暂存索引上，测到的并不是该索引类型。
+    """
+    nlist = max(1, min(max(16, int(4 * np.sqrt(size))), size // 39))
+    return {
+        "index_type": index_type,
+        "metric": "l2",
+        "nlist": nlist,
+        "nprobe": args.nprobe,
+        "pq_m": args.pq_m,
+        "hnsw_m": 32,
+        "ef_search": args.ef_search,
+        "train_size": min(min_training_size(index_type, nlist), size) or None
+    }
+
+def describe_index(index: faiss.Index) -> str:
+    """实际检索所用的FAISS索引类型，IndexIDMap 包装时同时给出内层索引"""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        return f"{type(index).__name__}({type(faiss.downcast_index(index.index)).__name__})"
+    return type(index).__name__
+
+async def run_case(index_type: str, size: int, corpus: np.ndarray, queries: np.ndarray,
+                   ground_truth: np.ndarray, args) -> dict:
+    store = FAISSDocumentStore(
+        embedding_model="stub",
+        dimension=corpus.shape[1],
+        batch_size=args.batch_size,
+        search_mode="hybrid" if args.bm25 else "vector",
+        enable_bm25=args.bm25,
+        **index_options(index_type, size, args)
+    )
+    rng = np.random.default_rng(1)
+    try:
+        start = time.perf_counter()
+        for batch_start in range(0, size, args.ingest_batch):
+            batch_end = min(batch_start + args.ingest_batch, size)
+            await store.add_documents([
+                Document(content=make_text("doc", i, rng), metadata={"index": i})
+                for i in range(batch_start, batch_end)
+            ])
+        ingest_seconds = time.perf_counter() - start
+
+        query_texts = [make_text("query", i, rng) for i in range(len(queries))]
+        latencies = []
+        results = np.full((len(queries), args.top_k), -1, dtype="int64")
+        for i, text in enumerate(query_texts):
+            start = time.perf_counter()
+            hits = await store.search_with_scores(text, args.top_k, threshold=float("inf"), mode="vector")
+            latencies.append((time.perf_counter() - start) * 1000)
+            found = [doc.metadata["index"] for doc, _ in hits]
+            results[i, :len(found)] = found
+
+        result = {
+            "size": size,
+            "index_type": index_type,
+            "ingest_s": ingest_seconds,
+            "ingest_docs_per_sec": size / ingest_seconds,
+            "search": percentiles(latencies),
+            f"recall_at_{args.top_k}": recall_at_k(ground_truth, results),
+            "memory": store.memory_footprint(),
+            "is_trained": store.is_trained,
+            "faiss_index": describe_index(store.index if store.is_trained else store._staging_index)
+        }
+        if not store.is_trained:
+            print(f"警告: {index_type} 在 {size} 条数据上未完成训练，检索使用的是平坦暂存索引")
+
+        if args.bm25:
+            latencies = []
+            for text in query_texts:
+                start = time.perf_counter()
+                await store.search(text, args.top_k, threshold=float("inf"), mode="hybrid")
+                latencies.append((time.perf_counter() - start) * 1000)
+            result["hybrid_search"] = percentiles(latencies)
+
+        # RAGManager：检索并按 token 预算组装上下文（查询向量已在上面缓存，不含 LLM 调用）
+        rag = RAGManager(store, PromptManager(), ContextManager(), top_k=args.top_k)
+        latencies = []
+        for i, text in enumerate(query_texts):
+            start = time.perf_counter()
+            await rag.answer(text, f"bench-{i}", "signal_processing")
+            latencies.append((time.perf_counter() - start) * 1000)
+        result["rag_answer"] = percentiles(latencies)
+        result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        return result
+    finally:
+        store.close()
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+def print_result(result: dict, top_k: int) -> None:
+    print(
+        f"{result['size']:>9}  {result['index_type']:<9}{result['ingest_docs_per_sec']:>12.0f}"
+        f"{result['search']['p50_ms']:>10.3f}{result['search']['p99_ms']:>10.3f}"
+        f"{result[f'recall_at_{top_k}']:>10.3f}{result['rag_answer']['p50_ms']:>10.3f}"
+        f"{result['memory']['bytes_per_vector']:>12.0f}"
+    )
+
+def compare(results: list, baseline_path: str, top_k: int) -> None:
+    """按 (规模, 索引类型) 与基准结果对比，比值大于 1 表示变慢（召回率和吞吐量为变好）"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(r["size"], r["index_type"]): r for r in baseline["results"]}
+    print(f"\n与基准 {baseline.get('commit', '?')} 对比（当前 / 基准）:")
+    print(f"{'规模':>9}  {'索引':<9}{'导入吞吐':>10}{'p50':>8}{'p99':>8}{'召回':>8}")
+    for result in results:
+        old = previous.get((result["size"], result["index_type"]))
+        if old is None:
+            continue
+        if (old.get("is_trained"), old.get("faiss_index")) != (result["is_trained"], result["faiss_index"]):
+            print(
+                f"注意: {result['size']} {result['index_type']} 实际索引不同: "
+                f"基准 {old.get('faiss_index', '?')} (trained={old.get('is_trained', '?')}), "
+                f"当前 {result['faiss_index']} (trained={result['is_trained']})"
+            )
+        recall_key = f"recall_at_{top_k}"
+        print(
+            f"{result['size']:>9}  {result['index_type']:<9}"
+            f"{result['ingest_docs_per_sec'] / old['ingest_docs_per_sec']:>10.2f}"
+            f"{result['search']['p50_ms'] / old['search']['p50_ms']:>8.2f}"
+            f"{result['search']['p99_ms'] / old['search']['p99_ms']:>8.2f}"
+            f"{result[recall_key] / max(old.get(recall_key, 0), 1e-9):>8.2f}"
+        )
+
+async def main_async(args):
+    sizes = [int(size) for size in args.sizes.split(",")]
+    index_types = args.index_types.split(",")
+    queries = make_corpus(args.queries, args.dimension, sample_seed=7)
+    results = []
+
+    print(f"维度: {args.dimension}, 查询: {args.queries}, k={args.top_k}, BM25: {args.bm25}")
+    print(f"{'规模':>9}  {'索引':<9}{'导入(条/s)':>12}{'p50(ms)':>10}{'p99(ms)':>10}"
+          f"{'recall':>10}{'RAG p50':>10}{'字节/向量':>12}")
+    for size in sizes:
+        corpus = make_corpus(size, args.dimension)
+        embedder = StubEmbedder(corpus, queries)
+        faiss_document_store.SentenceTransformer = lambda *_, **__: embedder
+
+        # 平坦索引的结果作为精确基准
+        flat = faiss.IndexFlatL2(args.dimension)
+        flat.add(corpus)
+        _, ground_truth = flat.search(queries, args.top_k)
+        del flat
+
+        for index_type in index_types:
+            result = await run_case(index_type, size, corpus, queries, ground_truth, args)
+            results.append(result)
+            print_result(result, args.top_k)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "faiss": faiss.__version__,
+                "config": vars(args),
+                "results": results
+            }, f, indent=2, ensure_ascii=False)
+    if args.baseline:
+        compare(results, args.baseline, args.top_k)
+
+def main():
+    parser = argparse.ArgumentParser(description="RAG 检索层基准测试")
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="逗号分隔的语料规模")
+    parser.add_argument("--index-types", default="l2,sq8,hnsw,ivf_flat,ivf_pq", help="逗号分隔的索引类型")
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=16)
+    parser.add_argument("--pq-m", type=int, default=48)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--batch-size", type=int, default=512, help="嵌入批大小")
+    parser.add_argument("--ingest-batch", type=int, default=10000, help="每次 add_documents 的文档数")
+    parser.add_argument("--bm25", action="store_true", help="同时建立BM25索引并测量混合检索")
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    parser.add_argument("--baseline", help="与之前保存的 JSON 结果对比")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""并发相同请求合并（singleflight）压测
+
+模拟突发流量：clients 个并发客户端从 distinct 个不同的问题中随机提问，
+上游为固定延迟的模拟 provider。对比不合并与 SingleFlight 合并时的上游调用次数、
+吞吐量和延迟，普通对话和流式请求分别测量。
+
+用法:
+    poetry run python scripts/benchmark_singleflight.py --clients 200 --distinct 10
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import numpy as np
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.providers.base_provider import BaseLLMProvider
+from src.core.response_cache import response_cache_key
+from src.core.singleflight import SingleFlight
+
+class StubProvider(BaseLLMProvider):
+    """模拟 provider：每次调用耗时 latency_ms，流式时分 tokens 段返回"""
+    def __init__(self, latency_ms: float, tokens: int):
+        self.latency_ms = latency_ms
+        self.tokens = tokens
+        self.calls = 0
+
+    async def generate(self, prompt: str, context: Optional[Dict[str, Any]] = None, **kwargs: Any) -> str:
+        self.calls += 1
+        await asyncio.sleep(self.latency_ms / 1000)
+        return f"回答: {prompt}"
+
+    async def chat(self, messages: List[Dict[str, str]], context: Optional[Dict[str, Any]] = None,
+                   **kwargs: Any) -> str:
+        return await self.generate(messages[-1]["content"], context, **kwargs)
+
+    async def stream_chat(self, messages: List[Dict[str, str]], context: Optional[Dict[str, Any]] = None,
+                          **kwargs: Any) -> AsyncIterator[str]:
+        self.calls += 1
+        for i in range(self.tokens):
+            await asyncio.sleep(self.latency_ms / 1000 / self.tokens)
+            yield f"{i} "
+
+    async def list_models(self) -> List[str]:
+        return ["stub"]
+
+async def run(args, coalesce: bool, streaming: bool) -> dict:
+    provider = StubProvider(args.latency_ms, args.tokens)
+    flight = SingleFlight()
+    rng = np.random.default_rng(0)
+    questions = rng.integers(0, args.distinct, args.clients)
+    latencies = []
+
+    async def client(question: int):
+        messages = [{"role": "user", "content": f"问题 {question}"}]
+        key = response_cache_key("stub", "stub", messages, {})
+        await asyncio.sleep(float(rng.uniform(0, args.spread_ms)) / 1000)
+        start = time.perf_counter()
+        if streaming:
+            stream = (flight.stream(key, lambda: provider.stream_chat(messages))
+                      if coalesce else provider.stream_chat(messages))
+            async for _ in stream:
+                pass
+        elif coalesce:
+            await flight.do(key, lambda: provider.chat(messages))
+        else:
+            await provider.chat(messages)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(int(question)) for question in questions])
+    elapsed = time.perf_counter() - start
+    return {
+        "upstream_calls": provider.calls,
+        "throughput": args.clients / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p99_ms": float(np.percentile(latencies, 99))
+    }
+
+async def main_async(args):
+    print(f"客户端: {args.clients}, 不同问题: {args.distinct}, 上游延迟: {args.latency_ms}ms, "
+          f"到达时间分布: {args.spread_ms}ms")
+    print(f"{'模式':<16}{'上游调用':>10}{'吞吐(req/s)':>14}{'p50(ms)':>10}{'p99(ms)':>10}")
+    for streaming in (False, True):
+        for coalesce in (False, True):
+            result = await run(args, coalesce, streaming)
+            name = ("流式" if streaming else "对话") + ("+合并" if coalesce else "")
+            print(f"{name:<16}{result['upstream_calls']:>10}{result['throughput']:>14.1f}"
+                  f"{result['p50_ms']:>10.1f}{result['p99_ms']:>10.1f}")
+
+def main():
+    parser = argparse.ArgumentParser(description="singleflight 请求合并压测")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--distinct", type=int, default=10, help="不同问题的数量")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="模拟上游延迟")
+    parser.add_argument("--spread-ms", type=float, default=100.0, help="客户端到达时间的分布范围")
+    parser.add_argument("--tokens", type=int, default=20, help="流式响应的片段数")
+    asyncio.run(main_async(parser.parse_args()))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""把 SentenceTransformer 嵌入模型导出为 ONNX（可选 int8 动态量化）
+
+导出目录包含 model.onnx、model_quantized.onnx、tokenizer.json 以及池化/归一化配置，
+供 rag.embedding_backend.kind = onnx 时离线加载。导出需要能加载原始模型（已缓存或可联网），
+并安装 onnx 和 onnxruntime。
+
+用法:
+    poetry run python scripts/export_onnx_model.py --model paraphrase-MiniLM-L3-v2 --quantize
+"""
+import argparse
+import os
+import sys
+import torch
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.rag.embedding_backends import (
+    default_onnx_model_dir,
+    ONNX_MODEL_FILE,
+    ONNX_QUANTIZED_MODEL_FILE
+)
+
+def export_model(model_name: str, output_dir: str, cache_dir: str, opset: int) -> str:
+    from sentence_transformers import SentenceTransformer
+
+    model = SentenceTransformer(model_name, device="cpu", cache_folder=cache_dir)
+    # 保存分词器、池化和归一化配置，ONNX 后端据此还原 sentence-transformers 的处理流程
+    model.save(output_dir)
+
+    transformer = model[0].auto_model.eval()
+    tokenizer = model.tokenizer
+    sample = tokenizer(["导出示例 export sample"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+    class TokenEmbeddings(torch.nn.Module):
+        """只输出最后一层 token 向量，池化在 ONNX 后端中完成"""
+        def __init__(self, encoder):
+            super().__init__()
+            self.encoder = encoder
+
+        def forward(self, *inputs):
+            return self.encoder(**dict(zip(input_names, inputs))).last_hidden_state
+
+    model_path = os.path.join(output_dir, ONNX_MODEL_FILE)
+    with torch.no_grad():
+        torch.onnx.export(
+            TokenEmbeddings(transformer),
+            tuple(sample[name] for name in input_names),
+            model_path,
+            input_names=input_names,
+            output_names=["token_embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset
+        )
+    return model_path
+
+def quantize_model(model_path: str, output_path: str) -> None:
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+
+    quantize_dynamic(model_path, output_path, weight_type=QuantType.QInt8)
+
+def main():
+    parser = argparse.ArgumentParser(description="导出 ONNX 嵌入模型")
+    parser.add_argument("--model", default="paraphrase-MiniLM-L3-v2", help="SentenceTransformer 模型名或路径")
+    parser.add_argument("--cache-dir", default=os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache"
+    ), help="模型缓存目录")
+    parser.add_argument("--output-dir", help="导出目录，默认 <cache-dir>/onnx/<模型名>")
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--quantize", action="store_true", help="同时导出 int8 动态量化模型")
+    args = parser.parse_args()
+
+    output_dir = args.output_dir or default_onnx_model_dir(args.model, args.cache_dir)
+    os.makedirs(output_dir, exist_ok=True)
+    model_path = export_model(args.model, output_dir, args.cache_dir, args.opset)
+    print(f"已导出 {model_path} ({os.path.getsize(model_path) / 1e6:.1f} MB)")
+    if args.quantize:
+        quantized_path = os.path.join(output_dir, ONNX_QUANTIZED_MODEL_FILE)
+        quantize_model(model_path, quantized_path)
+        print(f"已导出 {quantized_path} ({os.path.getsize(quantized_path) / 1e6:.1f} MB)")
+
+if __name__ == "__main__":
+    main()
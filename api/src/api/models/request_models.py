@@ -13,6 +13,7 @@ class ChatRequest(BaseModel):
     context: Optional[Dict[str, Any]] = None
     provider: Optional[str] = None
     model: Optional[str] = None
+    use_cache: Optional[bool] = None
 
 class TaskRequest(BaseModel):
     domain: str
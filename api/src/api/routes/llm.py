@@ -1,14 +1,37 @@
 from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
 from src.api.models.request_models import QueryRequest, ChatRequest, TaskRequest
-from src.core.llm_manager import LLMManager
+from src.core.llm_manager import get_llm_manager
+from src.core.providers.admission import AdmissionRejected
 from src.adapter.adapter_manager import AdapterManager
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncGenerator
+import json
 import uuid
 
 router = APIRouter()
-llm_manager = LLMManager()
+llm_manager = get_llm_manager()
 adapter_manager = AdapterManager()
 
+async def sse_events(chunks: AsyncGenerator[str, None], **done_fields: Any) -> AsyncGenerator[str, None]:
+    """Format text chunks as Server-Sent Events, ending with a done or error event"""
+    try:
+        async for chunk in chunks:
+            yield f"data: {json.dumps({'content': chunk}, ensure_ascii=False)}\n\n"
+        yield f"event: done\ndata: {json.dumps(done_fields)}\n\n"
+    except Exception as e:
+        yield f"event: error\ndata: {json.dumps({'detail': str(e)}, ensure_ascii=False)}\n\n"
+    finally:
+        # Close the upstream stream right away when the client disconnects
+        await chunks.aclose()
+
+def sse_response(chunks: AsyncGenerator[str, None], **done_fields: Any) -> StreamingResponse:
+    return StreamingResponse(
+        sse_events(chunks, **done_fields),
+        media_type="text/event-stream",
+        # Disable proxy buffering so tokens reach the client as they are generated
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/query")
 async def query(request: QueryRequest):
     try:
@@ -24,6 +47,21 @@ async def query(request: QueryRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/query/stream")
+async def query_stream(request: QueryRequest):
+    """Stream the RAG answer as Server-Sent Events"""
+    session_id = str(uuid.uuid4())
+    return sse_response(
+        llm_manager.stream_query(
+            request.query,
+            session_id,
+            domain=request.domain or "general",
+            provider=request.provider,
+            model=request.model
+        ),
+        session_id=session_id
+    )
+
 @router.post("/chat")
 async def chat(request: ChatRequest):
     try:
@@ -31,12 +69,28 @@ async def chat(request: ChatRequest):
             request.messages,
             request.context,
             provider=request.provider,
+            use_cache=request.use_cache,
             model=request.model
         )
         return {"response": response}
+    except AdmissionRejected as e:
+        # Provider queue is full or the wait timed out; the client may retry later
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """Stream the chat reply as Server-Sent Events"""
+    return sse_response(
+        llm_manager.stream_chat(
+            request.messages,
+            request.context,
+            provider=request.provider,
+            model=request.model
+        )
+    )
+
 @router.post("/analyze")
 async def analyze(request: TaskRequest):
     try:
@@ -45,6 +99,11 @@ async def analyze(request: TaskRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/stats")
+async def stats():
+    """Get runtime statistics (caches, document store)"""
+    return llm_manager.get_stats()
+
 @router.get("/models/ollama", response_model=List[str])
 async def list_ollama_models():
     """Get available Ollama models list"""
@@ -4,7 +4,7 @@ from src.core.db.config import get_db
 from src.core.services.llm_executor import LLMExecutor
 from src.core.services.plan_executor import PlanExecutor
 from src.core.rag.document_store import InMemoryDocumentStore
-from src.core.llm_manager import LLMManager
+from src.core.llm_manager import get_llm_manager
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import logging
@@ -16,7 +16,7 @@ logger = logging.getLogger(__name__)
 
 # Initialize services
 document_store = InMemoryDocumentStore()
-llm_manager = LLMManager()
+llm_manager = get_llm_manager()
 llm_executor = LLMExecutor(document_store, llm_manager)
 plan_executor = PlanExecutor()
 
@@ -1,27 +1,77 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Union, Tuple, Callable, AsyncGenerator
 from dotenv import load_dotenv
 import os
 from src.core.providers.base_provider import BaseLLMProvider
-from src.core.providers.openai_provider import OpenAIProvider
 from src.core.providers.ollama_provider import OllamaProvider
+from src.core.providers.router import ProviderRouter
+from src.core.providers.admission import AdmissionController
 from .rag.faiss_document_store import FAISSDocumentStore
+from .rag.sharding import ShardedDocumentStore
+from .rag.embedding_backends import default_onnx_model_dir
 from .rag.rag_manager import RAGManager
+from .rag.reranker import CrossEncoderReranker
+from .rag.semantic_cache import SemanticResponseCache
 from .prompt.prompt_manager import PromptManager
 from .context.context_manager import ContextManager
 from .intent.intent_analyzer import IntentAnalyzer
+from .config.settings import settings
+from .metrics import LatencyRecorder
+from .singleflight import SingleFlight
+from .response_cache import (
+    LLMResponseCache,
+    MemoryCacheBackend,
+    SQLiteCacheBackend,
+    ResponseCacheBackend,
+    response_cache_key
+)
 import logging
+import hashlib
 import json
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
+# api directory, used to resolve relative paths from the config
+API_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def resolve_api_path(path: Optional[str]) -> Optional[str]:
+    """Resolve a configured path relative to the api directory"""
+    return os.path.join(API_DIR, path) if path else None
+
+def model_context_lengths() -> Dict[str, int]:
+    """Collect llm.providers.*.models.*.context_length from the config"""
+    context_lengths: Dict[str, int] = {}
+    for provider in settings.get("llm.providers", {}).values():
+        for model, config in ((provider or {}).get("models") or {}).items():
+            if config and config.get("context_length"):
+                context_lengths[model] = config["context_length"]
+    return context_lengths
+
+def provider_models() -> Dict[str, List[str]]:
+    """Models each configured provider serves, its default_model first"""
+    models: Dict[str, List[str]] = {}
+    for name, provider in settings.get("llm.providers", {}).items():
+        provider = provider or {}
+        names = [provider.get("default_model")] + list((provider.get("models") or {}).keys())
+        models[name] = list(dict.fromkeys(str(model).strip() for model in names if model))
+    return models
+
 class LLMManager:
     def __init__(self):
         load_dotenv()
+        # Startup timings reported through get_stats()
+        self.timings: Dict[str, float] = {}
+        # Streaming latency per provider: time to first token and full stream duration
+        self.time_to_first_token: Dict[str, LatencyRecorder] = {}
+        self.stream_duration: Dict[str, LatencyRecorder] = {}
         self.providers: Dict[str, BaseLLMProvider] = {}
         
         # Initialize OpenAI provider
         openai_api_key = os.getenv("OPENAI_API_KEY")
         if openai_api_key:
+            # Imported lazily: the openai SDK takes a large share of import time
+            from src.core.providers.openai_provider import OpenAIProvider
             self.providers["openai"] = OpenAIProvider(openai_api_key)
             
         # Initialize Ollama provider
@@ -30,71 +80,455 @@ class LLMManager:
         # Set default provider
         self.default_provider = os.getenv("DEFAULT_LLM_PROVIDER", "openai")
         
+        # Exact-match cache of chat completions
+        self.llm_cache: Optional[LLMResponseCache] = None
+        if settings.get("llm.response_cache.enabled", False):
+            ttl = settings.get("llm.response_cache.ttl", 3600)
+            tiers: List[ResponseCacheBackend] = [
+                MemoryCacheBackend(settings.get("llm.response_cache.memory.max_size", 1024), ttl)
+            ]
+            if settings.get("llm.response_cache.sqlite.enabled", False):
+                tiers.append(SQLiteCacheBackend(
+                    resolve_api_path(settings.get("llm.response_cache.sqlite.path", "data/llm_cache.sqlite3")),
+                    ttl=settings.get("llm.response_cache.sqlite.ttl", ttl),
+                    max_entries=settings.get("llm.response_cache.sqlite.max_entries", 100000)
+                ))
+            self.llm_cache = LLMResponseCache(tiers)
+        
+        # Per-provider and per-model concurrency limits with a priority queue
+        self.admission: Optional[AdmissionController] = None
+        if settings.get("llm.admission.enabled", False):
+            self.admission = AdmissionController(
+                settings.get("llm.admission.providers", {}),
+                default_models={
+                    name: (config or {}).get("default_model")
+                    for name, config in settings.get("llm.providers", {}).items()
+                },
+                max_queue=settings.get("llm.admission.max_queue", 100),
+                queue_timeout=settings.get("llm.admission.queue_timeout", 30)
+            )
+        
+        # Failover, hedging and latency-aware ordering across providers
+        self.router = ProviderRouter(
+            self.providers,
+            order=[self.default_provider] + list(settings.get("llm.providers", {})),
+            failover=settings.get("llm.routing.failover", True),
+            timeout=settings.get("llm.routing.timeout", 120),
+            hedge=settings.get("llm.routing.hedge.enabled", False),
+            hedge_quantile=settings.get("llm.routing.hedge.quantile", 95),
+            hedge_min_samples=settings.get("llm.routing.hedge.min_samples", 20),
+            hedge_min_delay=settings.get("llm.routing.hedge.min_delay", 0.05),
+            ewma_alpha=settings.get("llm.routing.ewma_alpha", 0.3),
+            admission=self.admission,
+            models=provider_models()
+        )
+        
+        # Concurrent identical chat/stream requests share one provider call
+        self.singleflight: Optional[SingleFlight] = (
+            SingleFlight() if settings.get("llm.singleflight.enabled", True) else None
+        )
+        
         # Initialize components
-        self.document_store = FAISSDocumentStore(
-            embedding_model="paraphrase-MiniLM-L3-v2",
-            dimension=384,
-            index_type="l2"
+        index_config = settings.get("rag.index", {})
+        embedding_model = settings.get("rag.embedding_model", "paraphrase-MiniLM-L3-v2")
+        onnx_config = settings.get("rag.embedding_backend.onnx", {}) or {}
+        onnx_model_dir = onnx_config.get("model_dir") or default_onnx_model_dir(
+            embedding_model, settings.get("rag.cache_dir", "cache")
         )
+        store_options = {
+            "embedding_model": embedding_model,
+            "dimension": settings.get("rag.dimension", 384),
+            "index_type": index_config.get("type", "l2"),
+            "batch_size": settings.get("rag.batch_size", 64),
+            "metric": index_config.get("metric", "l2"),
+            "nlist": index_config.get("nlist", 100),
+            "nprobe": index_config.get("nprobe", 10),
+            "pq_m": index_config.get("pq_m", 8),
+            "hnsw_m": index_config.get("hnsw_m", 32),
+            "ef_search": index_config.get("ef_search", 64),
+            "query_cache_size": settings.get("rag.query_cache.max_size", 1024),
+            "query_cache_ttl": settings.get("rag.query_cache.ttl", 3600),
+            "embedding_executor": settings.get("rag.embedding_executor.kind", "thread"),
+            "embedding_workers": settings.get("rag.embedding_executor.workers", 2),
+            "embedding_concurrency": settings.get("rag.embedding_executor.concurrency", 4),
+            "query_batch_size": settings.get("rag.query_batching.max_batch_size", 32),
+            "query_batch_wait_ms": settings.get("rag.query_batching.max_wait_ms", 0),
+            "search_mode": settings.get("rag.retrieval.mode", "vector"),
+            "enable_bm25": settings.get("rag.bm25.enabled", True),
+            "bm25_k1": settings.get("rag.bm25.k1", 1.5),
+            "bm25_b": settings.get("rag.bm25.b", 0.75),
+            "rrf_k": settings.get("rag.retrieval.rrf_k", 60),
+            "hybrid_candidates": settings.get("rag.retrieval.candidates", 50),
+            "cache_dir": resolve_api_path(settings.get("rag.cache_dir", None)),
+            "embedding_backend": settings.get("rag.embedding_backend.kind", "sentence_transformers"),
+            "embedding_backend_options": {
+                "model_dir": resolve_api_path(onnx_model_dir),
+                "quantized": onnx_config.get("quantized", False),
+                "threads": onnx_config.get("threads")
+            }
+        }
+        self.document_store: Union[FAISSDocumentStore, ShardedDocumentStore]
+        if settings.get("rag.sharding.enabled", False):
+            # One index shard per domain, loaded on first use
+            self.document_store = ShardedDocumentStore(
+                snapshot_root=resolve_api_path(settings.get("rag.sharding.snapshot_root", "data/shards")),
+                store_options=store_options,
+                default_domain=settings.get("rag.sharding.default_domain", "general"),
+                max_loaded_shards=settings.get("rag.sharding.max_loaded_shards", 4),
+                idle_ttl=settings.get("rag.sharding.idle_ttl", None)
+            )
+        else:
+            self.document_store = FAISSDocumentStore(**store_options)
         self.prompt_manager = PromptManager()
         self.context_manager = ContextManager()
         self.intent_analyzer = IntentAnalyzer(self.prompt_manager)
+        self.reranker: Optional[CrossEncoderReranker] = None
+        if settings.get("rag.reranker.enabled", False):
+            self.reranker = CrossEncoderReranker(
+                model_name=settings.get("rag.reranker.model", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+                cache_dir=resolve_api_path(settings.get("rag.cache_dir", None)),
+                batch_size=settings.get("rag.reranker.batch_size", 32),
+                executor=settings.get("rag.reranker.executor", "thread"),
+                workers=settings.get("rag.reranker.workers", 1),
+                cache_size=settings.get("rag.reranker.cache.max_size", 8192),
+                cache_ttl=settings.get("rag.reranker.cache.ttl", 3600)
+            )
         self.rag_manager = RAGManager(
             self.document_store,
             self.prompt_manager,
-            self.context_manager
+            self.context_manager,
+            reranker=self.reranker,
+            top_k=settings.get("rag.retrieval.top_k", 5),
+            rerank_candidates=settings.get("rag.reranker.candidates", 20),
+            context_lengths=model_context_lengths(),
+            default_model=settings.get(f"llm.providers.{self.default_provider}.default_model", None),
+            default_context_length=settings.get("rag.context.default_context_length", 4096),
+            reserved_tokens=settings.get("rag.context.reserved_tokens", 1024)
         )
+        self.response_cache: Optional[SemanticResponseCache] = None
+        if settings.get("rag.response_cache.enabled", False):
+            self.response_cache = SemanticResponseCache(
+                dimension=settings.get("rag.dimension", 384),
+                threshold=settings.get("rag.response_cache.threshold", 0.95),
+                max_size=settings.get("rag.response_cache.max_size", 1024),
+                ttl=settings.get("rag.response_cache.ttl", 600),
+                candidates=settings.get("rag.response_cache.candidates", 8)
+            )
         
     async def process_query(
         self,
         query: str,
         session_id: str,
         domain: str = "general",
-        context: Optional[Dict[str, Any]] = None
+        context: Optional[Dict[str, Any]] = None,
+        search_domains: Optional[List[str]] = None,
+        model: Optional[str] = None
     ) -> Dict[str, Any]:
+        # The context budget and cache scope follow the model the router would serve
+        model = self._serving_model(None, model)
+        
+        # 0. Answer near-identical questions from the semantic cache; the store
+        # generation is read before retrieval so concurrent updates invalidate the entry.
+        # The caller's context shapes the answer, so it is part of the scope
+        if self.response_cache is not None:
+            domains = search_domains or [domain]
+            context_hash = hashlib.sha1(
+                json.dumps(context or {}, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+            ).hexdigest()
+            scope = json.dumps([model, sorted(domains), context_hash])
+            if isinstance(self.document_store, ShardedDocumentStore):
+                generation = self.document_store.generation(domains)
+            else:
+                generation = self.document_store.generation
+            embedding = await self.document_store.embed_query(query)
+            hit = self.response_cache.get(embedding, scope, generation)
+            if hit is not None:
+                entry, similarity = hit
+                self.rag_manager.remember_query(session_id, query, domain)
+                return {
+                    "response": entry.response,
+                    "intent": entry.payload["intent"],
+                    "context": self.context_manager.get_context(session_id),
+                    "cached": True,
+                    "similarity": similarity
+                }
+        
         # 1. Analyze intent
         intent = await self.intent_analyzer.analyze_intent(query, context or {})
         
         # 2. Process query using RAG
-        response = await self.rag_manager.process_query(
+        response, _ = await self.rag_manager.answer(
             query,
             session_id,
-            domain
+            domain,
+            search_domains,
+            model
         )
         
+        if self.response_cache is not None:
+            self.response_cache.put(
+                embedding,
+                scope,
+                generation,
+                response,
+                {"intent": intent.dict()}
+            )
+        
         return {
             "response": response,
             "intent": intent.dict(),
             "context": self.context_manager.get_context(session_id)
         }
             
+    def get_stats(self) -> Dict[str, Any]:
+        """Collect runtime statistics from managed components"""
+        stats: Dict[str, Any] = {"startup": self.timings}
+        if hasattr(self.document_store, "get_stats"):
+            stats["document_store"] = self.document_store.get_stats()
+        if self.reranker is not None:
+            stats["reranker"] = self.reranker.stats()
+        if self.response_cache is not None:
+            stats["response_cache"] = self.response_cache.stats()
+        if self.llm_cache is not None:
+            stats["llm_cache"] = self.llm_cache.stats()
+        if self.singleflight is not None:
+            stats["singleflight"] = self.singleflight.stats()
+        stats["routing"] = self.router.stats()
+        if self.admission is not None:
+            stats["admission"] = self.admission.stats()
+        stats["streaming"] = {
+            name: {
+                "time_to_first_token": recorder.stats(),
+                "duration": self.stream_duration[name].stats()
+            }
+            for name, recorder in self.time_to_first_token.items()
+        }
+        return stats
+        
+    async def close_providers(self) -> None:
+        """Close provider HTTP sessions"""
+        for name, provider in self.providers.items():
+            try:
+                await provider.close()
+            except Exception as e:
+                logger.error(f"Failed to close provider {name}: {str(e)}")
+                
+    def close(self) -> None:
+        """Release the document store and re-ranker worker pools"""
+        try:
+            self.document_store.close()
+        finally:
+            if self.reranker is not None:
+                self.reranker.close()
+            if self.llm_cache is not None:
+                self.llm_cache.close()
+            
     async def chat(
         self,
         messages: List[Dict[str, str]],
         context: Optional[Dict[str, Any]] = None,
         provider: Optional[str] = None,
+        use_cache: Optional[bool] = None,
+        priority: str = "interactive",
         **kwargs: Any
     ) -> str:
+        """Chat with a provider, answering repeated requests from the response cache
+
+        By default only deterministic requests (temperature 0) are cached; use_cache=True
+        caches sampled replies too and use_cache=False neither reads nor writes the cache.
+        priority orders the request in the admission queue, "interactive" requests are
+        admitted ahead of "batch" ones.
+        """
         try:
-            # Use specified provider or default provider
-            provider_name = provider or self.default_provider
-            llm_provider = self.providers.get(provider_name)
+            # The router tries the specified provider first, otherwise ranks the providers
+            # serving the requested model by latency
+            options = {key: value for key, value in kwargs.items() if value is not None}
+            provider_name = provider or self.router.candidates(None, options.get("model"))[0]
+            request_key = self._request_key(provider_name, messages, options)
             
-            if not llm_provider:
-                raise ValueError(f"Provider {provider_name} not found")
+            cacheable = self.llm_cache is not None and (
+                use_cache or (use_cache is None and self._is_deterministic(provider_name, options))
+            )
+            if cacheable:
+                cached = await self.llm_cache.get(request_key)
+                if cached is not None:
+                    return cached
+            elif self.llm_cache is not None:
+                self.llm_cache.bypassed += 1
             
-            # Call provider's chat method
-            response = await llm_provider.chat(messages, context, **kwargs)
-            
-            if not response:
-                raise ValueError("Empty response from LLM provider")
+            async def call_provider() -> str:
+                start_time = time.perf_counter()
+                served_by, response = await self.router.chat(messages, context, provider, priority, **options)
+                if not cacheable:
+                    return response
+                
+                # Store the reply under the provider that actually produced it
+                if served_by == provider_name:
+                    key = request_key
+                else:
+                    if use_cache is None and not self._is_deterministic(served_by, options):
+                        return response
+                    key = self._request_key(served_by, messages, options)
+                await self.llm_cache.set(key, response, time.perf_counter() - start_time)
+                return response
             
-            return response
+            # Call provider's chat method, sharing the call with identical in-flight requests
+            if self.singleflight is None:
+                return await call_provider()
+            return await self.singleflight.do(request_key, call_provider)
         
         except Exception as e:
             logger.error(f"Chat failed: {str(e)}")
             raise
             
+    def _request_key(
+        self,
+        provider_name: str,
+        messages: List[Dict[str, str]],
+        kwargs: Dict[str, Any]
+    ) -> str:
+        """Key identifying a chat request by provider, model, messages and sampling parameters"""
+        model = kwargs.get("model") or settings.get(f"llm.providers.{provider_name}.default_model", None)
+        params = {key: value for key, value in kwargs.items() if key != "model" and value is not None}
+        return response_cache_key(provider_name, model, messages, params)
+        
+    @staticmethod
+    def _is_deterministic(provider_name: str, kwargs: Dict[str, Any]) -> bool:
+        """Whether the request decodes greedily, taking the temperature from the request or the model config"""
+        temperature = kwargs.get("temperature")
+        if temperature is None:
+            provider_config = settings.get(f"llm.providers.{provider_name}", {}) or {}
+            model = kwargs.get("model") or provider_config.get("default_model")
+            temperature = ((provider_config.get("models") or {}).get(model) or {}).get("temperature")
+        return temperature == 0
+        
+    def _get_provider(self, provider: Optional[str], model: Optional[str] = None) -> Tuple[str, BaseLLMProvider]:
+        provider_name = provider or self.default_provider
+        if provider is None and not (provider_name in self.providers and self.router.serves(provider_name, model)):
+            # The default provider is unavailable or does not serve the requested model
+            provider_name = self.router.candidates(None, model)[0]
+        llm_provider = self.providers.get(provider_name)
+        if not llm_provider:
+            raise ValueError(f"Provider {provider_name} not found")
+        return provider_name, llm_provider
+        
+    def _serving_model(self, provider_name: Optional[str], model: Optional[str] = None) -> Optional[str]:
+        """The model that answers a request, the routed provider's default when none is given"""
+        if model is not None:
+            return model
+        return self.router.model_for(provider_name or self.router.candidates()[0])
+        
+    async def _timed_stream(
+        self,
+        provider_name: str,
+        stream: AsyncGenerator[str, None]
+    ) -> AsyncGenerator[str, None]:
+        """Pass chunks through while recording time to first token and total duration"""
+        start_time = time.perf_counter()
+        first_token = True
+        try:
+            async for chunk in stream:
+                if first_token:
+                    self.time_to_first_token.setdefault(provider_name, LatencyRecorder()).record(
+                        time.perf_counter() - start_time
+                    )
+                    first_token = False
+                yield chunk
+        finally:
+            # Close the provider stream right away when the consumer goes away
+            await stream.aclose()
+        self.stream_duration.setdefault(provider_name, LatencyRecorder()).record(time.perf_counter() - start_time)
+        
+    async def _admitted_stream(
+        self,
+        provider_name: str,
+        model: Optional[str],
+        priority: str,
+        stream: AsyncGenerator[str, None]
+    ) -> AsyncGenerator[str, None]:
+        """Hold an admission slot of the provider for the whole stream"""
+        try:
+            if self.admission is None:
+                async for chunk in stream:
+                    yield chunk
+                return
+            async with self.admission.slot(provider_name, model, priority):
+                async for chunk in stream:
+                    yield chunk
+        finally:
+            await stream.aclose()
+        
+    def _shared_stream(
+        self,
+        key: str,
+        factory: Callable[[], AsyncGenerator[str, None]]
+    ) -> AsyncGenerator[str, None]:
+        """Subscribe to an identical in-flight stream, or start it"""
+        if self.singleflight is None:
+            return factory()
+        return self.singleflight.stream(key, factory)
+        
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]] = None,
+        provider: Optional[str] = None,
+        priority: str = "interactive",
+        **kwargs: Any
+    ) -> AsyncGenerator[str, None]:
+        """Stream the chat reply chunk by chunk"""
+        options = {key: value for key, value in kwargs.items() if value is not None}
+        provider_name, llm_provider = self._get_provider(provider, options.get("model"))
+        stream = self._shared_stream(
+            "stream_chat:" + self._request_key(provider_name, messages, options),
+            lambda: self._admitted_stream(
+                provider_name,
+                options.get("model"),
+                priority,
+                self._timed_stream(provider_name, llm_provider.stream_chat(messages, context, **options))
+            )
+        )
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+            
+    async def stream_query(
+        self,
+        query: str,
+        session_id: str,
+        domain: str = "general",
+        search_domains: Optional[List[str]] = None,
+        provider: Optional[str] = None,
+        model: Optional[str] = None,
+        priority: str = "interactive"
+    ) -> AsyncGenerator[str, None]:
+        """Retrieve context, build the RAG prompt and stream the generated answer"""
+        provider_name, llm_provider = self._get_provider(provider, model)
+        prompt, _ = await self.rag_manager.build_prompt(
+            query,
+            session_id,
+            domain,
+            search_domains,
+            self._serving_model(provider_name, model)
+        )
+        options = {"model": model} if model else {}
+        stream = self._shared_stream(
+            "stream_generate:" + self._request_key(provider_name, [{"role": "user", "content": prompt}], options),
+            lambda: self._admitted_stream(
+                provider_name,
+                model,
+                priority,
+                self._timed_stream(provider_name, llm_provider.stream_generate(prompt, **options))
+            )
+        )
+        try:
+            async for chunk in stream:
+                yield chunk
+        finally:
+            await stream.aclose()
+            
     async def generate_execution_plan(
         self,
         query: str,
@@ -145,8 +579,8 @@ Please generate an execution plan. Remember:
                 {"role": "user", "content": user_prompt}
             ]
 
-            # Get response
-            response = await self.chat(messages)
+            # Get response; plan generation queues behind interactive chat
+            response = await self.chat(messages, priority="batch")
             
             # Try to parse JSON
             try:
@@ -203,4 +637,21 @@ Please generate an execution plan. Remember:
                 
         except Exception as e:
             logger.error(f"Failed to generate execution plan: {str(e)}")
-            raise 
\ No newline at end of file
+            raise 
+
+_llm_manager: Optional[LLMManager] = None
+_llm_manager_lock = threading.Lock()
+
+def get_llm_manager() -> LLMManager:
+    """Return the process-wide LLMManager, creating it on first use.
+
+    Routes and the CLI share this instance so the process holds a single
+    document store and embedding model; the model itself is only loaded on
+    the first embedding call or during warm-up.
+    """
+    global _llm_manager
+    if _llm_manager is None:
+        with _llm_manager_lock:
+            if _llm_manager is None:
+                _llm_manager = LLMManager()
+    return _llm_manager
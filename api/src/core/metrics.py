@@ -0,0 +1,34 @@
+from typing import Dict, Any, Optional
+from collections import deque
+import threading
+import numpy as np
+
+class LatencyRecorder:
+    """Rolling window of latency samples reported as count / mean / p50 / p99"""
+    def __init__(self, window: int = 10000):
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Return the q-th percentile in seconds, or None without samples"""
+        with self._lock:
+            if not self._samples:
+                return None
+            return float(np.percentile(np.array(self._samples), q))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            samples = np.array(self._samples) * 1000 if self._samples else np.zeros(1)
+            count = self.count
+        return {
+            "count": count,
+            "mean_ms": float(samples.mean()),
+            "p50_ms": float(np.percentile(samples, 50)),
+            "p99_ms": float(np.percentile(samples, 99))
+        }
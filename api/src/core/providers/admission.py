@@ -0,0 +1,154 @@
+from typing import Dict, Any, Optional, List, Tuple, AsyncIterator
+from contextlib import asynccontextmanager, AsyncExitStack
+from src.core.metrics import LatencyRecorder
+import asyncio
+import heapq
+import itertools
+import time
+
+# Lower value is served first; interactive chat goes ahead of batch plan generation
+PRIORITIES = {"interactive": 0, "batch": 1}
+
+class AdmissionRejected(Exception):
+    """The request was not admitted to the provider"""
+
+class QueueFullError(AdmissionRejected):
+    pass
+
+class QueueTimeoutError(AdmissionRejected):
+    pass
+
+class ConcurrencyLimiter:
+    """Max in-flight requests with a bounded priority queue
+
+    Waiters are admitted by (priority, arrival order). A released slot is handed
+    directly to the next waiter, so queued requests cannot be overtaken by new
+    arrivals. Requests are rejected when the queue is full or when they wait
+    longer than queue_timeout seconds.
+    """
+    def __init__(self, name: str, max_in_flight: int, max_queue: int = 100, queue_timeout: Optional[float] = 30):
+        if max_in_flight < 1:
+            raise ValueError(f"max_in_flight for {name} must be at least 1")
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._queue: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self.max_queue_depth = 0
+        self.wait_time: Dict[str, LatencyRecorder] = {}
+
+    async def acquire(self, priority: str = "interactive") -> None:
+        start_time = time.perf_counter()
+        if self.in_flight < self.max_in_flight and not self._queue:
+            self.in_flight += 1
+        else:
+            if len(self._queue) >= self.max_queue:
+                self.rejected_full += 1
+                raise QueueFullError(f"{self.name} queue is full ({self.max_queue} waiting)")
+            future = asyncio.get_running_loop().create_future()
+            entry = (PRIORITIES.get(priority, len(PRIORITIES)), next(self._sequence), future)
+            heapq.heappush(self._queue, entry)
+            self.max_queue_depth = max(self.max_queue_depth, len(self._queue))
+            try:
+                await asyncio.wait_for(future, timeout=self.queue_timeout)
+            except asyncio.TimeoutError:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over right at the deadline
+                    self.release()
+                else:
+                    self._remove(entry)
+                self.rejected_timeout += 1
+                raise QueueTimeoutError(
+                    f"{self.name} queue wait exceeded {self.queue_timeout}s"
+                ) from None
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # The slot was handed over just before the caller went away
+                    self.release()
+                else:
+                    self._remove(entry)
+                raise
+        self.admitted += 1
+        self.wait_time.setdefault(priority, LatencyRecorder()).record(time.perf_counter() - start_time)
+
+    def _remove(self, entry: Tuple[int, int, asyncio.Future]) -> None:
+        if entry in self._queue:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+
+    def release(self) -> None:
+        # Hand the slot to the next live waiter, the in-flight count stays the same
+        while self._queue:
+            _, _, future = heapq.heappop(self._queue)
+            if not future.done():
+                future.set_result(None)
+                return
+        self.in_flight -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": len(self._queue),
+            "max_queue_depth": self.max_queue_depth,
+            "admitted": self.admitted,
+            "rejected_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_time": {priority: recorder.stats() for priority, recorder in self.wait_time.items()}
+        }
+
+class AdmissionController:
+    """Per-provider and per-model concurrency limits
+
+    limits maps a provider name to {"max_in_flight": n, "models": {model: {"max_in_flight": m}}};
+    either level may be omitted. A request first waits for its model slot, then for the
+    provider slot, so a saturated model does not hold provider slots while queued.
+    """
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Dict[str, Any]]] = None,
+        default_models: Optional[Dict[str, str]] = None,
+        max_queue: int = 100,
+        queue_timeout: Optional[float] = 30
+    ):
+        self.default_models = default_models or {}
+        self.limiters: Dict[str, ConcurrencyLimiter] = {}
+        for provider, config in (limits or {}).items():
+            config = config or {}
+            options = {
+                "max_queue": config.get("max_queue", max_queue),
+                "queue_timeout": config.get("queue_timeout", queue_timeout)
+            }
+            if config.get("max_in_flight"):
+                self.limiters[provider] = ConcurrencyLimiter(provider, config["max_in_flight"], **options)
+            for model, model_config in (config.get("models") or {}).items():
+                if model_config and model_config.get("max_in_flight"):
+                    name = f"{provider}/{model}"
+                    self.limiters[name] = ConcurrencyLimiter(name, model_config["max_in_flight"], **options)
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        provider: str,
+        model: Optional[str] = None,
+        priority: str = "interactive"
+    ) -> AsyncIterator[None]:
+        """Hold an admission slot for one upstream request"""
+        model = model or self.default_models.get(provider)
+        limiters = [
+            limiter for limiter in (self.limiters.get(f"{provider}/{model}"), self.limiters.get(provider))
+            if limiter is not None
+        ]
+        async with AsyncExitStack() as stack:
+            for limiter in limiters:
+                await limiter.acquire(priority)
+                stack.callback(limiter.release)
+            yield
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: limiter.stats() for name, limiter in self.limiters.items()}
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List, TypeVar, Union
+from typing import Dict, Any, Optional, List, TypeVar, Union, AsyncIterator
 
 T = TypeVar('T')
 
@@ -24,4 +24,26 @@ class BaseLLMProvider(ABC):
 
     @abstractmethod
     async def list_models(self) -> List[str]:
+        pass
+
+    async def stream_generate(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[str]:
+        """Yield the completion incrementally; providers without streaming yield it in one piece"""
+        yield await self.generate(prompt, context, **kwargs)
+
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[str]:
+        """Yield the chat reply incrementally; providers without streaming yield it in one piece"""
+        yield await self.chat(messages, context, **kwargs)
+
+    async def close(self) -> None:
+        """Release network resources held by the provider"""
         pass 
\ No newline at end of file
@@ -1,4 +1,6 @@
-from typing import Dict, Any, Optional, List, TypedDict, cast
+from typing import Dict, Any, Optional, List, TypedDict, AsyncIterator, cast
+import asyncio
+import json
 import aiohttp
 from src.core.providers.base_provider import BaseLLMProvider
 from src.core.config.settings import settings
@@ -13,6 +15,37 @@ class OllamaProvider(BaseLLMProvider):
         self.base_url = settings.get("llm.providers.ollama.base_url", "http://localhost:11434")
         self.default_model = settings.get("llm.providers.ollama.default_model", "llama3")
         self.available_models = settings.get("llm.providers.ollama.models", {})
+        self.http_config: Dict[str, Any] = settings.get("llm.providers.ollama.http", {})
+        # One long-lived session per event loop so requests reuse keep-alive connections
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the pooled session, creating it on first use in the running loop"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            config = self.http_config
+            connector = aiohttp.TCPConnector(
+                limit=config.get("pool_size", 100),
+                limit_per_host=config.get("pool_size_per_host", 32),
+                ttl_dns_cache=config.get("dns_cache_ttl", 300),
+                keepalive_timeout=config.get("keepalive_timeout", 60)
+            )
+            timeout = aiohttp.ClientTimeout(
+                total=config.get("timeout", 300),
+                connect=config.get("connect_timeout", 10),
+                sock_read=config.get("read_timeout", None)
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+            self._session_loop = loop
+        return self._session
+        
+    async def close(self) -> None:
+        """Close the pooled session and its connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
         
     def _get_model_config(self, model_name: str) -> ModelConfig:
         """Get model configuration"""
@@ -21,34 +54,64 @@ class OllamaProvider(BaseLLMProvider):
             "temperature": 0.7
         }))
         
-    async def generate(
-        self,
-        prompt: str,
-        context: Optional[Dict[str, Any]] = None,
-        **kwargs: Any
-    ) -> str:
+    def _request_config(self, prompt: str, stream: bool, kwargs: Dict[str, Any]) -> Dict[str, Any]:
         model_name = str(kwargs.get("model", self.default_model))
         model_config = self._get_model_config(model_name)
         
         # Merge default configuration and user configuration
-        request_config = {
+        return {
             "model": model_name,
             "prompt": prompt,
-            "stream": False,
+            "stream": stream,
             **model_config,
             **kwargs
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                f"{self.base_url}/api/generate",
-                json=request_config
-            ) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"Ollama API error: {error_text}")
-                result = await response.json()
-                return cast(str, result["response"])
+    async def generate(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> str:
+        async with self._get_session().post(
+            f"{self.base_url}/api/generate",
+            json=self._request_config(prompt, False, kwargs)
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"Ollama API error: {error_text}")
+            result = await response.json()
+            return cast(str, result["response"])
+                
+    async def stream_generate(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[str]:
+        """Stream the completion from Ollama's NDJSON response, one object per line"""
+        async with self._get_session().post(
+            f"{self.base_url}/api/generate",
+            json=self._request_config(prompt, True, kwargs)
+        ) as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"Ollama API error: {error_text}")
+            async for line in response.content:
+                if not line.strip():
+                    continue
+                chunk = json.loads(line)
+                if "error" in chunk:
+                    raise Exception(f"Ollama API error: {chunk['error']}")
+                if chunk.get("response"):
+                    yield cast(str, chunk["response"])
+                if chunk.get("done"):
+                    break
+                
+    @staticmethod
+    def _messages_to_prompt(messages: List[Dict[str, str]]) -> str:
+        # Convert message list to single prompt string
+        return "\n".join([f"{m['role']}: {m['content']}" for m in messages])
                 
     async def chat(
         self,
@@ -56,16 +119,22 @@ class OllamaProvider(BaseLLMProvider):
         context: Optional[Dict[str, Any]] = None,
         **kwargs: Any
     ) -> str:
-        # Convert message list to single prompt string
-        prompt = "\n".join([f"{m['role']}: {m['content']}" for m in messages])
-        return await self.generate(prompt, context, **kwargs)
+        return await self.generate(self._messages_to_prompt(messages), context, **kwargs)
+        
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[str]:
+        async for chunk in self.stream_generate(self._messages_to_prompt(messages), context, **kwargs):
+            yield chunk
 
     async def list_models(self) -> List[str]:
         """Get available model list"""
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{self.base_url}/api/tags") as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    raise Exception(f"Ollama API error: {error_text}")
-                result = await response.json()
-                return [str(model["name"]) for model in result["models"]] 
\ No newline at end of file
+        async with self._get_session().get(f"{self.base_url}/api/tags") as response:
+            if response.status != 200:
+                error_text = await response.text()
+                raise Exception(f"Ollama API error: {error_text}")
+            result = await response.json()
+            return [str(model["name"]) for model in result["models"]] 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from typing import Dict, Any, Optional, List, cast
+from typing import Dict, Any, Optional, List, AsyncIterator, cast
 from openai import AsyncOpenAI, OpenAIError
 from src.core.providers.base_provider import BaseLLMProvider
 
@@ -31,11 +31,42 @@ class OpenAIProvider(BaseLLMProvider):
                 return str(response.choices[0].message.content or "")
             return ""
         except Exception as e:
-            raise OpenAIError(message=f"OpenAI API错误: {str(e)}")
+            raise OpenAIError(f"OpenAI API错误: {str(e)}") from e
 
+    async def stream_generate(
+        self,
+        prompt: str,
+        context: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[str]:
+        async for chunk in self.stream_chat([{"role": "user", "content": prompt}], context, **kwargs):
+            yield chunk
+            
+    async def stream_chat(
+        self,
+        messages: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]] = None,
+        **kwargs: Any
+    ) -> AsyncIterator[str]:
+        model = kwargs.get("model", "gpt-3.5-turbo")
+        try:
+            stream = await self.client.chat.completions.create(
+                model=model,
+                messages=messages,
+                stream=True
+            )
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        except Exception as e:
+            raise OpenAIError(f"OpenAI API错误: {str(e)}") from e
+
+    async def close(self) -> None:
+        await self.client.close()
+        
     async def list_models(self) -> List[str]:
         try:
             models = await self.client.models.list()
             return [str(model.id) for model in models.data if model.id]
         except Exception as e:
-            raise OpenAIError(message=f"获取模型列表失败: {str(e)}") 
\ No newline at end of file
+            raise OpenAIError(f"获取模型列表失败: {str(e)}") from e 
\ No newline at end of file
@@ -0,0 +1,274 @@
+from typing import Dict, Any, Optional, List, Tuple
+from src.core.providers.base_provider import BaseLLMProvider
+from src.core.providers.admission import AdmissionController
+from contextlib import nullcontext
+from src.core.metrics import LatencyRecorder
+import asyncio
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+class ProviderHealth:
+    """Latency and error statistics of one provider"""
+    def __init__(self, alpha: float, latency_window: int):
+        self.alpha = alpha
+        self.latency = LatencyRecorder(window=latency_window)
+        self.ewma_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.timeouts = 0
+
+    def record_success(self, seconds: float) -> None:
+        self.requests += 1
+        self.latency.record(seconds)
+        if self.ewma_latency is None:
+            self.ewma_latency = seconds
+        else:
+            self.ewma_latency += self.alpha * (seconds - self.ewma_latency)
+        self.error_rate *= 1 - self.alpha
+
+    def record_failure(self, timeout: bool = False) -> None:
+        self.requests += 1
+        self.failures += 1
+        if timeout:
+            self.timeouts += 1
+        self.error_rate += self.alpha * (1 - self.error_rate)
+
+    def score(self) -> Optional[float]:
+        """Expected cost of a request: EWMA latency inflated by the error rate"""
+        if self.ewma_latency is None:
+            return None
+        return self.ewma_latency / max(1 - self.error_rate, 0.05)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "failures": self.failures,
+            "timeouts": self.timeouts,
+            "error_rate": self.error_rate,
+            "ewma_latency_ms": self.ewma_latency * 1000 if self.ewma_latency is not None else None,
+            "latency": self.latency.stats()
+        }
+
+class ProviderRouter:
+    """Route chat requests across providers
+
+    Providers are tried in order of their score (EWMA latency divided by the
+    success rate); providers without samples keep their configured order after the
+    measured ones, and an explicitly requested provider always goes first. Errors
+    and timeouts fail over to the next provider. With hedging enabled, a second
+    request is sent to the next provider once the first has been running longer
+    than its p95 latency; the first successful reply wins and the other request is
+    cancelled. models lists the models each provider serves, its default model first;
+    providers without an entry are assumed to serve any model. When a model is
+    requested, only providers that serve it are tried, so a reply never silently
+    comes from a different model. With an admission controller, every attempt first waits for
+    a slot of its provider and model; a rejected attempt fails over like an error
+    but does not count against the provider's health.
+    """
+    def __init__(
+        self,
+        providers: Dict[str, BaseLLMProvider],
+        order: Optional[List[str]] = None,
+        failover: bool = True,
+        timeout: Optional[float] = 60,
+        hedge: bool = False,
+        hedge_quantile: float = 95,
+        hedge_min_samples: int = 20,
+        hedge_min_delay: float = 0.05,
+        ewma_alpha: float = 0.3,
+        latency_window: int = 1000,
+        admission: Optional[AdmissionController] = None,
+        models: Optional[Dict[str, List[str]]] = None
+    ):
+        self.providers = providers
+        self.admission = admission
+        self.models = models or {}
+        self.order = [name for name in (order or []) if name in providers]
+        self.order += [name for name in providers if name not in self.order]
+        self.failover = failover
+        self.timeout = timeout
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.health: Dict[str, ProviderHealth] = {
+            name: ProviderHealth(ewma_alpha, latency_window) for name in self.order
+        }
+        self.failovers = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+
+    def serves(self, name: str, model: Optional[str]) -> bool:
+        """Whether the provider serves the model (any model when none is requested)"""
+        return model is None or name not in self.models or model in self.models[name]
+
+    def model_for(self, name: str, model: Optional[str] = None) -> Optional[str]:
+        """The model that answers a request sent to this provider"""
+        if model is not None:
+            return model
+        return self.models[name][0] if self.models.get(name) else None
+
+    def candidates(self, preferred: Optional[str] = None, model: Optional[str] = None) -> List[str]:
+        """Providers in the order they should be tried, limited to those serving the model"""
+        if preferred is not None and preferred not in self.providers:
+            raise ValueError(f"Provider {preferred} not found")
+        if preferred is not None and not self.failover:
+            return [preferred]
+        measured = sorted(
+            (name for name in self.order if self.health[name].score() is not None),
+            key=lambda name: self.health[name].score()
+        )
+        ranked = measured + [name for name in self.order if name not in measured]
+        ranked = [name for name in ranked if self.serves(name, model)]
+        if preferred is not None:
+            if preferred in ranked:
+                ranked.remove(preferred)
+            ranked.insert(0, preferred)
+        elif not ranked:
+            raise ValueError(f"No provider serves model {model}")
+        return ranked if self.failover else ranked[:1]
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """Delay before hedging a request to this provider, None until enough samples"""
+        health = self.health[name]
+        if health.latency.count < self.hedge_min_samples:
+            return None
+        return max(health.latency.percentile(self.hedge_quantile), self.hedge_min_delay)
+
+    async def _attempt(
+        self,
+        name: str,
+        messages: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]],
+        kwargs: Dict[str, Any],
+        priority: str = "interactive"
+    ) -> str:
+        slot = (
+            self.admission.slot(name, kwargs.get("model"), priority)
+            if self.admission is not None else nullcontext()
+        )
+        async with slot:
+            return await self._send(name, messages, context, kwargs)
+
+    async def _send(
+        self,
+        name: str,
+        messages: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]],
+        kwargs: Dict[str, Any]
+    ) -> str:
+        health = self.health[name]
+        start_time = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(
+                self.providers[name].chat(messages, context, **kwargs),
+                timeout=self.timeout
+            )
+        except asyncio.TimeoutError:
+            health.record_failure(timeout=True)
+            raise
+        except asyncio.CancelledError:
+            # The losing side of a hedged request; not a provider failure
+            raise
+        except Exception:
+            health.record_failure()
+            raise
+        if not response:
+            health.record_failure()
+            raise ValueError(f"Empty response from LLM provider {name}")
+        health.record_success(time.perf_counter() - start_time)
+        return response
+
+    async def _hedged(
+        self,
+        primary: Tuple[str, Dict[str, Any]],
+        secondary: Optional[Tuple[str, Dict[str, Any]]],
+        messages: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]],
+        attempted: List[str],
+        priority: str = "interactive"
+    ) -> Tuple[str, str]:
+        """Run the primary request, hedging to the secondary after the p95 delay"""
+        attempted.append(primary[0])
+        first = asyncio.ensure_future(self._attempt(primary[0], messages, context, primary[1], priority))
+        pending = {first: primary[0]}
+        try:
+            delay = self.hedge_delay(primary[0]) if self.hedge and secondary is not None else None
+            if delay is not None:
+                done, _ = await asyncio.wait({first}, timeout=delay)
+                if not done:
+                    self.hedged += 1
+                    attempted.append(secondary[0])
+                    second = asyncio.ensure_future(self._attempt(secondary[0], messages, context, secondary[1], priority))
+                    pending[second] = secondary[0]
+
+            error: Optional[BaseException] = None
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name = pending.pop(task)
+                    if task.exception() is None:
+                        if name != primary[0]:
+                            self.hedge_wins += 1
+                        return name, task.result()
+                    error = task.exception()
+                    logger.warning(f"Provider {name} failed: {error!r}")
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def chat(
+        self,
+        messages: List[Dict[str, str]],
+        context: Optional[Dict[str, Any]] = None,
+        provider: Optional[str] = None,
+        priority: str = "interactive",
+        **kwargs: Any
+    ) -> Tuple[str, str]:
+        """Send the chat request, returning (provider name, response)
+
+        Without a requested model every provider answers with its default model; the
+        provider and model that answered are logged when a fallback served the request.
+        """
+        model = kwargs.get("model")
+        candidates = self.candidates(provider, model)
+        requests = [(name, kwargs) for name in candidates]
+
+        attempted: List[str] = []
+        last_error: Optional[BaseException] = None
+        while len(attempted) < len(requests):
+            remaining = requests[len(attempted):]
+            if attempted:
+                self.failovers += 1
+            try:
+                served_by, response = await self._hedged(
+                    remaining[0],
+                    remaining[1] if len(remaining) > 1 else None,
+                    messages,
+                    context,
+                    attempted,
+                    priority
+                )
+            except Exception as e:
+                last_error = e
+                continue
+            if served_by != candidates[0]:
+                logger.warning(
+                    f"Request for {candidates[0]} ({self.model_for(candidates[0], model)}) "
+                    f"was served by {served_by} ({self.model_for(served_by, model)})"
+                )
+            return served_by, response
+        raise last_error
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "order": self.candidates(),
+            "failovers": self.failovers,
+            "hedged": self.hedged,
+            "hedge_wins": self.hedge_wins,
+            "providers": {name: health.stats() for name, health in self.health.items()}
+        }
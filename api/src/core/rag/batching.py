@@ -0,0 +1,88 @@
+from typing import Dict, Any, List, Tuple, Callable, Awaitable, Optional
+from collections import Counter, deque
+import numpy as np
+import asyncio
+import time
+
+class MicroBatchEmbedder:
+    """合并并发查询的嵌入请求
+
+    在 max_wait_ms 时间窗口内到达的查询（最多 max_batch_size 条）合并为一次 encode 调用，
+    再把结果分发给各个等待的协程。相同文本在同一批次中只计算一次。
+    """
+    def __init__(
+        self,
+        encode: Callable[[List[str]], Awaitable[np.ndarray]],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        latency_window: int = 10000
+    ):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._pending: List[Tuple[str, asyncio.Future, float]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set = set()
+
+        self.batches = 0
+        self.items = 0
+        self.batch_sizes: Counter = Counter()
+        self._latencies: deque = deque(maxlen=latency_window)
+
+    async def embed(self, text: str) -> np.ndarray:
+        """获取单条文本的嵌入，可能与其它并发请求合并计算"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        batch, self._pending = self._pending[:self.max_batch_size], self._pending[self.max_batch_size:]
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        if self._pending:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush)
+
+    async def _run_batch(self, batch: List[Tuple[str, asyncio.Future, float]]) -> None:
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        self.batches += 1
+        self.items += len(batch)
+        self.batch_sizes[len(batch)] += 1
+        try:
+            embeddings = await self.encode(texts)
+        except Exception as e:
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        rows = {text: row for row, text in enumerate(texts)}
+        now = time.perf_counter()
+        for text, future, enqueued_at in batch:
+            self._latencies.append(now - enqueued_at)
+            if not future.done():
+                future.set_result(embeddings[rows[text]])
+
+    def stats(self) -> Dict[str, Any]:
+        """返回批次数、平均批大小、批大小分布和 p50/p99 延迟"""
+        latencies = np.array(self._latencies) * 1000 if self._latencies else np.zeros(1)
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": self.items / self.batches if self.batches else 0.0,
+            "batch_size_histogram": dict(sorted(self.batch_sizes.items())),
+            "pending": len(self._pending),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99))
+        }
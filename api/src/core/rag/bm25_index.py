@@ -0,0 +1,188 @@
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+from array import array
+import numpy as np
+import json
+import os
+from .chunking import tokenize_spans
+
+VOCAB_FILE = "bm25_vocab.json"
+POSTING_IDS_FILE = "bm25_ids.npy"
+POSTING_TFS_FILE = "bm25_tfs.npy"
+POSTING_OFFSETS_FILE = "bm25_offsets.npy"
+DOC_LENGTHS_FILE = "bm25_doc_lengths.npy"
+
+def tokenize(text: str) -> List[str]:
+    """BM25 使用的分词：与分块计数相同的规则，统一小写"""
+    return [text[start:end].lower() for start, end in tokenize_spans(text)]
+
+def analyze(texts: Iterable[str]) -> List[Tuple[int, Dict[str, int]]]:
+    """分词并统计词频，返回每个文档的 (词数, 词频)；不访问索引，可放到执行器中运行"""
+    analyzed = []
+    for text in texts:
+        terms = tokenize(text)
+        frequencies: Dict[str, int] = {}
+        for term in terms:
+            frequencies[term] = frequencies.get(term, 0) + 1
+        analyzed.append((len(terms), frequencies))
+    return analyzed
+
+class BM25Index:
+    """进程内 BM25 倒排索引
+
+    每个词的倒排列表用 array('q') 存放文档ID、array('I') 存放词频，文档长度按文档ID
+    存放在 array('I') 中，相比 Python 字典/列表占用内存小得多。文档ID与向量索引共用。
+    """
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self._posting_ids: List[array] = []
+        self._posting_tfs: List[array] = []
+        self._doc_lengths = array("I")
+        self._deleted = set()
+        self._doc_count = 0
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return self._doc_count
+
+    def add(self, doc_ids: Iterable[int], texts: Iterable[str]) -> None:
+        """添加文档，doc_ids 需大于所有已添加的ID"""
+        self.add_analyzed(doc_ids, analyze(texts))
+
+    def add_analyzed(self, doc_ids: Iterable[int], analyzed: Iterable[Tuple[int, Dict[str, int]]]) -> None:
+        """添加已由 analyze() 分词的文档，doc_ids 需大于所有已添加的ID"""
+        for doc_id, (length, frequencies) in zip(doc_ids, analyzed):
+            if doc_id >= len(self._doc_lengths):
+                self._doc_lengths.extend([0] * (doc_id + 1 - len(self._doc_lengths)))
+            self._doc_lengths[doc_id] = length
+            self._doc_count += 1
+            self._total_length += length
+
+            for term, tf in frequencies.items():
+                term_id = self.vocab.get(term)
+                if term_id is None:
+                    term_id = len(self._posting_ids)
+                    self.vocab[term] = term_id
+                    self._posting_ids.append(array("q"))
+                    self._posting_tfs.append(array("I"))
+                self._posting_ids[term_id].append(doc_id)
+                self._posting_tfs[term_id].append(tf)
+
+    def remove(self, doc_ids: Iterable[int]) -> None:
+        """删除文档：只标记删除并更新统计量，倒排列表在 compact() 时清理"""
+        for doc_id in doc_ids:
+            if doc_id in self._deleted or doc_id >= len(self._doc_lengths):
+                continue
+            self._deleted.add(doc_id)
+            self._doc_count -= 1
+            self._total_length -= self._doc_lengths[doc_id]
+            self._doc_lengths[doc_id] = 0
+        if len(self._deleted) > max(1000, self._doc_count // 5):
+            self.compact()
+
+    def compact(self) -> None:
+        """从倒排列表中清除已删除的文档"""
+        if not self._deleted:
+            return
+        deleted = np.fromiter(self._deleted, dtype=np.int64)
+        for term_id, ids in enumerate(self._posting_ids):
+            ids_array = np.frombuffer(ids, dtype=np.int64)
+            keep = ~np.isin(ids_array, deleted)
+            if keep.all():
+                continue
+            tfs_array = np.frombuffer(self._posting_tfs[term_id], dtype=np.uint32)
+            self._posting_ids[term_id] = array("q", ids_array[keep].tobytes())
+            self._posting_tfs[term_id] = array("I", tfs_array[keep].tobytes())
+        self._deleted.clear()
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 10,
+        allowed_ids: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """返回 BM25 得分最高的 (文档ID, 得分)，allowed_ids 不为空时只在这些文档中检索"""
+        if not self._doc_count:
+            return []
+        term_ids = {self.vocab[term] for term in tokenize(query) if term in self.vocab}
+        if not term_ids:
+            return []
+
+        lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32).astype(np.float32)
+        avg_length = self._total_length / self._doc_count
+        scores = np.zeros(len(lengths), dtype=np.float32)
+        for term_id in term_ids:
+            ids = np.frombuffer(self._posting_ids[term_id], dtype=np.int64)
+            tfs = np.frombuffer(self._posting_tfs[term_id], dtype=np.uint32).astype(np.float32)
+            idf = np.log(1 + (self._doc_count - len(ids) + 0.5) / (len(ids) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths[ids] / avg_length)
+            scores[ids] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+        if self._deleted:
+            scores[np.fromiter(self._deleted, dtype=np.int64)] = 0
+        if allowed_ids is not None:
+            allowed = np.zeros(len(scores), dtype=bool)
+            allowed[allowed_ids[allowed_ids < len(scores)]] = True
+            scores[~allowed] = 0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k)[:top_k]]
+        order = candidates[np.argsort(-scores[candidates])]
+        return [(int(doc_id), float(scores[doc_id])) for doc_id in order]
+
+    def stats(self) -> Dict[str, Any]:
+        postings = sum(len(ids) for ids in self._posting_ids)
+        return {
+            "documents": self._doc_count,
+            "terms": len(self.vocab),
+            "postings": postings,
+            "array_bytes": postings * 12 + len(self._doc_lengths) * 4
+        }
+
+    def save(self, directory: str) -> None:
+        """把倒排索引展平为数组保存"""
+        self.compact()
+        counts = [len(ids) for ids in self._posting_ids]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        ids = np.frombuffer(b"".join(ids.tobytes() for ids in self._posting_ids), dtype=np.int64)
+        tfs = np.frombuffer(b"".join(tfs.tobytes() for tfs in self._posting_tfs), dtype=np.uint32)
+        np.save(os.path.join(directory, POSTING_IDS_FILE), ids)
+        np.save(os.path.join(directory, POSTING_TFS_FILE), tfs)
+        np.save(os.path.join(directory, POSTING_OFFSETS_FILE), offsets)
+        np.save(os.path.join(directory, DOC_LENGTHS_FILE), np.frombuffer(self._doc_lengths, dtype=np.uint32))
+        terms = sorted(self.vocab, key=self.vocab.get)
+        with open(os.path.join(directory, VOCAB_FILE), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": terms}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str, live_ids: Iterable[int]) -> "BM25Index":
+        """加载倒排索引，live_ids 之外的文档视为已删除"""
+        with open(os.path.join(directory, VOCAB_FILE), "r", encoding="utf-8") as f:
+            vocab = json.load(f)
+        index = cls(k1=vocab["k1"], b=vocab["b"])
+        index.vocab = {term: term_id for term_id, term in enumerate(vocab["terms"])}
+        ids = np.load(os.path.join(directory, POSTING_IDS_FILE))
+        tfs = np.load(os.path.join(directory, POSTING_TFS_FILE))
+        offsets = np.load(os.path.join(directory, POSTING_OFFSETS_FILE))
+        for start, end in zip(offsets[:-1], offsets[1:]):
+            index._posting_ids.append(array("q", ids[start:end].tobytes()))
+            index._posting_tfs.append(array("I", tfs[start:end].tobytes()))
+        index._doc_lengths = array("I", np.load(os.path.join(directory, DOC_LENGTHS_FILE)).tobytes())
+
+        live = np.zeros(len(index._doc_lengths), dtype=bool)
+        live_ids = np.fromiter(live_ids, dtype=np.int64)
+        live[live_ids[live_ids < len(live)]] = True
+        lengths = np.frombuffer(index._doc_lengths, dtype=np.uint32)
+        index._doc_count = int(live.sum())
+        index._total_length = int(lengths[live].sum())
+        return index
+
+def reciprocal_rank_fusion(rankings: List[List[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """倒数排名融合：score(d) = Σ 1 / (k + rank)，rank 从 1 开始"""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,109 @@
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable
+from .document_store import Document
+import re
+
+# 中日韩字符按单字计数，其余按单词和标点计数，近似子词分词器的 token 数
+_TOKEN_PATTERN = re.compile(r"[぀-ヿ㐀-䶿一-鿿가-힯]|\w+|[^\w\s]")
+# 句子边界：中英文句末标点、后接空白的英文句号，或空行
+_SENTENCE_BOUNDARY = re.compile(r"[。！？!?；;]+|\.(?=\s|$)|\n\s*\n")
+
+def tokenize_spans(text: str) -> List[Tuple[int, int]]:
+    """返回每个 token 在原文中的 (起始, 结束) 位置"""
+    return [match.span() for match in _TOKEN_PATTERN.finditer(text)]
+
+def count_tokens(text: str) -> int:
+    """快速估算文本的 token 数，无需加载模型分词器"""
+    return sum(1 for _ in _TOKEN_PATTERN.finditer(text))
+
+def split_sentences(text: str) -> List[Tuple[int, int]]:
+    """按句子切分，返回每个句子在原文中的 (起始, 结束) 位置"""
+    spans = []
+    start = 0
+    for match in _SENTENCE_BOUNDARY.finditer(text):
+        end = match.end()
+        if text[start:end].strip():
+            spans.append((start, end))
+        start = end
+    if text[start:].strip():
+        spans.append((start, len(text)))
+    return spans
+
+class TextChunker:
+    """文本分块器
+
+    mode 为 "sentence" 时按句子累积到 chunk_size 个 token，相邻块之间重叠不超过
+    overlap 个 token 的完整句子；超长句子及 "token" 模式按 token 滑动窗口切分。
+    token_counter 可替换为嵌入模型的分词器以获得精确计数。
+    """
+    def __init__(
+        self,
+        chunk_size: int = 256,
+        overlap: int = 32,
+        mode: str = "sentence",
+        token_counter: Optional[Callable[[str], int]] = None
+    ):
+        if mode not in ("sentence", "token"):
+            raise ValueError(f"不支持的分块模式: {mode}")
+        if overlap >= chunk_size:
+            raise ValueError("重叠长度必须小于分块长度")
+        self.chunk_size = chunk_size
+        self.overlap = overlap
+        self.mode = mode
+        self.count_tokens = token_counter or count_tokens
+
+    def split(self, text: str) -> Iterator[Tuple[int, int]]:
+        """生成每个分块在原文中的 (起始, 结束) 位置"""
+        if self.mode == "token":
+            yield from self._split_tokens(text, 0, len(text))
+            return
+
+        window: List[Tuple[int, int, int]] = []  # (起始, 结束, token 数)
+        window_tokens = 0
+        for start, end in split_sentences(text):
+            tokens = self.count_tokens(text[start:end])
+            if tokens > self.chunk_size:
+                # 超长句子先输出已累积的块，再按 token 窗口切分
+                if window:
+                    yield window[0][0], window[-1][1]
+                    window, window_tokens = [], 0
+                yield from self._split_tokens(text, start, end)
+                continue
+
+            if window and window_tokens + tokens > self.chunk_size:
+                yield window[0][0], window[-1][1]
+                # 保留末尾不超过 overlap 个 token 的句子作为下一块的开头
+                while window and (window_tokens > self.overlap or window_tokens + tokens > self.chunk_size):
+                    window_tokens -= window.pop(0)[2]
+            window.append((start, end, tokens))
+            window_tokens += tokens
+
+        if window:
+            yield window[0][0], window[-1][1]
+
+    def _split_tokens(self, text: str, start: int, end: int) -> Iterator[Tuple[int, int]]:
+        spans = tokenize_spans(text[start:end])
+        step = self.chunk_size - self.overlap
+        for i in range(0, max(len(spans) - self.overlap, 1), step):
+            window = spans[i:i + self.chunk_size]
+            if window:
+                yield start + window[0][0], start + window[-1][1]
+
+    def chunk(self, text: str, metadata: Optional[Dict[str, Any]] = None) -> Iterator[Document]:
+        """把文本切分为带位置元数据的文档块"""
+        chunk_index = 0
+        for start, end in self.split(text):
+            content = text[start:end]
+            stripped = content.strip()
+            if not stripped:
+                continue
+            start += len(content) - len(content.lstrip())
+            yield Document(
+                content=stripped,
+                metadata={
+                    **(metadata or {}),
+                    "chunk_index": chunk_index,
+                    "start_offset": start,
+                    "end_offset": start + len(stripped)
+                }
+            )
+            chunk_index += 1
@@ -0,0 +1,84 @@
+from typing import List, Optional, Callable, Set
+from pydantic import BaseModel
+from .document_store import Document
+from .chunking import count_tokens, split_sentences, tokenize_spans
+
+class PackedContext(BaseModel):
+    text: str
+    tokens: int
+    documents: int
+    duplicate_sentences: int = 0
+    truncated: bool = False
+
+def _normalize(sentence: str) -> str:
+    return " ".join(sentence.split())
+
+class ContextPacker:
+    """按 token 预算组装检索上下文
+
+    按检索排序依次加入文档，以句子为单位去重（相邻分块的重叠句子、不同来源的重复内容
+    只保留第一次出现），放不下时在句子边界截断并停止加入后续文档。只有第一个句子就超过
+    预算时才按 token 截断。token_counter 默认使用分块时的快速估算，可替换为模型分词器。
+    """
+    def __init__(
+        self,
+        token_counter: Optional[Callable[[str], int]] = None,
+        separator: str = "\n\n"
+    ):
+        self.count_tokens = token_counter or count_tokens
+        self.separator = separator
+        self.separator_tokens = self.count_tokens(separator)
+
+    def pack(self, documents: List[Document], budget: int) -> PackedContext:
+        """把文档装入不超过 budget 个 token 的上下文"""
+        parts: List[str] = []
+        seen: Set[str] = set()
+        used = 0
+        packed_documents = 0
+        duplicates = 0
+        truncated = False
+
+        for doc in documents:
+            sentences: List[str] = []
+            doc_tokens = self.separator_tokens if parts else 0
+            for start, end in split_sentences(doc.content):
+                # 保留句子之间的原始空白，未删句时拼接结果与原文一致
+                sentence = doc.content[start:end]
+                key = _normalize(sentence)
+                if key in seen:
+                    duplicates += 1
+                    continue
+                tokens = self.count_tokens(sentence)
+                if used + doc_tokens + tokens > budget:
+                    truncated = True
+                    if not parts and not sentences:
+                        # 第一个句子就超过预算，只能按 token 截断
+                        sentence = self._truncate_tokens(sentence, budget)
+                        if sentence:
+                            sentences.append(sentence)
+                            doc_tokens = self.count_tokens(sentence)
+                    break
+                seen.add(key)
+                sentences.append(sentence)
+                doc_tokens += tokens
+
+            if sentences:
+                parts.append("".join(sentences).strip())
+                used += doc_tokens
+                packed_documents += 1
+            if truncated:
+                break
+
+        return PackedContext(
+            text=self.separator.join(parts),
+            tokens=used,
+            documents=packed_documents,
+            duplicate_sentences=duplicates,
+            truncated=truncated
+        )
+
+    def _truncate_tokens(self, text: str, budget: int) -> str:
+        spans = tokenize_spans(text)
+        if budget <= 0 or not spans:
+            return ""
+        return text[:spans[min(budget, len(spans)) - 1][1]]
@@ -13,7 +13,12 @@ class BaseDocumentStore(ABC):
         pass
     
     @abstractmethod
-    async def search(self, query: str, top_k: int = 5) -> List[Document]:
+    async def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
         pass
     
     @abstractmethod
@@ -27,9 +32,20 @@ class InMemoryDocumentStore(BaseDocumentStore):
     async def add_documents(self, documents: List[Document]) -> None:
         self.documents.extend(documents)
         
-    async def search(self, query: str, top_k: int = 5) -> List[Document]:
+    async def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
         # 简单实现，实际应该使用向量相似度搜索
-        return self.documents[:top_k]
+        documents = self.documents
+        if filter:
+            documents = [
+                doc for doc in documents
+                if all(doc.metadata.get(k) == v for k, v in filter.items())
+            ]
+        return documents[:top_k]
         
     async def delete_documents(self, filter: Dict[str, Any]) -> None:
         self.documents = [
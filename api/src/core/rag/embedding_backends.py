@@ -0,0 +1,169 @@
+from typing import List, Dict, Any, Optional, Union
+from abc import ABC, abstractmethod
+import numpy as np
+import json
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 嵌入后端类型：sentence_transformers 使用 PyTorch 模型，onnx 使用导出的 ONNX 模型
+EMBEDDING_BACKENDS = ("sentence_transformers", "onnx")
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILE = "model_quantized.onnx"
+
+class EmbeddingBackend(ABC):
+    """嵌入后端接口，与 SentenceTransformer.encode 的常用参数兼容"""
+    @abstractmethod
+    def encode(
+        self,
+        texts: Union[str, List[str]],
+        batch_size: int = 32,
+        **kwargs: Any
+    ) -> np.ndarray:
+        pass
+
+def default_onnx_model_dir(embedding_model: str, cache_dir: Optional[str]) -> str:
+    """导出脚本默认的 ONNX 模型目录：<cache_dir>/onnx/<模型名>"""
+    return os.path.join(cache_dir or "cache", "onnx", embedding_model.replace("/", "__"))
+
+def pool_embeddings(
+    token_embeddings: np.ndarray,
+    attention_mask: np.ndarray,
+    mode: str = "mean"
+) -> np.ndarray:
+    """按 sentence-transformers 的池化方式把 token 向量合成句向量"""
+    if mode == "cls":
+        return token_embeddings[:, 0]
+    mask = attention_mask[..., None].astype(token_embeddings.dtype)
+    if mode == "max":
+        masked = np.where(mask > 0, token_embeddings, -np.inf)
+        return masked.max(axis=1)
+    if mode == "mean":
+        summed = (token_embeddings * mask).sum(axis=1)
+        return summed / np.clip(mask.sum(axis=1), 1e-9, None)
+    raise ValueError(f"不支持的池化方式: {mode}")
+
+class ONNXEmbeddingBackend(EmbeddingBackend):
+    """使用 ONNX Runtime 在 CPU 上推理的嵌入后端
+
+    model_dir 为 scripts/export_onnx_model.py 导出的目录，包含 model.onnx（或 int8 量化的
+    model_quantized.onnx）、tokenizer.json 以及 sentence-transformers 的池化和归一化配置，
+    只从本地文件加载，不访问网络。
+    """
+    def __init__(
+        self,
+        model_dir: str,
+        quantized: bool = False,
+        max_length: Optional[int] = None,
+        threads: Optional[int] = None
+    ):
+        try:
+            import onnxruntime
+            from tokenizers import Tokenizer
+        except ImportError as e:
+            raise ImportError("ONNX 嵌入后端需要安装 onnxruntime 和 tokenizers") from e
+
+        model_path = os.path.join(model_dir, ONNX_QUANTIZED_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"ONNX 模型不存在: {model_path}，请先运行 scripts/export_onnx_model.py")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = onnxruntime.InferenceSession(
+            model_path,
+            sess_options=options,
+            providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+        config = self._read_config(model_dir)
+        self.max_length = max_length or config.get("max_seq_length", 128)
+        self.pooling = config["pooling"]
+        self.normalize = config["normalize"]
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_length)
+        self.tokenizer.enable_padding()
+        logger.info(
+            f"Loaded ONNX embedding model {model_path} "
+            f"(pooling={self.pooling}, normalize={self.normalize}, max_length={self.max_length})"
+        )
+
+    @staticmethod
+    def _read_config(model_dir: str) -> Dict[str, Any]:
+        """读取 sentence-transformers 保存的长度、池化和归一化配置"""
+        config: Dict[str, Any] = {"pooling": "mean", "normalize": False}
+        bert_config_path = os.path.join(model_dir, "sentence_bert_config.json")
+        if os.path.exists(bert_config_path):
+            with open(bert_config_path, "r", encoding="utf-8") as f:
+                config["max_seq_length"] = json.load(f).get("max_seq_length", 128)
+
+        modules_path = os.path.join(model_dir, "modules.json")
+        if os.path.exists(modules_path):
+            with open(modules_path, "r", encoding="utf-8") as f:
+                modules = json.load(f)
+            for module in modules:
+                if module["type"].endswith("Normalize"):
+                    config["normalize"] = True
+                if module["type"].endswith("Pooling"):
+                    pooling_path = os.path.join(model_dir, module["path"], "config.json")
+                    with open(pooling_path, "r", encoding="utf-8") as f:
+                        pooling = json.load(f)
+                    if pooling.get("pooling_mode_cls_token"):
+                        config["pooling"] = "cls"
+                    elif pooling.get("pooling_mode_max_tokens"):
+                        config["pooling"] = "max"
+        return config
+
+    def encode(
+        self,
+        texts: Union[str, List[str]],
+        batch_size: int = 32,
+        **kwargs: Any
+    ) -> np.ndarray:
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        if not batch:
+            return np.empty((0, 0), dtype="float32")
+
+        # 按长度排序后分批，减少每批的填充长度
+        order = np.argsort([-len(text) for text in batch], kind="stable")
+        embeddings: List[np.ndarray] = []
+        for start in range(0, len(batch), batch_size):
+            chunk = [batch[i] for i in order[start:start + batch_size]]
+            encodings = self.tokenizer.encode_batch(chunk)
+            inputs = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+            }
+            outputs = self.session.run(
+                None,
+                {name: value for name, value in inputs.items() if name in self.input_names}
+            )
+            embeddings.append(pool_embeddings(outputs[0], inputs["attention_mask"], self.pooling))
+
+        result = np.empty((len(batch), embeddings[0].shape[1]), dtype="float32")
+        result[order] = np.concatenate(embeddings)
+        if self.normalize:
+            result /= np.clip(np.linalg.norm(result, axis=1, keepdims=True), 1e-12, None)
+        return result[0] if single else result
+
+def create_onnx_backend(
+    embedding_model: str,
+    cache_dir: Optional[str] = None,
+    model_dir: Optional[str] = None,
+    quantized: bool = False,
+    max_length: Optional[int] = None,
+    threads: Optional[int] = None
+) -> ONNXEmbeddingBackend:
+    """按模型名在缓存目录中查找导出的 ONNX 模型并创建后端"""
+    return ONNXEmbeddingBackend(
+        model_dir or default_onnx_model_dir(embedding_model, cache_dir),
+        quantized=quantized,
+        max_length=max_length,
+        threads=threads
+    )
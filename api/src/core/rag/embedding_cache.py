@@ -0,0 +1,74 @@
+from typing import Dict, Any, Optional, Tuple
+from collections import OrderedDict
+import numpy as np
+import threading
+import time
+import unicodedata
+
+def normalize_query(text: str) -> str:
+    """规范化查询文本：统一 Unicode 形式并合并空白字符"""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+class EmbeddingCache:
+    """查询嵌入的 LRU/TTL 缓存，键为（模型名，规范化后的查询文本）
+
+    max_size 为最多缓存的向量数，ttl 为过期秒数（None 表示不过期）。
+    """
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, model_name: str, text: str) -> Optional[np.ndarray]:
+        key = (model_name, normalize_query(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            created_at, embedding = entry
+            if self.ttl is not None and time.monotonic() - created_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, model_name: str, text: str, embedding: np.ndarray) -> None:
+        if self.max_size <= 0:
+            return
+        key = (model_name, normalize_query(text))
+        # 缓存的向量设为只读，避免调用方修改后污染缓存
+        embedding = np.array(embedding, dtype="float32")
+        embedding.setflags(write=False)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """返回命中率等统计信息，用于评估缓存大小"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
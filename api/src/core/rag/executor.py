@@ -0,0 +1,93 @@
+from typing import Dict, Any, Optional, Callable, Tuple
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+import asyncio
+import time
+
+class OffloadExecutor:
+    """把CPU密集型调用放到线程池或进程池中执行，避免阻塞事件循环
+
+    max_concurrency 限制同时提交到池中的任务数，超出的调用在事件循环上排队等待；
+    排队深度和等待时间可通过 stats() 获取。
+    """
+    def __init__(
+        self,
+        kind: str = "thread",
+        max_workers: int = 2,
+        max_concurrency: Optional[int] = None,
+        name: str = "offload",
+        initializer: Optional[Callable[..., None]] = None,
+        initargs: Tuple[Any, ...] = ()
+    ):
+        if kind == "thread":
+            self._executor: Executor = ThreadPoolExecutor(
+                max_workers=max_workers,
+                thread_name_prefix=name,
+                initializer=initializer,
+                initargs=initargs
+            )
+        elif kind == "process":
+            self._executor = ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=initializer,
+                initargs=initargs
+            )
+        else:
+            raise ValueError(f"不支持的执行器类型: {kind}")
+
+        self.kind = kind
+        self.name = name
+        self.max_workers = max_workers
+        self.max_concurrency = max_concurrency or max_workers
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+        self.total_wait_seconds = 0.0
+        self.total_run_seconds = 0.0
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """在池中执行 func(*args, **kwargs) 并等待结果"""
+        enqueued_at = time.perf_counter()
+        self.queued += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queued)
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        started_at = time.perf_counter()
+        self.total_wait_seconds += started_at - enqueued_at
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, partial(func, *args, **kwargs))
+            self.completed += 1
+            return result
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.running -= 1
+            self.total_run_seconds += time.perf_counter() - started_at
+            self._semaphore.release()
+
+    def stats(self) -> Dict[str, Any]:
+        finished = self.completed + self.failed
+        return {
+            "kind": self.kind,
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "queue_depth": self.queued,
+            "max_queue_depth": self.max_queue_depth,
+            "running": self.running,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_wait_ms": self.total_wait_seconds / finished * 1000 if finished else 0.0,
+            "avg_run_ms": self.total_run_seconds / finished * 1000 if finished else 0.0
+        }
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._executor.shutdown(wait=wait)
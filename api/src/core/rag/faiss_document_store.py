@@ -1,9 +1,158 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Set, Tuple
 import numpy as np
 import faiss
 from .document_store import BaseDocumentStore, Document
-from sentence_transformers import SentenceTransformer
+from . import snapshot, bm25_index, metadata_index
+from .snapshot import DocumentCollection, MappedDocuments
+from .embedding_cache import EmbeddingCache
+from .executor import OffloadExecutor
+from .batching import MicroBatchEmbedder
+from .bm25_index import BM25Index, analyze, reciprocal_rank_fusion
+from .metadata_index import MetadataIndex, id_selector
+from .embedding_backends import EMBEDDING_BACKENDS, create_onnx_backend
+import asyncio
 import os
+import shutil
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# sentence_transformers 会导入 torch，耗时数秒，首次加载模型时才导入
+SentenceTransformer = None
+
+def _sentence_transformer_class():
+    global SentenceTransformer
+    if SentenceTransformer is None:
+        from sentence_transformers import SentenceTransformer as model_class
+        SentenceTransformer = model_class
+    return SentenceTransformer
+
+# 进程池工作进程中的嵌入模型，由 _init_embedding_worker 加载
+_worker_model = None
+
+def _init_embedding_worker(
+    embedding_model: str,
+    cache_dir: Optional[str],
+    backend: str = "sentence_transformers",
+    backend_options: Optional[Dict[str, Any]] = None
+) -> None:
+    """进程池初始化：每个工作进程加载一份嵌入模型"""
+    global _worker_model
+    if backend == "onnx":
+        _worker_model = create_onnx_backend(embedding_model, cache_dir, **(backend_options or {}))
+    else:
+        _worker_model = _sentence_transformer_class()(embedding_model, device='cpu', cache_folder=cache_dir)
+
+def _encode_in_worker(texts: List[str], batch_size: int) -> np.ndarray:
+    embeddings = _worker_model.encode(
+        texts,
+        batch_size=batch_size,
+        convert_to_numpy=True,
+        show_progress_bar=False
+    )
+    return np.asarray(embeddings, dtype='float32').reshape(len(texts), -1)
+
+# 倒排索引类型，原生支持按ID添加和删除
+IVF_INDEX_TYPES = ("ivf_flat", "ivf_sq8", "ivf_pq")
+# 需要训练的索引类型（倒排索引和量化压缩索引）
+TRAINED_INDEX_TYPES = IVF_INDEX_TYPES + ("sq8", "pq")
+# 检索模式：向量、BM25词法、两者倒数排名融合
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+# 不支持 remove_ids 的索引类型，删除时只记录墓碑，由后台压缩重建
+TOMBSTONE_INDEX_TYPES = ("hnsw",)
+
+def create_faiss_index(
+    index_type: str,
+    dimension: int,
+    metric: str = "l2",
+    nlist: int = 100,
+    nprobe: int = 10,
+    pq_m: int = 8,
+    hnsw_m: int = 32,
+    ef_search: int = 64
+) -> faiss.Index:
+    """根据索引类型创建FAISS索引
+
+    l2/ip 为暴力检索的平坦索引；ivf_flat、ivf_sq8、ivf_pq、hnsw 为近似最近邻索引；
+    sq8（每维1字节）和 pq（每向量 pq_m 字节）为量化压缩后的暴力检索索引。
+    除 l2/ip 外使用 metric 指定距离度量。
+    """
+    if index_type == "l2":
+        return faiss.IndexFlatL2(dimension)
+    if index_type == "ip":
+        return faiss.IndexFlatIP(dimension)
+    
+    if metric == "l2":
+        faiss_metric = faiss.METRIC_L2
+    elif metric == "ip":
+        faiss_metric = faiss.METRIC_INNER_PRODUCT
+    else:
+        raise ValueError(f"不支持的距离度量: {metric}")
+    
+    if index_type in ("pq", "ivf_pq") and dimension % pq_m != 0:
+        raise ValueError(f"向量维度 {dimension} 不能被 pq_m={pq_m} 整除")
+    
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss_metric)
+        index.hnsw.efSearch = ef_search
+        return index
+    if index_type == "sq8":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss_metric)
+    if index_type == "pq":
+        return faiss.IndexPQ(dimension, pq_m, 8, faiss_metric)
+    
+    if index_type in IVF_INDEX_TYPES:
+        if metric == "l2":
+            quantizer = faiss.IndexFlatL2(dimension)
+        else:
+            quantizer = faiss.IndexFlatIP(dimension)
+        if index_type == "ivf_flat":
+            index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss_metric)
+        elif index_type == "ivf_sq8":
+            index = faiss.IndexIVFScalarQuantizer(
+                quantizer, dimension, nlist, faiss.ScalarQuantizer.QT_8bit, faiss_metric
+            )
+        else:
+            index = faiss.IndexIVFPQ(quantizer, dimension, nlist, pq_m, 8, faiss_metric)
+        index.nprobe = nprobe
+        return index
+    
+    raise ValueError(f"不支持的索引类型: {index_type}")
+
+def min_training_size(index_type: str, nlist: int = 100) -> int:
+    """近似索引训练所需的最少向量数（FAISS建议每个聚类中心约39个样本）"""
+    if index_type in ("ivf_flat", "ivf_sq8"):
+        return nlist * 39
+    if index_type == "ivf_pq":
+        # PQ 码本使用 8 bit，每个子空间至少需要 256 个样本
+        return max(nlist * 39, 256)
+    if index_type == "pq":
+        return 256 * 39
+    if index_type == "sq8":
+        # 标量量化只需估计每一维的取值范围
+        return 1000
+    return 0
+
+def estimate_index_bytes(index: faiss.Index) -> int:
+    """估算FAISS索引占用的内存字节数（向量编码、ID映射和HNSW邻接表）"""
+    total = 0
+    if isinstance(index, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        # id_map 每个向量8字节，IndexIDMap2 还维护反向哈希表
+        total += index.ntotal * (40 if isinstance(index, faiss.IndexIDMap2) else 8)
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexIVF):
+        # 倒排列表中每个向量保存编码和8字节ID，另加聚类中心
+        total += index.ntotal * (index.code_size + 8) + index.nlist * index.d * 4
+    elif isinstance(index, faiss.IndexHNSW):
+        storage = faiss.downcast_index(index.storage)
+        total += index.ntotal * storage.code_size
+        # 第0层每个节点 2*M 个邻居，每个4字节
+        total += index.ntotal * index.hnsw.nb_neighbors(0) * 4
+    elif hasattr(index, "code_size"):
+        total += index.ntotal * index.code_size
+    return total
 
 class FAISSDocumentStore(BaseDocumentStore):
     def __init__(
@@ -11,122 +160,763 @@ class FAISSDocumentStore(BaseDocumentStore):
         embedding_model: str = "all-MiniLM-L6-v2",
         dimension: int = 384,
         index_type: str = "l2",
-        cache_dir: Optional[str] = None
+        cache_dir: Optional[str] = None,
+        batch_size: int = 64,
+        metric: str = "l2",
+        nlist: int = 100,
+        nprobe: int = 10,
+        pq_m: int = 8,
+        hnsw_m: int = 32,
+        ef_search: int = 64,
+        train_size: Optional[int] = None,
+        compaction_threshold: float = 0.2,
+        query_cache_size: int = 1024,
+        query_cache_ttl: Optional[float] = 3600,
+        embedding_executor: str = "thread",
+        embedding_workers: int = 2,
+        embedding_concurrency: Optional[int] = None,
+        query_batch_size: int = 32,
+        query_batch_wait_ms: float = 0,
+        search_mode: str = "vector",
+        enable_bm25: bool = True,
+        bm25_k1: float = 1.5,
+        bm25_b: float = 0.75,
+        rrf_k: int = 60,
+        hybrid_candidates: int = 50,
+        exact_filter_limit: int = 10000,
+        embedding_backend: str = "sentence_transformers",
+        embedding_backend_options: Optional[Dict[str, Any]] = None,
+        embedding_source: Optional["FAISSDocumentStore"] = None
     ):
         # 设置模型缓存目录
         if cache_dir:
             os.environ['TRANSFORMERS_CACHE'] = cache_dir
             os.environ['HF_HOME'] = cache_dir
         
+        self.dimension = dimension
+        self.batch_size = batch_size
+        self.last_ingest_stats: Dict[str, float] = {}
+        
+        # 指定 embedding_source 时共享其嵌入模型、嵌入执行器、查询缓存和微批处理器，
+        # 多个索引分片只需加载一份模型
+        self._owns_embedding = embedding_source is None
+        self._embedding_source = embedding_source
+        if embedding_source is not None:
+            self.embedding_model_name = embedding_source.embedding_model_name
+            self.embedding_backend = embedding_source.embedding_backend
+            self.query_cache = embedding_source.query_cache
+            self.embedding_executor = embedding_source.embedding_executor
+            self.query_batcher = embedding_source.query_batcher
+        else:
+            if embedding_backend not in EMBEDDING_BACKENDS:
+                raise ValueError(f"不支持的嵌入后端: {embedding_backend}")
+            self.embedding_backend = embedding_backend
+            self.embedding_backend_options = embedding_backend_options or {}
+            self._init_embedding(
+                embedding_model, cache_dir, query_cache_size, query_cache_ttl,
+                embedding_executor, embedding_workers, embedding_concurrency,
+                query_batch_size, query_batch_wait_ms
+            )
+        # 索引读写在单线程执行器中串行执行，因为FAISS索引不支持检索与写入并发
+        self.index_executor = OffloadExecutor(kind="thread", max_workers=1, name="faiss-index")
+        
+        # 初始化FAISS索引
+        self.index_type = index_type
+        self.metric = metric
+        self.index_params: Dict[str, Any] = {
+            "nlist": nlist,
+            "nprobe": nprobe,
+            "pq_m": pq_m,
+            "hnsw_m": hnsw_m,
+            "ef_search": ef_search
+        }
+        self.index = self._create_index()
+        
+        # 近似索引训练前，向量先写入平坦的暂存索引，凑够样本后再训练
+        self.train_size = train_size or min_training_size(index_type, nlist)
+        self._staging_index: Optional[faiss.Index] = None
+        if not self.index.is_trained:
+            self._staging_index = self._create_staging_index()
+            
+        # 存储文档和ID映射，文档ID即FAISS索引中的ID，删除后不会复用；
+        # 向量只保存在FAISS索引中，精确计算距离或重建索引时从索引中按ID重建
+        self.documents = DocumentCollection()
+        self.doc_ids: Dict[int, int] = {}  # 文档ID到文档存储位置的映射
+        self._next_id = 0
+        
+        # 与向量索引共用文档ID的BM25倒排索引，用于词法检索和混合检索
+        if search_mode not in SEARCH_MODES:
+            raise ValueError(f"不支持的检索模式: {search_mode}")
+        if search_mode != "vector" and not enable_bm25:
+            raise ValueError(f"检索模式 {search_mode} 需要启用BM25索引")
+        self.search_mode = search_mode
+        self.lexical_index: Optional[BM25Index] = BM25Index(k1=bm25_k1, b=bm25_b) if enable_bm25 else None
+        self.rrf_k = rrf_k
+        self.hybrid_candidates = hybrid_candidates
+        
+        # 元数据倒排索引，用于带过滤条件的检索和按条件删除；
+        # 满足条件的文档不超过 exact_filter_limit 个时直接对这些向量精确计算距离
+        self.metadata_index = MetadataIndex()
+        self.exact_filter_limit = exact_filter_limit
+        
+        # 已删除但仍留在索引中的文档ID（仅限不支持 remove_ids 的索引），检索时通过选择器排除
+        self.tombstones: Set[int] = set()
+        self._tombstone_selector: Optional[faiss.IDSelector] = None
+        self.compaction_threshold = compaction_threshold
+        # 每次增删文档或加载快照时递增，语义回答缓存据此判断缓存的回答是否过期
+        self.generation = 0
+        self._saved_generation = 0
+        self._compaction_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+        
+    def _init_embedding(
+        self,
+        embedding_model: str,
+        cache_dir: Optional[str],
+        query_cache_size: int,
+        query_cache_ttl: Optional[float],
+        embedding_executor: str,
+        embedding_workers: int,
+        embedding_concurrency: Optional[int],
+        query_batch_size: int,
+        query_batch_wait_ms: float
+    ) -> None:
+        """创建嵌入执行器、查询缓存和微批处理器，嵌入模型在首次使用时加载"""
+        self.embedding_model_name = embedding_model
+        self._cache_dir = cache_dir
+        self._embedding_model = None
+        self._model_lock = threading.Lock()
+        
+        self.query_cache = EmbeddingCache(query_cache_size, query_cache_ttl)
+        
+        # 嵌入计算在线程池或进程池中执行
+        self.embedding_executor = OffloadExecutor(
+            kind=embedding_executor,
+            max_workers=embedding_workers,
+            max_concurrency=embedding_concurrency,
+            name="embedding",
+            initializer=_init_embedding_worker if embedding_executor == "process" else None,
+            initargs=(
+                self.embedding_model_name, cache_dir, self.embedding_backend, self.embedding_backend_options
+            ) if embedding_executor == "process" else ()
+        )
+        
+        # 查询嵌入微批处理，query_batch_wait_ms 为 0 时不合并
+        self.query_batcher: Optional[MicroBatchEmbedder] = None
+        if query_batch_wait_ms > 0:
+            self.query_batcher = MicroBatchEmbedder(
+                self._embed,
+                max_batch_size=query_batch_size,
+                max_wait_ms=query_batch_wait_ms
+            )
+        
+    @property
+    def embedding_model(self):
+        """嵌入模型，首次访问时加载，共享 embedding_source 时返回其模型"""
+        if self._embedding_source is not None:
+            return self._embedding_source.embedding_model
+        if self._embedding_model is None:
+            with self._model_lock:
+                if self._embedding_model is None:
+                    self._embedding_model = self._load_embedding_model()
+        return self._embedding_model
+        
+    def _load_embedding_model(self):
+        start_time = time.perf_counter()
+        if self.embedding_backend == "onnx":
+            # ONNX 模型只从本地目录加载，缺失时直接报错而不是回退到其他模型
+            model = create_onnx_backend(self.embedding_model_name, self._cache_dir, **self.embedding_backend_options)
+            logger.info(f"Loaded ONNX embedding model in {time.perf_counter() - start_time:.2f}s")
+            return model
+            
+        model_class = _sentence_transformer_class()
         try:
             # 尝试离线加载
-            self.embedding_model = SentenceTransformer(
-                embedding_model,
+            model = model_class(
+                self.embedding_model_name,
                 device='cpu',  # 默认使用CPU
-                cache_folder=cache_dir
+                cache_folder=self._cache_dir
             )
         except Exception as e:
-            print(f"模型加载失败: {str(e)}")
+            logger.debug(f"Failed to load embedding model {self.embedding_model_name}: {str(e)}")
             # 使用备用的小型模型
-            self.embedding_model = SentenceTransformer(
+            self.embedding_model_name = 'paraphrase-MiniLM-L3-v2'
+            model = model_class(
                 'paraphrase-MiniLM-L3-v2',
                 device='cpu'
             )
+        logger.info(f"Loaded embedding model {self.embedding_model_name} in {time.perf_counter() - start_time:.2f}s")
+        return model
         
-        self.dimension = dimension
-        
-        # 初始化FAISS索引
-        if index_type == "l2":
-            self.index = faiss.IndexFlatL2(dimension)
-        elif index_type == "ip":
-            self.index = faiss.IndexFlatIP(dimension)
+    async def warm_up(self) -> float:
+        """预先加载嵌入模型（进程池时为每个工作进程）并完成一次编码，返回耗时秒数"""
+        start_time = time.perf_counter()
+        if self.embedding_executor.kind == "process":
+            await asyncio.gather(*[
+                self._embed(["warm up"]) for _ in range(self.embedding_executor.max_workers)
+            ])
         else:
-            raise ValueError(f"不支持的索引类型: {index_type}")
+            await self._embed(["warm up"])
+        return time.perf_counter() - start_time
+        
+    async def _embed(self, texts: List[str]) -> np.ndarray:
+        """在执行器中批量计算嵌入，不阻塞事件循环"""
+        if self.embedding_executor.kind == "process":
+            return await self.embedding_executor.run(_encode_in_worker, texts, self.batch_size)
+        return await self.embedding_executor.run(self._get_embeddings, texts)
+        
+    async def embed_query(self, query: str) -> np.ndarray:
+        """计算查询向量，与检索共用查询缓存"""
+        return await self._get_query_embedding(query)
+        
+    async def _get_query_embedding(self, query: str) -> np.ndarray:
+        """获取查询的嵌入向量，优先使用查询缓存"""
+        embedding = self.query_cache.get(self.embedding_model_name, query)
+        if embedding is None:
+            if self.query_batcher is not None:
+                embedding = await self.query_batcher.embed(query)
+            else:
+                embedding = (await self._embed([query]))[0]
+            self.query_cache.put(self.embedding_model_name, query, embedding)
+        return embedding
+        
+    def _get_embeddings(self, texts: List[str]) -> np.ndarray:
+        """批量获取文本的嵌入向量，返回 (n, dimension) 的 float32 矩阵"""
+        embeddings = self.embedding_model.encode(
+            texts,
+            batch_size=self.batch_size,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return np.asarray(embeddings, dtype='float32').reshape(len(texts), -1)
+        
+    def _create_index(self) -> faiss.Index:
+        """创建按文档ID寻址并可按ID重建向量的索引
+
+        IVF索引原生支持ID，使用哈希表形式的直接映射支持按ID重建和删除；其余类型用 IndexIDMap2 包装。
+        """
+        index = create_faiss_index(
+            self.index_type,
+            self.dimension,
+            metric=self.metric,
+            **self.index_params
+        )
+        if self.index_type in IVF_INDEX_TYPES:
+            index.set_direct_map_type(faiss.DirectMap.Hashtable)
+            return index
+        return faiss.IndexIDMap2(index)
+        
+    def _create_staging_index(self) -> faiss.Index:
+        if self.metric == "ip":
+            return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+        
+    @property
+    def _higher_is_better(self) -> bool:
+        """内积度量的距离越大越相似，L2 距离越小越相似"""
+        return self.index_type == "ip" or (self.index_type != "l2" and self.metric == "ip")
+        
+    @property
+    def is_trained(self) -> bool:
+        """索引是否已完成训练（平坦索引和HNSW无需训练）"""
+        return self.index.is_trained
+        
+    def _add_vectors(self, vectors: np.ndarray, ids: np.ndarray) -> None:
+        """将向量写入索引，未训练时写入暂存索引并在样本足够时触发训练"""
+        if self.index.is_trained:
+            self.index.add_with_ids(vectors, ids)
+            return
             
-        # 存储文档和ID映射
-        self.documents: List[Document] = []
-        self.doc_ids: Dict[int, int] = {}  # 文档ID到索引位置的映射
+        self._staging_index.add_with_ids(vectors, ids)
+        if self._staging_index.ntotal >= self.train_size:
+            self._train_index()
+            
+    def _train_index(self) -> None:
+        """使用暂存的向量训练近似索引，并把它们迁移到正式索引"""
+        start_time = time.perf_counter()
+        vectors = self._staging_index.index.reconstruct_n(0, self._staging_index.ntotal)
+        ids = faiss.vector_to_array(self._staging_index.id_map)
+        self.index.train(vectors)
+        self.index.add_with_ids(vectors, ids)
+        self._staging_index.reset()
+        logger.info(
+            f"Trained {self.index_type} index on {len(vectors)} vectors "
+            f"in {time.perf_counter() - start_time:.2f}s"
+        )
+        
+    def _search_vectors(self, queries: np.ndarray, top_k: int, selector: Optional[faiss.IDSelector] = None):
+        """在正式索引（或训练前的暂存索引）中检索，selector 限定参与检索的文档ID"""
+        index = self.index if self.index.is_trained else self._staging_index
+        if selector is None:
+            return index.search(queries, top_k)
+        return index.search(queries, top_k, params=self._search_params(index, selector))
+        
+    @staticmethod
+    def _search_params(index: faiss.Index, selector: faiss.IDSelector) -> faiss.SearchParameters:
+        """构造带ID选择器的检索参数，保留索引自身的 nprobe / efSearch 设置"""
+        inner = faiss.downcast_index(index.index) if isinstance(index, faiss.IndexIDMap) else index
+        if isinstance(inner, faiss.IndexIVF):
+            params = faiss.SearchParametersIVF()
+            params.nprobe = inner.nprobe
+        elif isinstance(inner, faiss.IndexHNSW):
+            params = faiss.SearchParametersHNSW()
+            params.efSearch = inner.hnsw.efSearch
+        else:
+            params = faiss.SearchParameters()
+        params.sel = selector
+        return params
         
-    def _get_embedding(self, text: str) -> np.ndarray:
-        """获取文本的嵌入向量"""
-        return self.embedding_model.encode(text, convert_to_tensor=False)
+    def _reconstruct(self, ids: np.ndarray) -> np.ndarray:
+        """按文档ID从索引（训练前为暂存索引）重建向量，量化索引返回解码后的近似向量"""
+        index = self.index if self.index.is_trained else self._staging_index
+        return index.reconstruct_batch(np.ascontiguousarray(ids, dtype=np.int64))
+        
+    def _search_selected(self, queries: np.ndarray, top_k: int, ids: np.ndarray):
+        """在给定文档的向量上逐一计算距离，返回与 index.search 相同格式的结果"""
+        vectors = self._reconstruct(ids)
+        if self._higher_is_better:
+            distances = queries @ vectors.T
+            order = np.argsort(-distances, axis=1)[:, :top_k]
+        else:
+            distances = (
+                (queries ** 2).sum(axis=1, keepdims=True)
+                - 2 * queries @ vectors.T
+                + (vectors ** 2).sum(axis=1)
+            )
+            order = np.argsort(distances, axis=1)[:, :top_k]
+        return np.take_along_axis(distances, order, axis=1), ids[order]
         
     async def add_documents(self, documents: List[Document]) -> None:
         """添加文档到存储"""
         if not documents:
             return
             
-        # 生成文档嵌入
-        embeddings = []
-        for doc in documents:
+        start_time = time.perf_counter()
+        
+        # 预分配嵌入矩阵，已有嵌入的文档直接写入
+        embeddings_array = np.empty((len(documents), self.dimension), dtype='float32')
+        pending: List[int] = []
+        for i, doc in enumerate(documents):
             if doc.embedding is None:
-                embedding = self._get_embedding(doc.content)
-                doc.embedding = embedding.tolist()
-            embeddings.append(np.array(doc.embedding))
+                pending.append(i)
+            else:
+                embeddings_array[i] = doc.embedding
+                
+        # 按批次生成缺失的文档嵌入
+        for batch_start in range(0, len(pending), self.batch_size):
+            batch = pending[batch_start:batch_start + self.batch_size]
+            batch_embeddings = await self._embed([documents[i].content for i in batch])
+            embeddings_array[batch] = batch_embeddings
             
-        embeddings_array = np.array(embeddings).astype('float32')
-        
-        # 添加到FAISS索引
-        start_id = len(self.documents)
-        self.index.add(embeddings_array)
+        # BM25 分词同样在嵌入执行器中完成，写锁内只更新倒排列表
+        analyzed = None
+        if self.lexical_index is not None:
+            analyzed = await self.embedding_executor.run(analyze, [doc.content for doc in documents])
+
+        # 嵌入只保存在FAISS索引中，不在 Document 上保留列表副本
+        stored = [
+            doc if doc.embedding is None else Document(content=doc.content, metadata=doc.metadata)
+            for doc in documents
+        ]
         
-        # 更新文档存储和ID映射
-        for i, doc in enumerate(documents):
-            doc_id = start_id + i
-            self.doc_ids[doc_id] = len(self.documents)
-            self.documents.append(doc)
+        async with self._write_lock:
+            # 分配稳定的文档ID并添加到FAISS索引
+            ids = np.arange(self._next_id, self._next_id + len(documents), dtype=np.int64)
+            self._next_id += len(documents)
+            await self.index_executor.run(self._add_vectors, embeddings_array, ids)
+            
+            # 更新文档存储和ID映射
+            start_position = len(self.documents)
+            self.documents.extend(stored)
+            for offset, doc_id in enumerate(ids.tolist()):
+                self.doc_ids[doc_id] = start_position + offset
+            if self.lexical_index is not None:
+                self.lexical_index.add_analyzed(ids.tolist(), analyzed)
+            self.metadata_index.add(ids.tolist(), (doc.metadata for doc in documents))
+            self.generation += 1
+            
+        elapsed = time.perf_counter() - start_time
+        self.last_ingest_stats = {
+            "documents": len(documents),
+            "encoded": len(pending),
+            "seconds": elapsed,
+            "docs_per_sec": len(documents) / elapsed if elapsed > 0 else float("inf")
+        }
+        logger.info(
+            f"Indexed {len(documents)} documents ({len(pending)} encoded) "
+            f"in {elapsed:.2f}s, {self.last_ingest_stats['docs_per_sec']:.1f} docs/sec"
+        )
             
     async def search(
         self,
         query: str,
         top_k: int = 5,
-        threshold: float = 0.7
+        threshold: float = 0.7,
+        mode: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None
     ) -> List[Document]:
-        """搜索相似文档"""
+        """搜索相似文档
+        
+        mode 为 vector（向量检索，L2 度量保留距离小于 threshold 的结果，内积度量保留相似度大于 threshold 的结果）、lexical（仅BM25，不计算嵌入）
+        或 hybrid（两路各取 hybrid_candidates 个候选，按倒数排名融合），默认使用 search_mode。
+        filter 为元数据的等值条件，只返回全部条件都满足的文档。
+        """
+        return [doc for doc, _ in await self.search_with_scores(query, top_k, threshold, mode, filter)]
+        
+    async def search_with_scores(
+        self,
+        query: str,
+        top_k: int = 5,
+        threshold: float = 0.7,
+        mode: Optional[str] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Tuple[Document, float]]:
+        """搜索相似文档并返回得分，得分越大越相关
+        
+        向量检索的得分为内积相似度或负的L2距离，词法检索为BM25得分，混合检索为RRF得分。
+        """
+        mode = mode or self.search_mode
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"不支持的检索模式: {mode}")
+        if mode != "vector" and self.lexical_index is None:
+            raise ValueError(f"检索模式 {mode} 需要启用BM25索引")
+            
+        allowed_ids = self._filter_ids(filter) if filter else None
+        if allowed_ids is not None and not len(allowed_ids):
+            return []
+            
+        if mode == "vector":
+            hits = await self._vector_search(query, top_k, threshold, allowed_ids)
+        elif mode == "lexical":
+            hits = self._lexical_search(query, top_k, allowed_ids)
+        else:
+            candidates = max(top_k, self.hybrid_candidates)
+            vector_hits = await self._vector_search(query, candidates, threshold, allowed_ids)
+            lexical_hits = self._lexical_search(query, candidates, allowed_ids)
+            hits = reciprocal_rank_fusion(
+                [[doc_id for doc_id, _ in vector_hits], [doc_id for doc_id, _ in lexical_hits]],
+                k=self.rrf_k
+            )[:top_k]
+            
+        return [(self.documents[self.doc_ids[doc_id]], score) for doc_id, score in hits]
+        
+    async def _vector_search(
+        self,
+        query: str,
+        top_k: int,
+        threshold: float,
+        allowed_ids: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """向量检索，返回按距离排序的 (文档ID, 得分)，allowed_ids 不为空时只在这些文档中检索"""
         # 获取查询的嵌入向量
-        query_embedding = self._get_embedding(query)
+        query_embedding = await self._get_query_embedding(query)
         query_embedding = query_embedding.reshape(1, -1).astype('float32')
         
-        # 执行相似度搜索
-        distances, indices = self.index.search(query_embedding, top_k)
+        if allowed_ids is None:
+            # 执行相似度搜索，已删除文档的墓碑由选择器排除，检索数量不随墓碑增长
+            distances, indices = await self.index_executor.run(
+                self._search_vectors, query_embedding, top_k, self._live_selector()
+            )
+        elif len(allowed_ids) <= self.exact_filter_limit or self.index_type == "pq":
+            # 满足条件的文档较少（或索引不支持选择器）时直接精确计算
+            distances, indices = await self.index_executor.run(
+                self._search_selected, query_embedding, top_k, allowed_ids
+            )
+        else:
+            selector = id_selector(allowed_ids, self._next_id)
+            distances, indices = await self.index_executor.run(
+                self._search_vectors, query_embedding, top_k, selector
+            )
         
-        # 获取结果文档
+        # 过滤已删除和超出阈值的结果：内积度量保留相似度大于阈值的结果，L2 保留距离小于阈值的结果，
+        # 得分统一为越大越相关
+        higher_is_better = self._higher_is_better
         results = []
         for i, idx in enumerate(indices[0]):
-            if idx != -1 and distances[0][i] < threshold:
-                results.append(self.documents[self.doc_ids[idx]])
+            doc_id = int(idx)
+            distance = float(distances[0][i])
+            if doc_id not in self.doc_ids:
+                continue
+            if higher_is_better and distance > threshold:
+                results.append((doc_id, distance))
+            elif not higher_is_better and distance < threshold:
+                results.append((doc_id, -distance))
                 
-        return results
+        results.sort(key=lambda hit: hit[1], reverse=True)
+        return results[:top_k]
+        
+    def _live_selector(self) -> Optional[faiss.IDSelector]:
+        """排除墓碑文档ID的选择器，没有墓碑时返回 None；墓碑变化前复用同一个选择器"""
+        if not self.tombstones:
+            return None
+        if self._tombstone_selector is None:
+            tombstones = np.fromiter(self.tombstones, dtype=np.int64, count=len(self.tombstones))
+            excluded = faiss.IDSelectorBatch(len(tombstones), faiss.swig_ptr(tombstones))
+            selector = faiss.IDSelectorNot(excluded)
+            # IDSelectorNot 只保存指针，需要持有被取反的选择器
+            selector.excluded = excluded
+            self._tombstone_selector = selector
+        return self._tombstone_selector
+        
+    def _lexical_search(
+        self,
+        query: str,
+        top_k: int,
+        allowed_ids: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """BM25检索，返回按得分排序的 (文档ID, 得分)"""
+        return [
+            (doc_id, score) for doc_id, score in self.lexical_index.search(query, top_k, allowed_ids)
+            if doc_id in self.doc_ids
+        ]
+        
+    def _filter_ids(self, filter: Dict[str, Any]) -> np.ndarray:
+        """返回满足全部元数据条件的有效文档ID
+        
+        标量条件通过元数据倒排索引求交集，其余条件（如列表值、None）只在候选文档上逐条比较。
+        """
+        indexed, residual = MetadataIndex.split_filter(filter)
+        if indexed:
+            ids = self.metadata_index.lookup(indexed)
+        else:
+            ids = np.fromiter(self.doc_ids.keys(), dtype=np.int64, count=len(self.doc_ids))
+        if residual and len(ids):
+            keep = [
+                all(self.documents[self.doc_ids[doc_id]].metadata.get(k) == v for k, v in residual.items())
+                for doc_id in ids.tolist()
+            ]
+            ids = ids[np.array(keep, dtype=bool)]
+        return ids
         
     async def delete_documents(self, filter: Dict[str, Any]) -> None:
-        """删除文档（注意：FAISS不支持直接删除，这里只是从文档列表中移除）"""
-        # 找到要删除的文档
-        docs_to_keep = []
-        embeddings_to_keep = []
-        
-        for i, doc in enumerate(self.documents):
-            if not all(doc.metadata.get(k) == v for k, v in filter.items()):
-                docs_to_keep.append(doc)
-                embeddings_to_keep.append(np.array(doc.embedding))
-                
-        # 重建索引
-        if len(docs_to_keep) < len(self.documents):
-            self.documents = docs_to_keep
-            self.doc_ids = {i: i for i in range(len(docs_to_keep))}
+        """删除元数据匹配的文档
+        
+        支持 remove_ids 的索引直接删除对应向量；HNSW 等索引只记录墓碑，
+        当墓碑比例超过 compaction_threshold 时在后台压缩重建索引。
+        """
+        async with self._write_lock:
+            ids_to_delete = self._filter_ids(filter).tolist()
+            await self._delete_ids(ids_to_delete)
             
-            if index_type == "l2":
-                self.index = faiss.IndexFlatL2(self.dimension)
-            else:
-                self.index = faiss.IndexFlatIP(self.dimension)
-                
-            if embeddings_to_keep:
-                embeddings_array = np.array(embeddings_to_keep).astype('float32')
-                self.index.add(embeddings_array)
+        if self._needs_compaction() and (self._compaction_task is None or self._compaction_task.done()):
+            self._compaction_task = asyncio.create_task(self.compact())
+            
+    async def _delete_ids(self, ids_to_delete: List[int]) -> None:
+        """按文档ID删除，开销与删除数量成正比"""
+        if not ids_to_delete:
+            return
+            
+        for doc_id in ids_to_delete:
+            self.documents.release(self.doc_ids.pop(doc_id))
+        if self.lexical_index is not None:
+            self.lexical_index.remove(ids_to_delete)
+        self.metadata_index.remove(ids_to_delete)
+        self.generation += 1
+            
+        if self.index_type in TOMBSTONE_INDEX_TYPES:
+            self.tombstones.update(ids_to_delete)
+            self._tombstone_selector = None
+        else:
+            await self.index_executor.run(self._remove_vectors, np.array(ids_to_delete, dtype=np.int64))
+        logger.info(f"Deleted {len(ids_to_delete)} documents, {len(self.tombstones)} tombstones pending")
+        
+    def _remove_vectors(self, ids: np.ndarray) -> None:
+        self.index.remove_ids(ids)
+        if self._staging_index is not None:
+            self._staging_index.remove_ids(ids)
+        
+    def _needs_compaction(self) -> bool:
+        if not self.tombstones:
+            return False
+        return len(self.tombstones) / max(self.index.ntotal, 1) >= self.compaction_threshold
+        
+    async def compact(self) -> None:
+        """在索引执行器中重建索引以清除墓碑，重建期间检索继续使用旧索引"""
+        async with self._write_lock:
+            if not self.tombstones:
+                return
+            index = await self.index_executor.run(self._build_live_index)
+            self.index = index
+            self.tombstones.clear()
+            self._tombstone_selector = None
+            
+    def _build_live_index(self) -> faiss.Index:
+        """用仍然有效的文档向量构建新索引"""
+        start_time = time.perf_counter()
+        index = self._create_index()
+        if self.doc_ids:
+            ids = np.fromiter(self.doc_ids.keys(), dtype=np.int64, count=len(self.doc_ids))
+            index.add_with_ids(self._reconstruct(ids), ids)
+        logger.info(
+            f"Compacted {self.index_type} index to {index.ntotal} vectors "
+            f"in {time.perf_counter() - start_time:.2f}s"
+        )
+        return index
 
+    def get_stats(self) -> Dict[str, Any]:
+        """返回文档存储的运行统计"""
+        return {
+            "documents": len(self.doc_ids),
+            "index_type": self.index_type,
+            "index_vectors": self.index.ntotal,
+            "tombstones": len(self.tombstones),
+            "last_ingest": self.last_ingest_stats,
+            "memory": self.memory_footprint(),
+            "lexical_index": self.lexical_index.stats() if self.lexical_index else None,
+            "metadata_index": self.metadata_index.stats(),
+            "query_cache": self.query_cache.stats(),
+            "embedding_executor": self.embedding_executor.stats(),
+            "index_executor": self.index_executor.stats(),
+            "query_batching": self.query_batcher.stats() if self.query_batcher else None
+        }
+        
+    @property
+    def dirty(self) -> bool:
+        """上次保存或加载快照之后是否有文档增删"""
+        return self.generation != self._saved_generation
+        
+    def memory_footprint(self) -> Dict[str, Any]:
+        """估算内存占用：FAISS索引，以及内存映射的快照文件"""
+        index_bytes = estimate_index_bytes(self.index)
+        if self._staging_index is not None:
+            index_bytes += estimate_index_bytes(self._staging_index)
+        document_stats = self.documents.memory_stats()
+        live = len(self.doc_ids)
+        return {
+            "index_bytes": index_bytes,
+            "mapped_bytes": document_stats["mapped_bytes"],
+            "in_memory_documents": document_stats["in_memory_documents"],
+            "bytes_per_vector": index_bytes / live if live else 0.0
+        }
+        
+    def close(self) -> None:
+        """关闭索引执行器，以及本存储自己创建的嵌入执行器"""
+        if self._owns_embedding:
+            self.embedding_executor.shutdown()
+        self.index_executor.shutdown()
+        
     def save_index(self, file_path: str) -> None:
         """保存FAISS索引到文件"""
         faiss.write_index(self.index, file_path)
         
     def load_index(self, file_path: str) -> None:
         """从文件加载FAISS索引"""
-        self.index = faiss.read_index(file_path) 
\ No newline at end of file
+        self.index = faiss.read_index(file_path)
+        
+    def save_snapshot(self, snapshot_dir: str) -> None:
+        """保存完整快照：FAISS索引（含向量）、文档内容、元数据和ID映射
+        
+        先写入临时目录再替换，避免中途失败留下不完整的快照。
+        """
+        start_time = time.perf_counter()
+        tmp_dir = f"{snapshot_dir}.tmp"
+        if os.path.exists(tmp_dir):
+            shutil.rmtree(tmp_dir)
+        os.makedirs(tmp_dir)
+        
+        faiss.write_index(self.index, os.path.join(tmp_dir, snapshot.INDEX_FILE))
+        if self._staging_index is not None and self._staging_index.ntotal:
+            faiss.write_index(self._staging_index, os.path.join(tmp_dir, snapshot.STAGING_INDEX_FILE))
+        
+        # 只写入仍然有效的文档，已删除文档的存储位置在此时被回收
+        live_ids = sorted(self.doc_ids, key=self.doc_ids.get)
+        snapshot.write_documents(
+            tmp_dir,
+            self.documents,
+            positions=[self.doc_ids[doc_id] for doc_id in live_ids]
+        )
+        np.save(
+            os.path.join(tmp_dir, snapshot.DOC_IDS_FILE),
+            np.array(live_ids, dtype=np.int64)
+        )
+        if self.lexical_index is not None:
+            self.lexical_index.save(tmp_dir)
+        self.metadata_index.save(tmp_dir)
+        np.save(
+            os.path.join(tmp_dir, snapshot.TOMBSTONES_FILE),
+            np.array(sorted(self.tombstones), dtype=np.int64)
+        )
+        snapshot.write_manifest(tmp_dir, {
+            "embedding_model": self.embedding_model_name,
+            "dimension": self.dimension,
+            "index_type": self.index_type,
+            "metric": self.metric,
+            "index_params": self.index_params,
+            "document_count": len(live_ids),
+            "next_id": self._next_id,
+            "created_at": time.time()
+        })
+        
+        # 替换旧快照
+        old_dir = f"{snapshot_dir}.old"
+        if os.path.exists(snapshot_dir):
+            os.rename(snapshot_dir, old_dir)
+        os.rename(tmp_dir, snapshot_dir)
+        if os.path.exists(old_dir):
+            shutil.rmtree(old_dir)
+        self._saved_generation = self.generation
+        logger.info(
+            f"Saved snapshot of {len(self.doc_ids)} documents to {snapshot_dir} "
+            f"in {time.perf_counter() - start_time:.2f}s"
+        )
+        
+    def load_snapshot(self, snapshot_dir: str) -> None:
+        """加载完整快照，文档以内存映射方式按需读取"""
+        start_time = time.perf_counter()
+        manifest = snapshot.read_manifest(snapshot_dir)
+        if manifest["dimension"] != self.dimension:
+            raise ValueError(
+                f"快照向量维度 {manifest['dimension']} 与当前配置 {self.dimension} 不一致"
+            )
+        if manifest["embedding_model"] != self.embedding_model_name:
+            logger.warning(
+                f"Snapshot was built with {manifest['embedding_model']}, "
+                f"current embedding model is {self.embedding_model_name}"
+            )
+            
+        self.index = faiss.read_index(os.path.join(snapshot_dir, snapshot.INDEX_FILE))
+        self.index_type = manifest["index_type"]
+        self.metric = manifest["metric"]
+        self.index_params = manifest["index_params"]
+        self._next_id = manifest["next_id"]
+        staging_path = os.path.join(snapshot_dir, snapshot.STAGING_INDEX_FILE)
+        if os.path.exists(staging_path):
+            self._staging_index = faiss.read_index(staging_path)
+        elif not self.index.is_trained:
+            self._staging_index = self._create_staging_index()
+        else:
+            self._staging_index = None
+            
+        self.documents = DocumentCollection(mapped=MappedDocuments(snapshot_dir))
+        doc_ids = np.load(os.path.join(snapshot_dir, snapshot.DOC_IDS_FILE))
+        self.doc_ids = {doc_id: position for position, doc_id in enumerate(doc_ids.tolist())}
+        self.tombstones = set(np.load(os.path.join(snapshot_dir, snapshot.TOMBSTONES_FILE)).tolist())
+        self._tombstone_selector = None
+        if self.lexical_index is not None:
+            if os.path.exists(os.path.join(snapshot_dir, bm25_index.VOCAB_FILE)):
+                self.lexical_index = BM25Index.load(snapshot_dir, self.doc_ids.keys())
+            else:
+                # 快照中没有词法索引时从文档重建
+                self.lexical_index = BM25Index(k1=self.lexical_index.k1, b=self.lexical_index.b)
+                live_ids = sorted(self.doc_ids)
+                self.lexical_index.add(
+                    live_ids,
+                    (self.documents[self.doc_ids[doc_id]].content for doc_id in live_ids)
+                )
+        if os.path.exists(os.path.join(snapshot_dir, metadata_index.PAIRS_FILE)):
+            self.metadata_index = MetadataIndex.load(snapshot_dir)
+        else:
+            # 快照中没有元数据索引时从文档重建
+            self.metadata_index = MetadataIndex()
+            live_ids = sorted(self.doc_ids)
+            self.metadata_index.add(
+                live_ids,
+                (self.documents[self.doc_ids[doc_id]].metadata for doc_id in live_ids)
+            )
+        # 内容整体替换，基于旧 generation 的缓存回答全部失效
+        self.generation += 1
+        self._saved_generation = self.generation
+        logger.info(
+            f"Loaded snapshot of {len(self.documents)} documents from {snapshot_dir} "
+            f"in {time.perf_counter() - start_time:.2f}s"
+        ) 
\ No newline at end of file
@@ -0,0 +1,150 @@
+from typing import List, Dict, Any, Optional, Tuple
+from .document_store import BaseDocumentStore, Document
+from .chunking import TextChunker
+from .utils import iter_document_files, iter_chunks
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+
+class IncrementalIngester:
+    """增量目录导入
+
+    清单文件记录每个已导入文件的 mtime、大小和 SHA-256。再次同步时，mtime 和大小
+    未变的文件直接跳过；其余文件并发读取并比较哈希，只有新增或内容变化的文件会被
+    重新分块和嵌入，已删除文件对应的向量会从文档存储中移除。
+    """
+    def __init__(
+        self,
+        document_store: BaseDocumentStore,
+        manifest_path: str,
+        chunker: Optional[TextChunker] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        read_concurrency: int = 8,
+        batch_size: int = 256
+    ):
+        self.document_store = document_store
+        self.manifest_path = manifest_path
+        self.chunker = chunker
+        self.metadata = metadata
+        self.read_concurrency = read_concurrency
+        self.batch_size = batch_size
+        self.files: Dict[str, Dict[str, Any]] = self._load_manifest()
+
+    def _load_manifest(self) -> Dict[str, Dict[str, Any]]:
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with open(self.manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable ingestion manifest {self.manifest_path}: {str(e)}")
+            return {}
+        if manifest.get("version") != MANIFEST_VERSION:
+            logger.warning(f"Ignoring ingestion manifest with version {manifest.get('version')}")
+            return {}
+        return manifest["files"]
+
+    def save_manifest(self) -> None:
+        """原子地写入清单文件"""
+        os.makedirs(os.path.dirname(os.path.abspath(self.manifest_path)), exist_ok=True)
+        tmp_path = f"{self.manifest_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "files": self.files}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def reset(self) -> None:
+        """清空清单，下次同步时重新导入全部文件"""
+        self.files = {}
+
+    @staticmethod
+    def _read_file(file_path: str) -> Tuple[str, str]:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        return hashlib.sha256(data).hexdigest(), data.decode("utf-8")
+
+    async def sync(self, docs_dir: str, recursive: bool = True) -> Dict[str, Any]:
+        """同步目录与文档存储，返回各类文件数量和耗时；recursive 为 False 时只同步目录下的文件"""
+        start_time = time.perf_counter()
+        stats = {"new": 0, "changed": 0, "unchanged": 0, "removed": 0, "failed": 0, "chunks": 0}
+
+        # 仅通过 stat 判断哪些文件需要读取
+        seen = set()
+        candidates: List[Tuple[str, os.stat_result]] = []
+        for file_path in iter_document_files(docs_dir, recursive):
+            seen.add(file_path)
+            stat = os.stat(file_path)
+            entry = self.files.get(file_path)
+            if entry and entry["mtime"] == stat.st_mtime and entry["size"] == stat.st_size:
+                stats["unchanged"] += 1
+            else:
+                candidates.append((file_path, stat))
+
+        # 并发读取候选文件，按窗口处理以限制同时驻留内存的文件数
+        loop = asyncio.get_running_loop()
+        batch: List[Document] = []
+        for window_start in range(0, len(candidates), self.read_concurrency):
+            window = candidates[window_start:window_start + self.read_concurrency]
+            results = await asyncio.gather(
+                *[loop.run_in_executor(None, self._read_file, path) for path, _ in window],
+                return_exceptions=True
+            )
+            for (file_path, stat), result in zip(window, results):
+                if isinstance(result, Exception):
+                    logger.error(f"Failed to read {file_path}: {str(result)}")
+                    stats["failed"] += 1
+                    continue
+                digest, content = result
+                entry = self.files.get(file_path)
+                record = {"mtime": stat.st_mtime, "size": stat.st_size, "sha256": digest}
+                if entry and entry["sha256"] == digest:
+                    # 仅 mtime 变化，内容未变
+                    self.files[file_path] = {**entry, **record}
+                    stats["unchanged"] += 1
+                    continue
+
+                if entry:
+                    await self.document_store.delete_documents({"source": file_path})
+                    stats["changed"] += 1
+                else:
+                    stats["new"] += 1
+                chunks = 0
+                for document in iter_chunks(file_path, content, self.chunker, self.metadata):
+                    batch.append(document)
+                    chunks += 1
+                    if len(batch) >= self.batch_size:
+                        await self.document_store.add_documents(batch)
+                        batch = []
+                self.files[file_path] = {**record, "chunks": chunks}
+                stats["chunks"] += chunks
+        if batch:
+            await self.document_store.add_documents(batch)
+
+        # 删除目录中已不存在的文件对应的向量
+        prefix = os.path.join(docs_dir, "")
+        if recursive:
+            removed = [path for path in self.files if path.startswith(prefix) and path not in seen]
+        else:
+            directory = os.path.normpath(docs_dir)
+            removed = [
+                path for path in self.files
+                if os.path.normpath(os.path.dirname(path)) == directory and path not in seen
+            ]
+        for file_path in removed:
+            await self.document_store.delete_documents({"source": file_path})
+            del self.files[file_path]
+            stats["removed"] += 1
+
+        stats["seconds"] = time.perf_counter() - start_time
+        logger.info(
+            f"Synced {docs_dir}: {stats['new']} new, {stats['changed']} changed, "
+            f"{stats['unchanged']} unchanged, {stats['removed']} removed, "
+            f"{stats['chunks']} chunks in {stats['seconds']:.2f}s"
+        )
+        return stats
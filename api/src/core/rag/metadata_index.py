@@ -0,0 +1,132 @@
+from typing import Dict, Any, Tuple, Iterable
+from array import array
+import numpy as np
+import faiss
+import json
+import os
+
+PAIRS_FILE = "metadata_pairs.json"
+POSTING_IDS_FILE = "metadata_ids.npy"
+POSTING_OFFSETS_FILE = "metadata_offsets.npy"
+
+# 只为标量值建立索引，列表、字典等值在过滤时逐条比较
+_INDEXABLE_TYPES = (str, int, float, bool)
+
+def is_indexable(value: Any) -> bool:
+    return isinstance(value, _INDEXABLE_TYPES)
+
+class MetadataIndex:
+    """元数据倒排索引
+
+    把每个 (键, 值) 映射到按升序排列的文档ID列表（array('q')）。过滤时从最短的列表开始
+    求交集，再转换为FAISS的ID位图选择器，检索时只计算满足条件的向量。删除只做标记，
+    已删除ID超过一定比例时统一清理。
+    """
+    def __init__(self):
+        self.postings: Dict[Tuple[str, Any], array] = {}
+        self._deleted = set()
+        self._count = 0
+
+    def add(self, doc_ids: Iterable[int], metadatas: Iterable[Dict[str, Any]]) -> None:
+        """添加文档，doc_ids 需大于所有已添加的ID"""
+        for doc_id, metadata in zip(doc_ids, metadatas):
+            self._count += 1
+            for key, value in metadata.items():
+                if is_indexable(value):
+                    self.postings.setdefault((key, value), array("q")).append(doc_id)
+
+    def remove(self, doc_ids: Iterable[int]) -> None:
+        for doc_id in doc_ids:
+            if doc_id not in self._deleted:
+                self._deleted.add(doc_id)
+                self._count -= 1
+        if len(self._deleted) > max(1000, self._count // 5):
+            self.compact()
+
+    def compact(self) -> None:
+        """从倒排列表中清除已删除的文档"""
+        if not self._deleted:
+            return
+        deleted = np.fromiter(self._deleted, dtype=np.int64)
+        for pair, ids in list(self.postings.items()):
+            ids_array = np.frombuffer(ids, dtype=np.int64)
+            keep = ~np.isin(ids_array, deleted)
+            if keep.all():
+                continue
+            if keep.any():
+                self.postings[pair] = array("q", ids_array[keep].tobytes())
+            else:
+                del self.postings[pair]
+        self._deleted.clear()
+
+    @staticmethod
+    def split_filter(filter: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        """把过滤条件分为可走索引的标量条件和需要逐条比较的其余条件"""
+        indexed = {key: value for key, value in filter.items() if is_indexable(value)}
+        residual = {key: value for key, value in filter.items() if key not in indexed}
+        return indexed, residual
+
+    def lookup(self, filter: Dict[str, Any]) -> np.ndarray:
+        """返回同时满足所有标量条件的文档ID（升序），filter 只能包含标量值"""
+        postings = []
+        for pair in filter.items():
+            ids = self.postings.get(pair)
+            if ids is None:
+                return np.empty(0, dtype=np.int64)
+            postings.append(np.frombuffer(ids, dtype=np.int64))
+        if not postings:
+            raise ValueError("过滤条件为空")
+
+        postings.sort(key=len)
+        result = postings[0]
+        for ids in postings[1:]:
+            result = np.intersect1d(result, ids, assume_unique=True)
+            if not len(result):
+                break
+        if self._deleted and len(result):
+            result = result[~np.isin(result, np.fromiter(self._deleted, dtype=np.int64))]
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        postings = sum(len(ids) for ids in self.postings.values())
+        return {
+            "documents": self._count,
+            "pairs": len(self.postings),
+            "postings": postings,
+            "array_bytes": postings * 8
+        }
+
+    def save(self, directory: str) -> None:
+        """把倒排索引展平为数组保存"""
+        self.compact()
+        pairs = list(self.postings)
+        counts = [len(self.postings[pair]) for pair in pairs]
+        offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+        ids = np.frombuffer(b"".join(self.postings[pair].tobytes() for pair in pairs), dtype=np.int64)
+        np.save(os.path.join(directory, POSTING_IDS_FILE), ids)
+        np.save(os.path.join(directory, POSTING_OFFSETS_FILE), offsets)
+        with open(os.path.join(directory, PAIRS_FILE), "w", encoding="utf-8") as f:
+            json.dump({"count": self._count, "pairs": [list(pair) for pair in pairs]}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, directory: str) -> "MetadataIndex":
+        with open(os.path.join(directory, PAIRS_FILE), "r", encoding="utf-8") as f:
+            data = json.load(f)
+        ids = np.load(os.path.join(directory, POSTING_IDS_FILE))
+        offsets = np.load(os.path.join(directory, POSTING_OFFSETS_FILE))
+        index = cls()
+        index._count = data["count"]
+        for (key, value), start, end in zip(data["pairs"], offsets[:-1], offsets[1:]):
+            index.postings[(key, value)] = array("q", ids[start:end].tobytes())
+        return index
+
+def id_selector(ids: np.ndarray, id_bound: int) -> faiss.IDSelector:
+    """把文档ID集合转换为FAISS位图选择器，第 i 位对应文档ID i"""
+    mask = np.zeros(id_bound, dtype=bool)
+    mask[ids] = True
+    bitmap = np.packbits(mask, bitorder="little")
+    selector = faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap))
+    # 选择器只保存指针，需要持有位图数组的引用
+    selector.bitmap_array = bitmap
+    return selector
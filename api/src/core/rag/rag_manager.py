@@ -1,5 +1,8 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from .document_store import BaseDocumentStore, Document
+from .sharding import ShardedDocumentStore
+from .reranker import CrossEncoderReranker
+from .context_packer import ContextPacker
 from ..prompt.prompt_manager import PromptManager
 from ..context.context_manager import ContextManager
 
@@ -8,44 +11,112 @@ class RAGManager:
         self,
         document_store: BaseDocumentStore,
         prompt_manager: PromptManager,
-        context_manager: ContextManager
+        context_manager: ContextManager,
+        reranker: Optional[CrossEncoderReranker] = None,
+        top_k: int = 5,
+        rerank_candidates: int = 20,
+        context_lengths: Optional[Dict[str, int]] = None,
+        default_model: Optional[str] = None,
+        default_context_length: int = 4096,
+        reserved_tokens: int = 1024,
+        context_packer: Optional[ContextPacker] = None
     ):
         self.document_store = document_store
         self.prompt_manager = prompt_manager
         self.context_manager = context_manager
+        # 启用重排序时先检索 rerank_candidates 个候选，重排后只保留 top_k 个进入提示词
+        self.reranker = reranker
+        self.top_k = top_k
+        self.rerank_candidates = max(rerank_candidates, top_k)
+        # 每个模型的上下文长度，扣除为回答预留的 reserved_tokens 和模板、问题占用的 token 后作为检索上下文预算
+        self.context_lengths = context_lengths or {}
+        self.default_model = default_model
+        self.default_context_length = default_context_length
+        self.reserved_tokens = reserved_tokens
+        self.context_packer = context_packer or ContextPacker()
+    
+    def context_budget(self, template_name: str, variables: Dict[str, Any], model: Optional[str] = None) -> int:
+        """计算检索上下文可用的 token 数"""
+        context_length = self.context_lengths.get(model or self.default_model, self.default_context_length)
+        prompt = self.prompt_manager.get_prompt(template_name, {**variables, "context": ""})
+        prompt_tokens = self.context_packer.count_tokens(prompt)
+        return max(context_length - self.reserved_tokens - prompt_tokens, 0)
+    
+    async def retrieve(
+        self,
+        query: str,
+        domain: str,
+        search_domains: Optional[List[str]] = None
+    ) -> List[Document]:
+        """检索相关文档，启用重排序时多取候选后用交叉编码器重排"""
+        top_k = self.rerank_candidates if self.reranker else self.top_k
+        if isinstance(self.document_store, ShardedDocumentStore):
+            candidates = await self.document_store.search(query, top_k, domains=search_domains or [domain])
+        else:
+            candidates = await self.document_store.search(query, top_k)
+        if self.reranker is None:
+            return candidates
+        return await self.reranker.rerank(query, candidates, self.top_k)
+    
+    def remember_query(self, session_id: str, query: str, domain: str) -> None:
+        """把查询记录到会话上下文，会话不存在时创建"""
+        if not self.context_manager.get_context(session_id):
+            self.context_manager.create_context(session_id)
+        self.context_manager.update_context(
+            session_id,
+            {"last_query": query, "domain": domain},
+            {"role": "user", "content": query}
+        )
     
     async def process_query(
         self,
         query: str,
         session_id: str,
-        domain: str
+        domain: str,
+        search_domains: Optional[List[str]] = None,
+        model: Optional[str] = None
     ) -> str:
-        # 1. 获取相关文档
-        relevant_docs = await self.document_store.search(query)
-        
-        # 2. 获取或创建上下文
-        context = self.context_manager.get_context(session_id)
-        if not context:
-            context = self.context_manager.create_context(session_id)
+        response, _ = await self.answer(query, session_id, domain, search_domains, model)
+        return response
+    
+    async def build_prompt(
+        self,
+        query: str,
+        session_id: str,
+        domain: str,
+        search_domains: Optional[List[str]] = None,
+        model: Optional[str] = None
+    ) -> Tuple[str, List[Document]]:
+        """检索文档并构建增强提示词，返回 (提示词, 检索文档)"""
+        # 1. 获取相关文档，分片存储按领域路由，search_domains 可指定多个领域并行检索
+        relevant_docs = await self.retrieve(query, domain, search_domains)
         
-        # 3. 构建增强提示词
-        context_text = "\n".join([doc.content for doc in relevant_docs])
+        # 2. 构建增强提示词，检索上下文按模型的 token 预算去重、截断
+        variables = {"domain": domain, "query": query}
+        packed = self.context_packer.pack(
+            relevant_docs,
+            self.context_budget("domain_expert", variables, model)
+        )
         prompt = self.prompt_manager.get_prompt(
             "domain_expert",
-            {
-                "domain": domain,
-                "context": context_text,
-                "query": query
-            }
+            {**variables, "context": packed.text}
         )
         
-        # 4. 更新上下文
-        self.context_manager.update_context(
-            session_id,
-            {"last_query": query, "domain": domain},
-            {"role": "user", "content": query}
-        )
+        # 3. 更新上下文
+        self.remember_query(session_id, query, domain)
+        return prompt, relevant_docs
+    
+    async def answer(
+        self,
+        query: str,
+        session_id: str,
+        domain: str,
+        search_domains: Optional[List[str]] = None,
+        model: Optional[str] = None
+    ) -> Tuple[str, List[Document]]:
+        """生成回答，同时返回用于构建提示词的检索文档"""
+        prompt, relevant_docs = await self.build_prompt(query, session_id, domain, search_domains, model)
         
         # 这里应该调用LLM生成回答
         # 返回示例回答
-        return "基于检索到的相关信息，我的回答是..." 
\ No newline at end of file
+        return "基于检索到的相关信息，我的回答是...", relevant_docs 
\ No newline at end of file
@@ -0,0 +1,142 @@
+from typing import List, Dict, Any, Optional, Tuple
+from .document_store import Document
+from .embedding_cache import EmbeddingCache
+from .executor import OffloadExecutor
+import numpy as np
+import hashlib
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# sentence_transformers 会导入 torch，首次加载模型时才导入
+CrossEncoder = None
+
+def _cross_encoder_class():
+    global CrossEncoder
+    if CrossEncoder is None:
+        from sentence_transformers import CrossEncoder as model_class
+        CrossEncoder = model_class
+    return CrossEncoder
+
+# 进程池工作进程中的交叉编码器，由 _init_reranker_worker 加载
+_worker_model = None
+
+def _init_reranker_worker(model_name: str, cache_dir: Optional[str]) -> None:
+    """进程池初始化：每个工作进程加载一份交叉编码器"""
+    global _worker_model
+    _worker_model = _cross_encoder_class()(model_name, device="cpu", cache_folder=cache_dir)
+
+def _predict_in_worker(pairs: List[Tuple[str, str]], batch_size: int) -> np.ndarray:
+    scores = _worker_model.predict(pairs, batch_size=batch_size, show_progress_bar=False)
+    return np.asarray(scores, dtype="float32").reshape(len(pairs))
+
+class CrossEncoderReranker:
+    """交叉编码器重排序
+
+    对向量检索多取的候选文档，用交叉编码器逐对计算 (查询, 文档) 相关性得分，只保留得分最高的
+    top_k 个。模型在首次使用时加载，预测按 batch_size 分批在线程池或进程池中执行；
+    (模型, 查询, 文档内容哈希) 的得分缓存在 LRU/TTL 缓存中，重复的查询和文档不会重新计算。
+    """
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        cache_dir: Optional[str] = None,
+        batch_size: int = 32,
+        executor: str = "thread",
+        workers: int = 1,
+        cache_size: int = 8192,
+        cache_ttl: Optional[float] = 3600
+    ):
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.score_cache = EmbeddingCache(cache_size, cache_ttl)
+        self.executor = OffloadExecutor(
+            kind=executor,
+            max_workers=workers,
+            name="rerank",
+            initializer=_init_reranker_worker if executor == "process" else None,
+            initargs=(model_name, cache_dir) if executor == "process" else ()
+        )
+        self._model = None
+        self._model_lock = threading.Lock()
+        self.pairs_scored = 0
+        self.total_seconds = 0.0
+
+    @property
+    def model(self):
+        """交叉编码器，首次访问时加载"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    start_time = time.perf_counter()
+                    self._model = _cross_encoder_class()(self.model_name, device="cpu", cache_folder=self.cache_dir)
+                    logger.info(f"Loaded cross-encoder {self.model_name} in {time.perf_counter() - start_time:.2f}s")
+        return self._model
+
+    def _predict(self, pairs: List[Tuple[str, str]]) -> np.ndarray:
+        scores = self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        return np.asarray(scores, dtype="float32").reshape(len(pairs))
+
+    @staticmethod
+    def _pair_key(query: str, content: str) -> str:
+        return f"{query}\n{hashlib.sha1(content.encode('utf-8')).hexdigest()}"
+
+    async def score(self, query: str, documents: List[Document]) -> np.ndarray:
+        """返回每个文档与查询的相关性得分，只计算缓存中没有的文档对"""
+        scores = np.empty(len(documents), dtype="float32")
+        missing: Dict[str, List[int]] = {}  # 文档内容 -> 位置，相同内容只计算一次
+        for i, doc in enumerate(documents):
+            cached = self.score_cache.get(self.model_name, self._pair_key(query, doc.content))
+            if cached is None:
+                missing.setdefault(doc.content, []).append(i)
+            else:
+                scores[i] = cached
+
+        if missing:
+            start_time = time.perf_counter()
+            contents = list(missing)
+            pairs = [(query, content) for content in contents]
+            if self.executor.kind == "process":
+                predicted = await self.executor.run(_predict_in_worker, pairs, self.batch_size)
+            else:
+                predicted = await self.executor.run(self._predict, pairs)
+            for content, value in zip(contents, predicted):
+                scores[missing[content]] = value
+                self.score_cache.put(self.model_name, self._pair_key(query, content), np.float32(value))
+            self.pairs_scored += len(pairs)
+            self.total_seconds += time.perf_counter() - start_time
+        return scores
+
+    async def rerank(self, query: str, documents: List[Document], top_k: int = 5) -> List[Document]:
+        """按交叉编码器得分重新排序，返回得分最高的 top_k 个文档"""
+        return [doc for doc, _ in await self.rerank_with_scores(query, documents, top_k)]
+
+    async def rerank_with_scores(
+        self,
+        query: str,
+        documents: List[Document],
+        top_k: int = 5
+    ) -> List[Tuple[Document, float]]:
+        if not documents:
+            return []
+        scores = await self.score(query, documents)
+        order = np.argsort(-scores, kind="stable")[:top_k]
+        return [(documents[i], float(scores[i])) for i in order]
+
+    async def warm_up(self) -> None:
+        await self.score("warm up", [Document(content="warm up", metadata={})])
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "model": self.model_name,
+            "pairs_scored": self.pairs_scored,
+            "avg_ms_per_pair": self.total_seconds * 1000 / self.pairs_scored if self.pairs_scored else 0.0,
+            "score_cache": self.score_cache.stats(),
+            "executor": self.executor.stats()
+        }
+
+    def close(self) -> None:
+        self.executor.shutdown()
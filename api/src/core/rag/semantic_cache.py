@@ -0,0 +1,149 @@
+from typing import List, Dict, Any, Optional, Tuple
+from collections import OrderedDict
+from pydantic import BaseModel
+import numpy as np
+import faiss
+import threading
+import time
+
+class CachedResponse(BaseModel):
+    response: str
+    payload: Dict[str, Any]
+    scope: str
+    generation: int
+    created_at: float
+
+class SemanticResponseCache:
+    """语义回答缓存
+
+    把查询向量（归一化后做内积，即余弦相似度）放在一个小的平坦FAISS索引中，
+    命中条件为：相似度不低于 threshold、scope（模型和检索领域）相同、未超过 ttl，
+    且写入时文档存储的 generation 与当前一致——文档增删后 generation 变化，
+    旧回答在下次命中时自动失效。generation 是整个存储（或所查领域）的计数，
+    因此任何文档变化都会使该范围内的全部回答失效。超过 max_size 时按最近最少使用淘汰。
+    """
+    def __init__(
+        self,
+        dimension: int,
+        threshold: float = 0.95,
+        max_size: int = 1024,
+        ttl: Optional[float] = 600,
+        candidates: int = 8
+    ):
+        self.dimension = dimension
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self.candidates = candidates
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+        self._entries: "OrderedDict[int, CachedResponse]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.array(embedding, dtype="float32").reshape(1, -1)
+        faiss.normalize_L2(vector)
+        return vector
+
+    def _remove(self, entry_ids: List[int]) -> None:
+        for entry_id in entry_ids:
+            del self._entries[entry_id]
+        self.index.remove_ids(np.array(entry_ids, dtype=np.int64))
+
+    def get(
+        self,
+        embedding: np.ndarray,
+        scope: str,
+        generation: int
+    ) -> Optional[Tuple[CachedResponse, float]]:
+        """查找相似查询的缓存回答，返回 (缓存项, 相似度)"""
+        with self._lock:
+            if not self._entries:
+                self.misses += 1
+                return None
+            k = min(self.candidates, len(self._entries))
+            similarities, entry_ids = self.index.search(self._normalize(embedding), k)
+            now = time.monotonic()
+            stale = []
+            hit = None
+            for similarity, entry_id in zip(similarities[0].tolist(), entry_ids[0].tolist()):
+                if entry_id < 0 or similarity < self.threshold:
+                    break
+                entry = self._entries[entry_id]
+                if self.ttl is not None and now - entry.created_at > self.ttl:
+                    stale.append(entry_id)
+                    continue
+                if entry.scope != scope:
+                    continue
+                if entry.generation != generation:
+                    stale.append(entry_id)
+                    continue
+                self._entries.move_to_end(entry_id)
+                hit = (entry, similarity)
+                break
+            if stale:
+                self.invalidations += len(stale)
+                self._remove(stale)
+            if hit is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return hit
+
+    def put(
+        self,
+        embedding: np.ndarray,
+        scope: str,
+        generation: int,
+        response: str,
+        payload: Optional[Dict[str, Any]] = None
+    ) -> None:
+        if self.max_size <= 0:
+            return
+        entry = CachedResponse(
+            response=response,
+            payload=payload or {},
+            scope=scope,
+            generation=generation,
+            created_at=time.monotonic()
+        )
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self.index.add_with_ids(self._normalize(embedding), np.array([entry_id], dtype=np.int64))
+            self._entries[entry_id] = entry
+            overflow = len(self._entries) - self.max_size
+            if overflow > 0:
+                self.evictions += overflow
+                self._remove(list(self._entries)[:overflow])
+
+    def invalidate(self, scope: Optional[str] = None) -> int:
+        """删除指定 scope（为空时全部）的缓存回答，返回删除数量"""
+        with self._lock:
+            entry_ids = [
+                entry_id for entry_id, entry in self._entries.items()
+                if scope is None or entry.scope == scope
+            ]
+            if entry_ids:
+                self._remove(entry_ids)
+                self.invalidations += len(entry_ids)
+            return len(entry_ids)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "threshold": self.threshold,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
@@ -0,0 +1,306 @@
+from typing import List, Dict, Any, Optional, Set, Tuple, Union, AsyncIterator
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from .document_store import BaseDocumentStore, Document
+from .faiss_document_store import FAISSDocumentStore
+from .snapshot import snapshot_exists
+import numpy as np
+import asyncio
+import os
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# 领域名称直接用作分片目录名，只允许字母、数字、下划线、中文和连字符
+_DOMAIN_NAME = re.compile(r"^[\w\-]+$")
+
+class ShardedDocumentStore(BaseDocumentStore):
+    """按领域分片的文档存储
+
+    每个领域对应一个独立的 FAISSDocumentStore 分片，快照保存在 snapshot_root/<领域名>。
+    分片在首次访问时才加载，加载数超过 max_loaded_shards 或空闲超过 idle_ttl 秒的分片
+    会被保存并卸载。所有分片共享同一个嵌入模型、嵌入执行器和查询缓存。
+    只有写入文档时才会创建新分片，检索和删除只访问已存在的分片。
+    """
+    def __init__(
+        self,
+        snapshot_root: str,
+        store_options: Optional[Dict[str, Any]] = None,
+        default_domain: str = "general",
+        max_loaded_shards: int = 4,
+        idle_ttl: Optional[float] = None
+    ):
+        if max_loaded_shards < 1:
+            raise ValueError("max_loaded_shards 至少为 1")
+        self.snapshot_root = snapshot_root
+        self.store_options = store_options or {}
+        self.default_domain = default_domain
+        self.max_loaded_shards = max_loaded_shards
+        self.idle_ttl = idle_ttl
+
+        # 只加载嵌入模型、不保存文档的存储，作为各分片的 embedding_source
+        self.embedder = FAISSDocumentStore(**self.store_options)
+        self.shards: "OrderedDict[str, FAISSDocumentStore]" = OrderedDict()  # 按最近使用排序
+        self._last_used: Dict[str, float] = {}
+        self._in_use: Dict[str, int] = {}
+        self._dirty: Set[str] = set()
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._idle_task: Optional[asyncio.Task] = None
+        self.loads = 0
+        self.evictions = 0
+        # 各领域的文档版本号，分片卸载后仍保留，用于语义回答缓存失效
+        self.generations: Dict[str, int] = {}
+
+    def shard_dir(self, domain: str) -> str:
+        """返回领域分片的快照目录"""
+        if not _DOMAIN_NAME.match(domain):
+            raise ValueError(f"无效的领域名称: {domain}")
+        return os.path.join(self.snapshot_root, domain)
+
+    def known_domains(self) -> List[str]:
+        """已加载或已有快照的全部领域"""
+        domains = set(self.shards)
+        if os.path.isdir(self.snapshot_root):
+            for name in os.listdir(self.snapshot_root):
+                if _DOMAIN_NAME.match(name) and snapshot_exists(os.path.join(self.snapshot_root, name)):
+                    domains.add(name)
+        return sorted(domains)
+
+    def has_domain(self, domain: str) -> bool:
+        """领域分片是否存在（已加载、待保存或已有快照），无效的领域名称视为不存在"""
+        if domain in self.shards or domain in self._dirty:
+            return True
+        return bool(_DOMAIN_NAME.match(domain)) and snapshot_exists(os.path.join(self.snapshot_root, domain))
+
+    def _existing_domains(self, domains: List[str]) -> List[str]:
+        """过滤掉不存在的领域，避免请求中的任意领域名称创建空分片并挤出已加载的分片"""
+        existing = [domain for domain in domains if self.has_domain(domain)]
+        if len(existing) != len(domains):
+            logger.debug(f"Ignoring unknown domains: {sorted(set(domains) - set(existing))}")
+        return existing
+
+    @asynccontextmanager
+    async def shard(self, domain: str) -> AsyncIterator[FAISSDocumentStore]:
+        """获取领域分片，使用期间不会被卸载"""
+        store = await self._acquire(domain)
+        try:
+            yield store
+        finally:
+            self._in_use[domain] -= 1
+            self._last_used[domain] = time.monotonic()
+        await self._evict()
+
+    async def _acquire(self, domain: str) -> FAISSDocumentStore:
+        store = self.shards.get(domain)
+        if store is None:
+            snapshot_dir = self.shard_dir(domain)
+            async with self._locks.setdefault(domain, asyncio.Lock()):
+                store = self.shards.get(domain)
+                if store is None:
+                    store = FAISSDocumentStore(**self.store_options, embedding_source=self.embedder)
+                    if snapshot_exists(snapshot_dir):
+                        loop = asyncio.get_running_loop()
+                        await loop.run_in_executor(None, store.load_snapshot, snapshot_dir)
+                    self.shards[domain] = store
+                    self.loads += 1
+                    logger.info(f"Loaded index shard {domain} ({len(store.doc_ids)} documents)")
+        self.shards.move_to_end(domain)
+        self._in_use[domain] = self._in_use.get(domain, 0) + 1
+        self._last_used[domain] = time.monotonic()
+        if self.idle_ttl and self._idle_task is None:
+            self._idle_task = asyncio.create_task(self._evict_idle_loop())
+        return store
+
+    async def _evict(self) -> None:
+        """卸载超出数量上限或空闲过久的分片，正在使用的分片不会被卸载"""
+        now = time.monotonic()
+        for domain in list(self.shards):
+            if domain not in self.shards or self._in_use.get(domain):
+                continue
+            over_limit = len(self.shards) > self.max_loaded_shards
+            idle = self.idle_ttl is not None and now - self._last_used[domain] > self.idle_ttl
+            if over_limit or idle:
+                await self._unload(domain)
+
+    async def _unload(self, domain: str) -> None:
+        # 先移出分片表，保存期间的新请求会等待锁并从快照重新加载
+        store = self.shards.pop(domain)
+        async with self._locks.setdefault(domain, asyncio.Lock()):
+            try:
+                if domain in self._dirty:
+                    loop = asyncio.get_running_loop()
+                    await loop.run_in_executor(None, store.save_snapshot, self.shard_dir(domain))
+                    self._dirty.discard(domain)
+            finally:
+                store.close()
+        self.evictions += 1
+        logger.info(f"Evicted index shard {domain}")
+
+    async def _evict_idle_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.idle_ttl / 2)
+            try:
+                await self._evict()
+            except Exception as e:
+                logger.error(f"Failed to evict idle shards: {str(e)}")
+
+    def _resolve_domains(self, domains: Union[str, List[str], None]) -> List[str]:
+        if domains is None:
+            return [self.default_domain]
+        if isinstance(domains, str):
+            return [domains]
+        return list(dict.fromkeys(domains))
+
+    async def add_documents(self, documents: List[Document], domain: Optional[str] = None) -> None:
+        """添加文档，未指定 domain 时按文档元数据中的 domain 字段路由"""
+        groups: Dict[str, List[Document]] = {}
+        for doc in documents:
+            target = domain or doc.metadata.get("domain") or self.default_domain
+            groups.setdefault(target, []).append(doc)
+        for target, group in groups.items():
+            async with self.shard(target) as store:
+                await store.add_documents(group)
+                self._dirty.add(target)
+                self.generations[target] = self.generations.get(target, 0) + 1
+
+    async def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        threshold: float = 0.7,
+        mode: Optional[str] = None,
+        domains: Union[str, List[str], None] = None,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        """在一个或多个领域中检索，多个领域并行查询后按得分合并
+        
+        未指定 domains 时，过滤条件中的 domain 用于选择分片，其余条件在分片内过滤。
+        不存在的领域不返回结果。
+        """
+        if domains is None and filter and "domain" in filter:
+            filter = dict(filter)
+            domains = filter.pop("domain")
+        targets = self._existing_domains(self._resolve_domains(domains))
+        if not targets:
+            return []
+        if len(targets) == 1:
+            async with self.shard(targets[0]) as store:
+                return await store.search(query, top_k, threshold, mode, filter)
+
+        async def search_shard(domain: str) -> List[Tuple[Document, float]]:
+            async with self.shard(domain) as store:
+                return await store.search_with_scores(query, top_k, threshold, mode, filter)
+
+        results = await asyncio.gather(*[search_shard(domain) for domain in targets])
+        merged = sorted(
+            (hit for hits in results for hit in hits),
+            key=lambda hit: hit[1],
+            reverse=True
+        )
+        return [doc for doc, _ in merged[:top_k]]
+
+    async def delete_documents(
+        self,
+        filter: Dict[str, Any],
+        domains: Union[str, List[str], None] = None
+    ) -> None:
+        """删除匹配的文档，未指定领域且过滤条件中没有 domain 时在所有已知领域中删除"""
+        if domains is None and "domain" in filter:
+            # 领域条件只用于路由，分片内的文档不一定在元数据中记录领域
+            filter = dict(filter)
+            targets = self._resolve_domains(filter.pop("domain"))
+        elif domains is None:
+            targets = self.known_domains()
+        else:
+            targets = self._resolve_domains(domains)
+        for domain in self._existing_domains(targets):
+            async with self.shard(domain) as store:
+                before = len(store.doc_ids)
+                await store.delete_documents(filter)
+                if len(store.doc_ids) != before:
+                    self._dirty.add(domain)
+                    self.generations[domain] = self.generations.get(domain, 0) + 1
+
+    def generation(self, domains: Union[str, List[str], None] = None) -> int:
+        """返回指定领域的文档版本号之和，任一领域增删文档后都会变化"""
+        return sum(self.generations.get(domain, 0) for domain in self._resolve_domains(domains))
+
+    async def embed_query(self, query: str) -> np.ndarray:
+        """用共享的嵌入模型计算查询向量"""
+        return await self.embedder.embed_query(query)
+
+    async def warm_up(self) -> float:
+        """预先加载共享的嵌入模型，返回耗时秒数"""
+        return await self.embedder.warm_up()
+
+    def save_snapshots(self, domains: Union[str, List[str], None] = None) -> None:
+        """保存有修改的已加载分片，domains 为空时保存全部"""
+        targets = self._dirty if domains is None else self._dirty.intersection(self._resolve_domains(domains))
+        for domain in list(targets):
+            store = self.shards.get(domain)
+            if store is not None:
+                store.save_snapshot(self.shard_dir(domain))
+            self._dirty.discard(domain)
+
+    def domain_store(self, domain: str) -> "DomainDocumentStore":
+        """返回只读写一个领域分片的文档存储视图"""
+        self.shard_dir(domain)  # 校验领域名称
+        return DomainDocumentStore(self, domain)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回分片加载情况和各已加载分片的统计"""
+        return {
+            "loaded_shards": list(self.shards),
+            "max_loaded_shards": self.max_loaded_shards,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "query_cache": self.embedder.query_cache.stats(),
+            "embedding_executor": self.embedder.embedding_executor.stats(),
+            "shards": {
+                domain: {
+                    "documents": len(store.doc_ids),
+                    "memory": store.memory_footprint(),
+                    "index_executor": store.index_executor.stats()
+                }
+                for domain, store in self.shards.items()
+            }
+        }
+
+    def close(self) -> None:
+        """关闭全部分片和共享的嵌入执行器"""
+        if self._idle_task is not None:
+            self._idle_task.cancel()
+        for store in self.shards.values():
+            store.close()
+        self.shards.clear()
+        self.embedder.close()
+
+class DomainDocumentStore(BaseDocumentStore):
+    """分片存储中单个领域的视图
+
+    读写都经过 ShardedDocumentStore，因此领域的版本号和待保存标记与直接调用分片存储时一致，
+    可以交给 IncrementalIngester 这类只认识单个文档存储的组件使用。
+    """
+    def __init__(self, sharded: ShardedDocumentStore, domain: str):
+        self.sharded = sharded
+        self.domain = domain
+
+    async def add_documents(self, documents: List[Document]) -> None:
+        await self.sharded.add_documents(documents, domain=self.domain)
+
+    async def search(
+        self,
+        query: str,
+        top_k: int = 5,
+        filter: Optional[Dict[str, Any]] = None
+    ) -> List[Document]:
+        return await self.sharded.search(query, top_k, domains=self.domain, filter=filter)
+
+    async def delete_documents(self, filter: Dict[str, Any]) -> None:
+        await self.sharded.delete_documents(filter, domains=self.domain)
+
+    def save_snapshot(self, snapshot_dir: Optional[str] = None) -> None:
+        """保存该领域分片，快照目录固定为分片目录"""
+        self.sharded.save_snapshots(self.domain)
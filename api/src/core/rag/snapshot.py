@@ -0,0 +1,141 @@
+from typing import List, Dict, Any, Optional, Iterator
+import numpy as np
+import json
+import os
+from .document_store import Document
+
+# 快照格式版本，格式变化时递增
+SNAPSHOT_VERSION = 4
+
+MANIFEST_FILE = "manifest.json"
+INDEX_FILE = "index.faiss"
+STAGING_INDEX_FILE = "staging.faiss"
+RECORDS_FILE = "documents.bin"
+OFFSETS_FILE = "offsets.npy"
+DOC_IDS_FILE = "doc_ids.npy"
+TOMBSTONES_FILE = "tombstones.npy"
+
+def encode_record(document: Document) -> bytes:
+    """将文档内容和元数据序列化为一条 UTF-8 JSON 记录"""
+    return json.dumps(
+        {"content": document.content, "metadata": document.metadata},
+        ensure_ascii=False
+    ).encode("utf-8")
+
+class MappedDocuments:
+    """内存映射的文档快照
+
+    documents.bin 中按顺序存放每个文档的 JSON 记录，offsets.npy 记录每条记录的起止位置。
+    文档只在被访问时才解码为 Document 对象。
+    """
+    def __init__(self, snapshot_dir: str):
+        self.offsets = np.load(os.path.join(snapshot_dir, OFFSETS_FILE), mmap_mode="r")
+        records_path = os.path.join(snapshot_dir, RECORDS_FILE)
+        if os.path.getsize(records_path) > 0:
+            self.records = np.memmap(records_path, dtype=np.uint8, mode="r")
+        else:
+            self.records = np.empty(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    @property
+    def nbytes(self) -> int:
+        """映射文件的总大小（由操作系统页缓存按需加载，不计入进程堆内存）"""
+        return self.records.nbytes + self.offsets.nbytes
+
+    def record(self, position: int) -> bytes:
+        """返回指定位置的原始记录"""
+        return self.records[self.offsets[position]:self.offsets[position + 1]].tobytes()
+
+    def __getitem__(self, position: int) -> Document:
+        data = json.loads(self.record(position))
+        return Document(content=data["content"], metadata=data["metadata"])
+
+class DocumentCollection:
+    """文档集合：快照中的文档按需从内存映射文件读取，新增文档保存在内存中
+
+    集合中不保存嵌入向量，向量只存在于FAISS索引中，需要时从索引重建。
+    """
+    def __init__(self, mapped: Optional[MappedDocuments] = None):
+        self._mapped = mapped
+        self._documents: List[Optional[Document]] = []
+
+    @property
+    def _mapped_count(self) -> int:
+        return len(self._mapped) if self._mapped is not None else 0
+
+    def __len__(self) -> int:
+        return self._mapped_count + len(self._documents)
+
+    def __getitem__(self, position: int) -> Document:
+        if position < 0:
+            position += len(self)
+        if position < self._mapped_count:
+            return self._mapped[position]
+        return self._documents[position - self._mapped_count]
+
+    def __iter__(self) -> Iterator[Document]:
+        for position in range(len(self)):
+            yield self[position]
+
+    def extend(self, documents: List[Document]) -> None:
+        """追加文档"""
+        self._documents.extend(documents)
+
+    def release(self, position: int) -> None:
+        """释放已删除文档占用的内存，快照中的文档在下次保存快照时回收"""
+        if position >= self._mapped_count:
+            self._documents[position - self._mapped_count] = None
+
+    def record(self, position: int) -> bytes:
+        """返回指定位置文档的序列化记录，快照中的文档无需解码"""
+        if position < self._mapped_count:
+            return self._mapped.record(position)
+        return encode_record(self[position])
+
+    def memory_stats(self) -> Dict[str, int]:
+        return {
+            "in_memory_documents": sum(doc is not None for doc in self._documents),
+            "mapped_bytes": self._mapped.nbytes if self._mapped is not None else 0
+        }
+
+def write_documents(
+    snapshot_dir: str,
+    documents: DocumentCollection,
+    positions: Optional[List[int]] = None
+) -> None:
+    """将文档记录和偏移量写入快照目录（向量随FAISS索引保存）
+
+    positions 指定要写入的文档位置及顺序，默认写入全部文档。
+    """
+    if positions is None:
+        positions = list(range(len(documents)))
+
+    offsets = np.zeros(len(positions) + 1, dtype=np.int64)
+    with open(os.path.join(snapshot_dir, RECORDS_FILE), "wb") as f:
+        for row, position in enumerate(positions):
+            record = documents.record(position)
+            f.write(record)
+            offsets[row + 1] = offsets[row] + len(record)
+    np.save(os.path.join(snapshot_dir, OFFSETS_FILE), offsets)
+
+def write_manifest(snapshot_dir: str, manifest: Dict[str, Any]) -> None:
+    with open(os.path.join(snapshot_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump({"version": SNAPSHOT_VERSION, **manifest}, f, ensure_ascii=False, indent=2)
+
+def read_manifest(snapshot_dir: str) -> Dict[str, Any]:
+    """读取并校验快照清单"""
+    manifest_path = os.path.join(snapshot_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        raise FileNotFoundError(f"快照清单不存在: {manifest_path}")
+    with open(manifest_path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("version") != SNAPSHOT_VERSION:
+        raise ValueError(
+            f"不支持的快照版本: {manifest.get('version')}，当前版本为 {SNAPSHOT_VERSION}"
+        )
+    return manifest
+
+def snapshot_exists(snapshot_dir: str) -> bool:
+    return os.path.exists(os.path.join(snapshot_dir, MANIFEST_FILE))
@@ -1,34 +1,78 @@
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from .document_store import BaseDocumentStore, Document
+from .chunking import TextChunker
 import os
 import json
 
+SUPPORTED_EXTENSIONS = ('.txt', '.md', '.json')
+
+def iter_document_files(docs_dir: str, recursive: bool = True) -> Iterator[str]:
+    """遍历目录下支持的文档文件，recursive 为 False 时不进入子目录"""
+    for root, _, files in os.walk(docs_dir):
+        for file in sorted(files):
+            if file.endswith(SUPPORTED_EXTENSIONS):
+                yield os.path.join(root, file)
+        if not recursive:
+            break
+
+def read_document_file(file_path: str) -> str:
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+def iter_chunks(
+    file_path: str,
+    content: str,
+    chunker: Optional[TextChunker],
+    metadata: Optional[Dict[str, Any]] = None
+) -> Iterator[Document]:
+    """把单个文件的内容切分为文档块，未指定分块器时整个文件作为一个文档
+
+    source 始终为文件路径，不会被 metadata 覆盖，增量导入按它删除旧的文档块
+    """
+    doc_metadata = {
+        "type": file_path.split('.')[-1],
+        **(metadata or {}),
+        "source": file_path
+    }
+    if chunker is None:
+        yield Document(
+            content=content,
+            metadata=doc_metadata,
+            embedding=None  # 将由文档存储生成
+        )
+        return
+    yield from chunker.chunk(content, doc_metadata)
+
+def iter_directory_chunks(
+    docs_dir: str,
+    chunker: Optional[TextChunker] = None,
+    metadata: Optional[Dict[str, Any]] = None
+) -> Iterator[Document]:
+    """逐个文件读取并分块，不会一次性把整个目录读入内存"""
+    for file_path in iter_document_files(docs_dir):
+        yield from iter_chunks(file_path, read_document_file(file_path), chunker, metadata)
+
 async def load_documents(
     document_store: BaseDocumentStore,
     docs_dir: str,
-    metadata: Optional[Dict[str, Any]] = None
-) -> None:
-    """从目录加载文档"""
-    documents = []
-    
-    for root, _, files in os.walk(docs_dir):
-        for file in files:
-            if file.endswith(('.txt', '.md', '.json')):
-                file_path = os.path.join(root, file)
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    
-                doc_metadata = {
-                    "source": file_path,
-                    "type": file.split('.')[-1],
-                    **(metadata or {})
-                }
-                
-                document = Document(
-                    content=content,
-                    metadata=doc_metadata,
-                    embedding=None  # 将由文档存储生成
-                )
-                documents.append(document)
-                
-    await document_store.add_documents(documents) 
\ No newline at end of file
+    metadata: Optional[Dict[str, Any]] = None,
+    chunker: Optional[TextChunker] = None,
+    batch_size: int = 256
+) -> int:
+    """从目录加载文档
+
+    文档块按 batch_size 分批写入文档存储，内存中最多保留一个批次。返回写入的文档块数。
+    """
+    batch: List[Document] = []
+    total = 0
+    for document in iter_directory_chunks(docs_dir, chunker, metadata):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            await document_store.add_documents(batch)
+            total += len(batch)
+            batch = []
+
+    if batch:
+        await document_store.add_documents(batch)
+        total += len(batch)
+    return total
@@ -0,0 +1,232 @@
+from typing import Dict, Any, Optional, List, Tuple
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from .rag.executor import OffloadExecutor
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (response, latency in seconds of the provider call that produced it)
+CacheEntry = Tuple[str, float]
+
+def response_cache_key(
+    provider: str,
+    model: Optional[str],
+    messages: List[Dict[str, str]],
+    params: Dict[str, Any]
+) -> str:
+    """Hash of everything that determines the completion"""
+    payload = json.dumps(
+        {"provider": provider, "model": model, "messages": messages, "params": params},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResponseCacheBackend(ABC):
+    """One storage tier of the LLM response cache"""
+    name = "backend"
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        pass
+
+    @abstractmethod
+    async def set(self, key: str, entry: CacheEntry) -> None:
+        pass
+
+    @abstractmethod
+    async def clear(self) -> None:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+    def close(self) -> None:
+        pass
+
+class MemoryCacheBackend(ResponseCacheBackend):
+    """In-process LRU tier with TTL"""
+    name = "memory"
+
+    def __init__(self, max_size: int = 1024, ttl: Optional[float] = 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, CacheEntry]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            created_at, entry = item
+            if self.ttl is not None and time.monotonic() - created_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    async def set(self, key: str, entry: CacheEntry) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic(), entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"size": len(self._entries), "max_size": self.max_size, "evictions": self.evictions}
+
+class SQLiteCacheBackend(ResponseCacheBackend):
+    """On-disk tier that survives restarts; queries run on a single background thread"""
+    name = "sqlite"
+
+    def __init__(self, path: str, ttl: Optional[float] = 86400, max_entries: int = 100000):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._executor = OffloadExecutor(kind="thread", max_workers=1, name="llm-cache-sqlite")
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, latency REAL NOT NULL, "
+            "created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._conn.commit()
+        self._writes = 0
+
+    def _get(self, key: str) -> Optional[CacheEntry]:
+        row = self._conn.execute(
+            "SELECT response, latency, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if self.ttl is not None and now - row[2] > self.ttl:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            self._conn.commit()
+            return None
+        self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        return row[0], row[1]
+
+    def _set(self, key: str, entry: CacheEntry) -> None:
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?)",
+            (key, entry[0], entry[1], now, now)
+        )
+        self._writes += 1
+        # Prune expired and least recently used rows every few hundred writes
+        if self._writes % 256 == 0:
+            if self.ttl is not None:
+                self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN ("
+                "SELECT key FROM responses ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+        self._conn.commit()
+
+    def _clear(self) -> None:
+        self._conn.execute("DELETE FROM responses")
+        self._conn.commit()
+
+    async def get(self, key: str) -> Optional[CacheEntry]:
+        return await self._executor.run(self._get, key)
+
+    async def set(self, key: str, entry: CacheEntry) -> None:
+        await self._executor.run(self._set, key, entry)
+
+    async def clear(self) -> None:
+        await self._executor.run(self._clear)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "max_entries": self.max_entries}
+
+    def close(self) -> None:
+        self._executor.shutdown()
+        self._conn.close()
+
+class LLMResponseCache:
+    """Exact-match cache of LLM completions over one or more tiers
+
+    Lookups go through the tiers in order (memory first, then disk); a hit in a
+    slower tier is copied into the faster ones. Each entry keeps the latency of
+    the provider call that produced it, so hits report the time they saved.
+    """
+    def __init__(self, tiers: List[ResponseCacheBackend]):
+        if not tiers:
+            raise ValueError("At least one cache tier is required")
+        self.tiers = tiers
+        self.hits: Dict[str, int] = {tier.name: 0 for tier in tiers}
+        self.misses = 0
+        self.bypassed = 0
+        self.saved_seconds = 0.0
+
+    async def get(self, key: str) -> Optional[str]:
+        for position, tier in enumerate(self.tiers):
+            try:
+                entry = await tier.get(key)
+            except Exception as e:
+                logger.warning(f"Response cache tier {tier.name} lookup failed: {str(e)}")
+                continue
+            if entry is None:
+                continue
+            self.hits[tier.name] += 1
+            self.saved_seconds += entry[1]
+            for faster in self.tiers[:position]:
+                try:
+                    await faster.set(key, entry)
+                except Exception as e:
+                    logger.warning(f"Response cache tier {faster.name} promotion failed: {str(e)}")
+            return entry[0]
+        self.misses += 1
+        return None
+
+    async def set(self, key: str, response: str, latency: float) -> None:
+        for tier in self.tiers:
+            try:
+                await tier.set(key, (response, latency))
+            except Exception as e:
+                logger.warning(f"Response cache tier {tier.name} write failed: {str(e)}")
+
+    async def clear(self) -> None:
+        for tier in self.tiers:
+            await tier.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = sum(self.hits.values())
+        lookups = hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "saved_seconds": self.saved_seconds,
+            "tiers": {tier.name: tier.stats() for tier in self.tiers}
+        }
+
+    def close(self) -> None:
+        for tier in self.tiers:
+            tier.close()
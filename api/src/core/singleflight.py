@@ -0,0 +1,125 @@
+from typing import Dict, Any, Optional, List, Callable, Awaitable, AsyncGenerator, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+class _StreamFlight:
+    """Buffer of one upstream stream that any number of subscribers replay and follow
+
+    The upstream stream is cancelled when its last subscriber closes or is cancelled
+    before the stream finished; an abandoned flight accepts no new subscribers.
+    """
+    def __init__(self):
+        self.chunks: List[str] = []
+        self.finished = False
+        self.abandoned = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def _notify(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    def publish(self, chunk: str) -> None:
+        self.chunks.append(chunk)
+        self._notify()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.error = error
+        self.finished = True
+        self._notify()
+
+    async def subscribe(self) -> AsyncGenerator[str, None]:
+        position = 0
+        self.subscribers += 1
+        try:
+            while True:
+                changed = self._changed
+                while position < len(self.chunks):
+                    yield self.chunks[position]
+                    position += 1
+                if self.finished:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await changed.wait()
+        finally:
+            self.subscribers -= 1
+            if self.subscribers == 0 and not self.finished:
+                self.abandoned = True
+                if self.task is not None:
+                    self.task.cancel()
+
+class SingleFlight:
+    """Coalesce concurrent identical calls into one in-flight call
+
+    The first caller for a key starts the call as a separate task; callers that
+    arrive while it is running wait for the same task and receive the same result
+    or exception. A caller being cancelled does not cancel the shared call. The key
+    is released when the call finishes, so later callers start a fresh call.
+    Streams are shared the same way: subscribers that join late first receive the
+    chunks already produced, then follow the live stream. Unlike calls, a stream
+    is cancelled and its upstream generator closed once every subscriber has left.
+    """
+    def __init__(self):
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, _StreamFlight] = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.executed += 1
+            task.add_done_callback(lambda done: self._release(self._calls, key, done))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+    def stream(self, key: str, factory: Callable[[], AsyncGenerator[str, None]]) -> AsyncGenerator[str, None]:
+        flight = self._streams.get(key)
+        if flight is None or flight.abandoned:
+            flight = _StreamFlight()
+            self._streams[key] = flight
+            self.executed += 1
+            flight.task = asyncio.ensure_future(self._pump(factory, flight))
+            flight.task.add_done_callback(lambda done: self._release(self._streams, key, flight))
+        else:
+            self.shared += 1
+        return flight.subscribe()
+
+    @staticmethod
+    async def _pump(factory: Callable[[], AsyncGenerator[str, None]], flight: _StreamFlight) -> None:
+        stream = factory()
+        try:
+            async for chunk in stream:
+                flight.publish(chunk)
+        except BaseException as e:
+            flight.finish(e)
+            if not isinstance(e, Exception):
+                raise
+        else:
+            flight.finish()
+        finally:
+            await stream.aclose()
+
+    @staticmethod
+    def _release(calls: Dict[str, Any], key: str, value: Any) -> None:
+        if calls.get(key) is value:
+            del calls[key]
+        # Mark the exception as retrieved when every waiter has gone away
+        if isinstance(value, asyncio.Task) and not value.cancelled():
+            value.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.executed + self.shared
+        return {
+            "executed": self.executed,
+            "shared": self.shared,
+            "in_flight": len(self._calls) + len(self._streams),
+            "dedup_rate": self.shared / total if total else 0.0
+        }
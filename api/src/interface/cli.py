@@ -1,10 +1,10 @@
 import typer
 from rich import print
-from ..core.llm_manager import LLMManager
+from ..core.llm_manager import get_llm_manager
 from ..adapter.adapter_manager import AdapterManager
 
 app = typer.Typer()
-llm_manager = LLMManager()
+llm_manager = get_llm_manager()
 adapter_manager = AdapterManager()
 
 @app.command()
@@ -1,17 +1,24 @@
+import time
+# Measure how long importing the application takes (reported in /stats)
+_import_started = time.perf_counter()
+
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from src.api.routes import llm, signal_processing, domain_config, service_registry, llm_execution
-from src.core.rag.utils import load_documents
+from src.core.rag.snapshot import snapshot_exists
+from src.core.rag.utils import iter_document_files
+from src.core.rag.chunking import TextChunker
+from src.core.rag.ingestion import IncrementalIngester
+from src.core.rag.sharding import ShardedDocumentStore
+from src.core.config.settings import settings
 import uvicorn
 from typing import Any
 import os
 from .core.db.domain_db import DomainDB
 from pathlib import Path
 from fastapi.responses import JSONResponse
-import time
 import asyncio
 import logging
-from src.core.llm_manager import LLMManager
 
 # Configure logging
 logging.basicConfig(
@@ -19,6 +26,7 @@ logging.basicConfig(
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
+import_seconds = time.perf_counter() - _import_started
 
 app = FastAPI(
     title="LLM Domain Framework",
@@ -42,21 +50,153 @@ app.include_router(domain_config.router, prefix="/api/v1", tags=["Domain Configu
 app.include_router(service_registry.router, prefix="/api/v1", tags=["Service Registry"])
 app.include_router(llm_execution.router, prefix="/api/v1/llm", tags=["LLM Execution"])
 
+def resolve_path(key: str, default: str) -> str:
+    """Resolve a configured path relative to the api directory"""
+    return os.path.join(Path(__file__).parent.parent, settings.get(key, default))
+
+def get_snapshot_dir() -> str:
+    """Resolve the document store snapshot directory"""
+    return resolve_path("rag.snapshot_dir", "data/index")
+
+async def sync_documents(
+    document_store,
+    docs_dir: str,
+    manifest_path: str,
+    snapshot_dir: str,
+    recursive: bool = True
+) -> None:
+    """Incrementally ingest new or changed documents and drop removed ones"""
+    logger.info(f"Loading documents from {docs_dir}...")
+    ingester = IncrementalIngester(
+        document_store,
+        manifest_path=manifest_path,
+        chunker=TextChunker(
+            chunk_size=settings.get("rag.chunking.chunk_size", 256),
+            overlap=settings.get("rag.chunking.overlap", 32),
+            mode=settings.get("rag.chunking.mode", "sentence")
+        ),
+        read_concurrency=settings.get("rag.ingestion.read_concurrency", 8),
+        batch_size=settings.get("rag.ingestion.batch_size", 256)
+    )
+    # The manifest only describes what the snapshot contains
+    if not snapshot_exists(snapshot_dir):
+        ingester.reset()
+    
+    stats = await ingester.sync(docs_dir, recursive)
+    if stats["new"] or stats["changed"] or stats["removed"]:
+        document_store.save_snapshot(snapshot_dir)
+    ingester.save_manifest()
+
+async def sync_domain_documents(document_store: ShardedDocumentStore, docs_dir: str) -> None:
+    """Ingest each subdirectory of the documents directory into its domain shard
+
+    Files directly under the documents directory go to the default domain shard.
+    Writes go through the sharded store so domain generations and pending saves
+    are tracked.
+    """
+    manifest_dir = resolve_path("rag.ingestion.manifest_dir", "data/shard_manifests")
+    default_domain = document_store.default_domain
+    # The dot keeps this manifest apart from the one of a "<default domain>" subdirectory
+    root_manifest = os.path.join(manifest_dir, f"{default_domain}.root.json")
+    if os.path.exists(root_manifest) or any(iter_document_files(docs_dir, recursive=False)):
+        await sync_documents(
+            document_store.domain_store(default_domain),
+            docs_dir,
+            root_manifest,
+            document_store.shard_dir(default_domain),
+            recursive=False
+        )
+    for domain in sorted(os.listdir(docs_dir)):
+        domain_dir = os.path.join(docs_dir, domain)
+        if not os.path.isdir(domain_dir):
+            continue
+        try:
+            snapshot_dir = document_store.shard_dir(domain)
+        except ValueError as e:
+            logger.warning(f"Skipping documents directory {domain_dir}: {str(e)}")
+            continue
+        await sync_documents(
+            document_store.domain_store(domain),
+            domain_dir,
+            os.path.join(manifest_dir, f"{domain}.json"),
+            snapshot_dir
+        )
+
+async def warm_up(llm_manager, timings) -> None:
+    """Load the embedding (and re-ranking) models in the background so the first query does not pay for it"""
+    try:
+        timings["warmup_seconds"] = await llm_manager.document_store.warm_up()
+        if llm_manager.reranker is not None:
+            await llm_manager.reranker.warm_up()
+        logger.info(f"Embedding model warm-up finished in {timings['warmup_seconds']:.2f}s")
+    except Exception as e:
+        logger.error(f"Embedding model warm-up failed: {str(e)}")
+
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and load documents on startup"""
+    started = time.perf_counter()
+    timings = llm.llm_manager.timings
+    timings["import_seconds"] = import_seconds
     try:
-        # Initialize database
-        await DomainDB.init_db()
-        logger.info("Database initialization completed")
-        
-        # Load documents
-        docs_dir = os.path.join(Path(__file__).parent.parent, "data", "documents")
-        if os.path.exists(docs_dir):
-            logger.info(f"Loading documents from {docs_dir}...")
-            # TODO: Implement document loading logic
+        await startup_tasks()
     except Exception as e:
         logger.error(f"Startup initialization failed: {str(e)}")
+    finally:
+        timings["startup_seconds"] = time.perf_counter() - started
+        logger.info(
+            f"Imported application in {import_seconds:.2f}s, "
+            f"startup finished in {timings['startup_seconds']:.2f}s"
+        )
+    if settings.get("rag.warmup", False):
+        app.state.warmup_task = asyncio.create_task(warm_up(llm.llm_manager, timings))
+
+async def startup_tasks() -> None:
+    """Initialize the database, restore snapshots and ingest new documents"""
+    # Initialize database
+    await DomainDB.init_db()
+    logger.info("Database initialization completed")
+    
+    document_store = llm.llm_manager.document_store
+    docs_dir = resolve_path("rag.ingestion.docs_dir", "data/documents")
+    if isinstance(document_store, ShardedDocumentStore):
+        # Domain shards load their own snapshots on first use
+        if os.path.exists(docs_dir):
+            await sync_domain_documents(document_store, docs_dir)
+        return
+    
+    # Restore document store snapshot
+    snapshot_dir = get_snapshot_dir()
+    if snapshot_exists(snapshot_dir):
+        document_store.load_snapshot(snapshot_dir)
+    
+    # Load documents
+    if os.path.exists(docs_dir):
+        await sync_documents(
+            document_store,
+            docs_dir,
+            resolve_path("rag.ingestion.manifest_path", "data/index_manifest.json"),
+            snapshot_dir
+        )
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Persist the document store snapshot and release the worker pools on shutdown"""
+    document_store = llm.llm_manager.document_store
+    warmup_task = getattr(app.state, "warmup_task", None)
+    if warmup_task is not None:
+        warmup_task.cancel()
+    try:
+        if isinstance(document_store, ShardedDocumentStore):
+            document_store.save_snapshots()
+        elif document_store.dirty:
+            # Saved even when empty, so deleted documents do not come back on restart
+            document_store.save_snapshot(get_snapshot_dir())
+    except Exception as e:
+        logger.error(f"Failed to save document store snapshot: {str(e)}")
+    finally:
+        await llm.llm_manager.close_providers()
+        llm.llm_manager.close()
 
 @app.middleware("http")
 async def timeout_middleware(request: Request, call_next):
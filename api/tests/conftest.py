@@ -5,14 +5,23 @@ from sqlalchemy.orm import sessionmaker
 from src.core.db.config import get_db
 from src.models.domain_models import Base
 from src.mock_servers.matlab.server import matlab_app
+from src.core.rag import faiss_document_store
+from src.core.rag.document_store import Document
+from src.core.rag.faiss_document_store import FAISSDocumentStore
+from src.core.rag.sharding import ShardedDocumentStore
 import uvicorn
 import multiprocessing
+import hashlib
+import numpy as np
 import time
 from pytest_asyncio import fixture
 
 # 使用SQLite内存数据库进行测试
 TEST_DATABASE_URL = "sqlite+aiosqlite:///:memory:"
 
+# 离线测试用嵌入向量的维度
+EMBEDDING_DIMENSION = 32
+
 def start_mock_matlab_server():
     """启动模拟MATLAB服务器"""
     uvicorn.run(matlab_app, host="0.0.0.0", port=8001)
@@ -64,4 +73,67 @@ async def test_db(test_engine):
         # 不需要在这里再次创建表，因为已经在 test_engine fixture 中创建了
         yield session
         # 回滚任何未提交的更改
-        await session.rollback() 
\ No newline at end of file
+        await session.rollback()
+
+class FakeSentenceTransformer:
+    """离线测试用的嵌入模型，按文本哈希生成确定性向量"""
+    def __init__(self, *args, **kwargs):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        single = isinstance(texts, str)
+        batch = [texts] if single else list(texts)
+        self.calls.append(len(batch))
+        vectors = np.stack([
+            np.random.default_rng(
+                int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+            ).standard_normal(EMBEDDING_DIMENSION).astype("float32")
+            for text in batch
+        ])
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors[0] if single else vectors
+
+@pytest.fixture
+def fake_embedding_model(monkeypatch):
+    """用确定性的假模型替换 sentence-transformers，返回模型类以便测试继承"""
+    monkeypatch.setattr(faiss_document_store, "SentenceTransformer", FakeSentenceTransformer)
+    return FakeSentenceTransformer
+
+@pytest.fixture
+def make_store(fake_embedding_model):
+    """创建使用假嵌入模型的文档存储，测试结束时关闭全部存储"""
+    stores = []
+
+    def create(**kwargs):
+        kwargs.setdefault("dimension", EMBEDDING_DIMENSION)
+        store = FAISSDocumentStore(**kwargs)
+        stores.append(store)
+        return store
+
+    yield create
+    for store in stores:
+        store.close()
+
+@pytest.fixture
+def make_sharded_store(fake_embedding_model):
+    """创建使用假嵌入模型的分片存储，测试结束时关闭全部分片"""
+    stores = []
+
+    def create(base_dir: str, **kwargs):
+        store = ShardedDocumentStore(base_dir, {"dimension": EMBEDDING_DIMENSION}, **kwargs)
+        stores.append(store)
+        return store
+
+    yield create
+    for store in stores:
+        store.close()
+
+@pytest.fixture
+def make_documents():
+    """生成内容为“文档内容 i”的测试文档"""
+    def create(count: int, source: str = "test"):
+        return [
+            Document(content=f"文档内容 {i}", metadata={"source": source, "index": i})
+            for i in range(count)
+        ]
+    return create
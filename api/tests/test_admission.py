@@ -0,0 +1,84 @@
+import asyncio
+import pytest
+from src.core.providers import admission
+from typing import List
+from src.core.providers.admission import AdmissionController, QueueFullError, QueueTimeoutError
+
+async def hold(controller: AdmissionController, order: List[str], name: str, priority: str,
+               provider: str = "ollama", model: str = None, seconds: float = 0.02):
+    async with controller.slot(provider, model, priority):
+        order.append(name)
+        await asyncio.sleep(seconds)
+
+@pytest.mark.asyncio
+async def test_admission_limits_in_flight_and_prefers_interactive():
+    """测试并发数受限，排队时交互式请求先于先到的批量请求"""
+    controller = AdmissionController({"ollama": {"max_in_flight": 1}})
+    order: List[str] = []
+    first = asyncio.ensure_future(hold(controller, order, "first", "batch"))
+    await asyncio.sleep(0)
+    batch = asyncio.ensure_future(hold(controller, order, "batch", "batch"))
+    await asyncio.sleep(0)
+    interactive = asyncio.ensure_future(hold(controller, order, "interactive", "interactive"))
+    await asyncio.sleep(0)
+    stats = controller.stats()["ollama"]
+    assert stats["in_flight"] == 1
+    assert stats["queue_depth"] == 2
+
+    await asyncio.gather(first, batch, interactive)
+    assert order == ["first", "interactive", "batch"]
+    stats = controller.stats()["ollama"]
+    assert stats["in_flight"] == 0
+    assert stats["admitted"] == 3
+    assert stats["max_queue_depth"] == 2
+    assert stats["wait_time"]["batch"]["count"] == 2
+    assert stats["wait_time"]["interactive"]["p50_ms"] > 0
+
+@pytest.mark.asyncio
+async def test_admission_rejects_full_queue_and_timeouts():
+    """测试队列已满时立即拒绝，等待超时的请求被拒绝且不占用名额"""
+    controller = AdmissionController(
+        {"ollama": {"models": {"llama3": {"max_in_flight": 1}}}},
+        default_models={"ollama": "llama3"},
+        max_queue=1,
+        queue_timeout=0.02
+    )
+    order: List[str] = []
+    running = asyncio.ensure_future(hold(controller, order, "running", "interactive", seconds=0.1))
+    await asyncio.sleep(0)
+    waiting = asyncio.ensure_future(hold(controller, order, "waiting", "interactive"))
+    await asyncio.sleep(0)
+    with pytest.raises(QueueFullError):
+        await hold(controller, order, "rejected", "interactive")
+    with pytest.raises(QueueTimeoutError):
+        await waiting
+    # 其他模型不受 llama3 的限制
+    await hold(controller, order, "other", "interactive", model="deepseek-r1")
+    await running
+
+    stats = controller.stats()["ollama/llama3"]
+    assert stats["rejected_full"] == 1
+    assert stats["rejected_timeout"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["in_flight"] == 0
+    assert order == ["running", "other"]
+
+@pytest.mark.asyncio
+async def test_admission_timeout_returns_slot_handed_over_at_deadline(monkeypatch):
+    """测试名额恰好在超时时刻移交给等待者时，超时的请求归还名额"""
+    controller = AdmissionController({"ollama": {"max_in_flight": 1}}, queue_timeout=0.02)
+    limiter = controller.limiters["ollama"]
+    await limiter.acquire()
+
+    async def handed_over_then_timeout(future, timeout):
+        limiter.release()  # 名额移交给等待者
+        assert future.done()
+        raise asyncio.TimeoutError
+
+    monkeypatch.setattr(admission.asyncio, "wait_for", handed_over_then_timeout)
+    with pytest.raises(QueueTimeoutError):
+        await limiter.acquire()
+    stats = controller.stats()["ollama"]
+    assert stats["in_flight"] == 0
+    assert stats["queue_depth"] == 0
+    assert stats["rejected_timeout"] == 1
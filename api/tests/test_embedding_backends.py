@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+from src.core.rag import faiss_document_store
+from src.core.rag.embedding_backends import pool_embeddings
+
+@pytest.mark.asyncio
+async def test_embedding_model_loads_lazily(monkeypatch, fake_embedding_model, make_store, make_documents):
+    """测试嵌入模型在首次编码或预热时才加载，分片共享同一个模型"""
+    loaded = []
+
+    class CountingSentenceTransformer(fake_embedding_model):
+        def __init__(self, *args, **kwargs):
+            super().__init__()
+            loaded.append(args[0])
+
+    monkeypatch.setattr(faiss_document_store, "SentenceTransformer", CountingSentenceTransformer)
+    store = make_store(embedding_model="fake-model")
+    shard = make_store(embedding_source=store)
+    assert loaded == []
+
+    assert await store.warm_up() >= 0
+    await shard.add_documents(make_documents(2))
+    assert loaded == ["fake-model"]
+    assert shard.embedding_model is store.embedding_model
+
+def test_onnx_pooling_matches_sentence_transformers():
+    """测试ONNX后端的池化与 sentence-transformers 一致：均值池化忽略填充位置"""
+    tokens = np.arange(2 * 3 * 4, dtype="float32").reshape(2, 3, 4)
+    mask = np.array([[1, 1, 0], [1, 1, 1]])
+
+    mean = pool_embeddings(tokens, mask, "mean")
+    assert np.allclose(mean[0], tokens[0, :2].mean(axis=0))
+    assert np.allclose(mean[1], tokens[1].mean(axis=0))
+    assert np.allclose(pool_embeddings(tokens, mask, "cls"), tokens[:, 0])
+    assert np.allclose(pool_embeddings(tokens, mask, "max")[0], tokens[0, 1])
@@ -0,0 +1,363 @@
+import asyncio
+import json
+import threading
+import numpy as np
+import pytest
+from src.core.rag import faiss_document_store
+from src.core.rag.document_store import Document
+from src.core.rag.batching import MicroBatchEmbedder
+from src.core.rag.embedding_cache import EmbeddingCache
+
+@pytest.fixture
+def store(make_store):
+    return make_store(batch_size=4)
+
+@pytest.mark.asyncio
+async def test_add_documents_encodes_in_batches(store, make_documents):
+    """测试文档按批次生成嵌入"""
+    documents = make_documents(10)
+    await store.add_documents(documents)
+
+    assert store.embedding_model.calls == [4, 4, 2]
+    assert store.index.ntotal == 10
+    assert store.last_ingest_stats["documents"] == 10
+    assert store.last_ingest_stats["docs_per_sec"] > 0
+
+@pytest.mark.asyncio
+async def test_add_documents_reuses_existing_embeddings(store, make_documents):
+    """测试已有嵌入的文档不会重复编码"""
+    documents = make_documents(3)
+    documents[0].embedding = [0.0] * store.dimension
+    await store.add_documents(documents)
+
+    assert store.embedding_model.calls == [2]
+    assert store.last_ingest_stats["encoded"] == 2
+
+@pytest.mark.asyncio
+async def test_search_returns_matching_document(store, make_documents):
+    """测试搜索返回内容一致的文档"""
+    await store.add_documents(make_documents(10))
+
+    results = await store.search("文档内容 7", top_k=3)
+
+    assert results
+    assert results[0].metadata["index"] == 7
+
+@pytest.mark.asyncio
+async def test_ivf_index_trains_after_enough_vectors(make_store, make_documents):
+    """测试IVF索引在样本足够前使用暂存索引，之后自动训练"""
+    store = make_store(index_type="ivf_flat", nlist=4, nprobe=4, train_size=20)
+
+    await store.add_documents(make_documents(10))
+    assert not store.is_trained
+    assert (await store.search("文档内容 3", top_k=1))[0].metadata["index"] == 3
+
+    await store.add_documents(make_documents(15, source="more"))
+    assert store.is_trained
+    assert store.index.ntotal == 25
+    assert (await store.search("文档内容 3", top_k=1))[0].metadata["index"] == 3
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("index_type, metric", [("ip", "ip"), ("hnsw", "ip"), ("l2", "l2")])
+async def test_threshold_follows_metric(make_store, make_documents, index_type, metric):
+    """测试阈值按度量方向过滤：内积保留相似度高于阈值的结果，精确匹配排在首位"""
+    store = make_store(index_type=index_type, metric=metric)
+    await store.add_documents(make_documents(10))
+
+    threshold = 0.9 if metric == "ip" else 0.1
+    results = await store.search_with_scores("文档内容 3", top_k=3, threshold=threshold)
+    assert [doc.metadata["index"] for doc, _ in results] == [3]
+    assert results[0][1] == pytest.approx(1.0 if metric == "ip" else 0.0, abs=1e-4)
+
+def test_create_faiss_index_rejects_unknown_type():
+    """测试不支持的索引类型"""
+    with pytest.raises(ValueError):
+        faiss_document_store.create_faiss_index("unknown", 32)
+
+@pytest.mark.asyncio
+async def test_snapshot_round_trip(store, make_store, make_documents, tmp_path):
+    """测试完整快照保存后可以在新实例中恢复，无需重新编码"""
+    await store.add_documents(make_documents(10))
+    snapshot_dir = str(tmp_path / "index")
+    store.save_snapshot(snapshot_dir)
+
+    restored = make_store()
+    restored.load_snapshot(snapshot_dir)
+
+    assert len(restored.documents) == 10
+    assert restored.index.ntotal == 10
+    assert restored.documents[4].metadata == {"source": "test", "index": 4}
+    assert (await restored.search("文档内容 4", top_k=1))[0].content == "文档内容 4"
+
+    # 恢复后继续添加文档并再次保存
+    await restored.add_documents(make_documents(2, source="new"))
+    restored.save_snapshot(snapshot_dir)
+    reloaded = make_store()
+    reloaded.load_snapshot(snapshot_dir)
+    assert len(reloaded.documents) == 12
+    assert reloaded.documents[11].metadata["source"] == "new"
+
+@pytest.mark.asyncio
+async def test_snapshot_tracks_generation_and_saves_empty_store(store, make_store, make_documents, tmp_path):
+    """测试加载快照会递增 generation，删除全部文档后的空存储也能保存并恢复"""
+    snapshot_dir = str(tmp_path / "index")
+    await store.add_documents(make_documents(3))
+    assert store.dirty
+    store.save_snapshot(snapshot_dir)
+    assert not store.dirty
+
+    restored = make_store()
+    generation = restored.generation
+    restored.load_snapshot(snapshot_dir)
+    assert restored.generation > generation
+    assert not restored.dirty
+
+    await restored.delete_documents({"source": "test"})
+    assert restored.dirty
+    restored.save_snapshot(snapshot_dir)
+    reloaded = make_store()
+    reloaded.load_snapshot(snapshot_dir)
+    assert len(reloaded.doc_ids) == 0
+    assert await reloaded.search("文档内容 1") == []
+
+def test_load_snapshot_rejects_unknown_version(store, tmp_path):
+    """测试不兼容的快照版本会被拒绝"""
+    snapshot_dir = str(tmp_path / "index")
+    store.save_snapshot(snapshot_dir)
+    manifest_path = tmp_path / "index" / "manifest.json"
+    manifest = json.loads(manifest_path.read_text())
+    manifest["version"] = 99
+    manifest_path.write_text(json.dumps(manifest))
+
+    with pytest.raises(ValueError):
+        store.load_snapshot(snapshot_dir)
+
+@pytest.mark.asyncio
+async def test_delete_documents_removes_ids_from_index(store, make_documents):
+    """测试删除只移除匹配的向量，剩余文档ID保持不变"""
+    await store.add_documents(make_documents(5, source="a"))
+    await store.add_documents(make_documents(5, source="b"))
+
+    await store.delete_documents({"source": "a"})
+
+    assert store.index.ntotal == 5
+    assert sorted(store.doc_ids) == [5, 6, 7, 8, 9]
+    results = await store.search("文档内容 2", top_k=1)
+    assert results[0].metadata == {"source": "b", "index": 2}
+
+@pytest.mark.asyncio
+async def test_hnsw_delete_uses_tombstones_and_compacts(make_store, make_documents):
+    """测试HNSW索引删除时记录墓碑，并在后台压缩后清除"""
+    store = make_store(index_type="hnsw", compaction_threshold=0.5)
+    await store.add_documents(make_documents(5, source="a"))
+    await store.add_documents(make_documents(5, source="b"))
+
+    await store.delete_documents({"index": 0})
+    assert store.tombstones == {0, 5}
+    assert store._compaction_task is None
+    # 墓碑由选择器排除，检索数量仍为 top_k
+    requested = []
+    search_vectors = store._search_vectors
+    store._search_vectors = lambda queries, top_k, selector=None: (
+        requested.append(top_k) or search_vectors(queries, top_k, selector)
+    )
+    results = await store.search("文档内容 0", top_k=3, threshold=10)
+    assert len(results) == 3
+    assert all(doc.metadata["index"] != 0 for doc in results)
+    assert requested == [3]
+
+    completed = store.get_stats()["index_executor"]["completed"]
+    await store.delete_documents({"source": "a"})
+    await store._compaction_task
+    assert not store.tombstones
+    assert store.index.ntotal == 4
+    # 墓碑删除不访问索引，压缩经由索引执行器
+    assert store.get_stats()["index_executor"]["completed"] == completed + 1
+
+@pytest.mark.asyncio
+async def test_repeated_queries_hit_embedding_cache(store, make_documents):
+    """测试重复查询使用缓存的嵌入，不再调用模型"""
+    await store.add_documents(make_documents(3))
+    calls = len(store.embedding_model.calls)
+
+    await store.search("文档内容 1")
+    await store.search("  文档内容   1 ")
+
+    assert len(store.embedding_model.calls) == calls + 1
+    stats = store.get_stats()["query_cache"]
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+
+def test_embedding_cache_evicts_least_recently_used():
+    """测试缓存超过容量时淘汰最久未使用的条目"""
+    cache = EmbeddingCache(max_size=2)
+    cache.put("model", "a", np.zeros(2))
+    cache.put("model", "b", np.zeros(2))
+    cache.get("model", "a")
+    cache.put("model", "c", np.zeros(2))
+
+    assert cache.get("model", "b") is None
+    assert cache.get("model", "a") is not None
+    assert cache.stats()["evictions"] == 1
+
+@pytest.mark.asyncio
+async def test_concurrent_searches_run_in_executors(make_store, make_documents):
+    """测试并发检索经由执行器执行，并记录排队统计"""
+    store = make_store(embedding_workers=1, embedding_concurrency=1)
+    await store.add_documents(make_documents(5))
+
+    results = await asyncio.gather(*[store.search(f"文档内容 {i}", top_k=1) for i in range(5)])
+
+    assert [r[0].metadata["index"] for r in results] == list(range(5))
+    stats = store.get_stats()
+    # 导入时一次编码和一次BM25分词，之后每个查询一次编码
+    assert stats["embedding_executor"]["completed"] == 7
+    assert stats["embedding_executor"]["max_queue_depth"] >= 1
+    assert stats["index_executor"]["running"] == 0
+
+@pytest.mark.asyncio
+async def test_micro_batch_embedder_coalesces_concurrent_queries():
+    """测试并发查询在时间窗口内合并为一次编码，相同文本只计算一次"""
+    batches = []
+
+    async def encode(texts):
+        batches.append(list(texts))
+        return np.stack([np.full(4, len(text), dtype="float32") for text in texts])
+
+    batcher = MicroBatchEmbedder(encode, max_batch_size=8, max_wait_ms=20)
+    texts = ["a", "bb", "a", "ccc"]
+    results = await asyncio.gather(*[batcher.embed(text) for text in texts])
+
+    assert batches == [["a", "bb", "ccc"]]
+    assert [int(result[0]) for result in results] == [1, 2, 1, 3]
+    assert batcher.stats()["batch_size_histogram"] == {4: 1}
+
+@pytest.mark.asyncio
+async def test_micro_batch_embedder_propagates_errors():
+    """测试编码失败时所有等待者都收到异常"""
+    async def encode(texts):
+        raise RuntimeError("encode failed")
+
+    batcher = MicroBatchEmbedder(encode, max_batch_size=2, max_wait_ms=20)
+    results = await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+@pytest.mark.asyncio
+async def test_compressed_index_keeps_no_resident_vectors(make_store, make_documents, tmp_path):
+    """测试SQ8压缩索引不在内存中另存向量，过滤检索从索引重建向量并随快照恢复"""
+    store = make_store(index_type="sq8", train_size=20)
+    await store.add_documents(make_documents(30))
+
+    assert store.is_trained
+    assert store.documents[0].embedding is None
+    assert (await store.search("文档内容 12", top_k=1))[0].metadata["index"] == 12
+    assert (await store.search("文档内容 12", top_k=1, filter={"index": 12}))[0].metadata["index"] == 12
+    memory = store.memory_footprint()
+    assert memory["index_bytes"] < 30 * store.dimension * 4
+    assert "vector_bytes" not in memory
+
+    snapshot_dir = str(tmp_path / "index")
+    store.save_snapshot(snapshot_dir)
+    assert not (tmp_path / "index" / "embeddings.npy").exists()
+    restored = make_store()
+    restored.load_snapshot(snapshot_dir)
+    assert (await restored.search("文档内容 12", top_k=1, filter={"source": "test"}))[0].metadata["index"] == 12
+
+@pytest.mark.asyncio
+async def test_lexical_search_matches_exact_identifier_without_encoding(store, make_documents):
+    """测试BM25检索能命中精确的标识符，且不计算查询嵌入"""
+    documents = make_documents(5)
+    documents.append(Document(content="芯片 TPS7A4701 的输出噪声", metadata={"source": "test", "index": 99}))
+    await store.add_documents(documents)
+    calls = len(store.embedding_model.calls)
+
+    results = await store.search("TPS7A4701", top_k=3, mode="lexical")
+
+    assert results[0].metadata["index"] == 99
+    assert len(store.embedding_model.calls) == calls
+
+@pytest.mark.asyncio
+async def test_bm25_tokenization_runs_in_embedding_executor(store, make_documents, monkeypatch):
+    """测试导入时 BM25 分词在嵌入执行器中完成，不在事件循环上执行"""
+    analyzed_in = []
+    analyze = faiss_document_store.analyze
+
+    def recording_analyze(texts):
+        analyzed_in.append(threading.current_thread() is threading.main_thread())
+        return analyze(texts)
+
+    monkeypatch.setattr(faiss_document_store, "analyze", recording_analyze)
+    await store.add_documents(make_documents(3))
+
+    assert analyzed_in == [False]
+    assert [doc.metadata["index"] for doc in await store.search("文档内容 2", top_k=1, mode="lexical")] == [2]
+
+@pytest.mark.asyncio
+async def test_hybrid_search_fuses_vector_and_lexical_results(store, make_documents):
+    """测试混合检索同时返回向量和BM25命中的文档"""
+    documents = make_documents(5)
+    documents.append(Document(content="芯片 TPS7A4701 的输出噪声", metadata={"source": "test", "index": 99}))
+    await store.add_documents(documents)
+
+    # 查询与文档3完全相同（向量命中），同时包含文档99的标识符（词法命中）
+    results = await store.search("文档内容 3", top_k=2, mode="hybrid")
+    assert results[0].metadata["index"] == 3
+    results = await store.search("TPS7A4701", top_k=2, mode="hybrid")
+    assert [doc.metadata["index"] for doc in results] == [99]
+
+    with pytest.raises(ValueError):
+        await store.search("文档", mode="unknown")
+
+@pytest.mark.asyncio
+async def test_lexical_index_follows_deletes_and_snapshots(store, make_store, make_documents, tmp_path):
+    """测试BM25索引随删除更新，并随快照保存和恢复"""
+    await store.add_documents(make_documents(4, source="a") + [
+        Document(content="唯一词 zeta", metadata={"source": "b", "index": 10}),
+        Document(content="唯一词 omega", metadata={"source": "a", "index": 11})
+    ])
+    await store.delete_documents({"source": "a"})
+    assert [doc.metadata["index"] for doc in await store.search("唯一词", mode="lexical")] == [10]
+
+    snapshot_dir = str(tmp_path / "index")
+    store.save_snapshot(snapshot_dir)
+    restored = make_store()
+    restored.load_snapshot(snapshot_dir)
+
+    assert [doc.metadata["index"] for doc in await restored.search("zeta omega", mode="lexical")] == [10]
+    assert restored.get_stats()["lexical_index"]["documents"] == 1
+
+@pytest.mark.asyncio
+async def test_search_with_metadata_filter(store, make_documents):
+    """测试按元数据过滤检索，过滤条件通过元数据索引求交集"""
+    documents = make_documents(6, source="a") + make_documents(6, source="b")
+    for doc in documents:
+        doc.metadata["tags"] = ["x"] if doc.metadata["index"] % 2 else ["y"]
+    await store.add_documents(documents)
+
+    results = await store.search("文档内容 3", top_k=3, filter={"source": "b"})
+    assert results[0].metadata == {"source": "b", "index": 3, "tags": ["x"]}
+    assert all(doc.metadata["source"] == "b" for doc in results)
+    results = await store.search("文档内容", mode="lexical", top_k=10, filter={"source": "a", "tags": ["y"]})
+    assert sorted(doc.metadata["index"] for doc in results) == [0, 2, 4]
+    assert await store.search("文档内容 3", filter={"source": "c"}) == []
+
+    await store.delete_documents({"source": "a", "index": 3})
+    assert len(store.doc_ids) == 11
+    assert await store.search("文档内容 3", filter={"source": "a", "index": 3}) == []
+
+@pytest.mark.asyncio
+async def test_filtered_search_uses_id_selector_on_large_candidate_sets(make_store, make_documents, tmp_path):
+    """测试候选文档较多时通过FAISS ID选择器检索，且元数据索引随快照恢复"""
+    store = make_store(index_type="hnsw", exact_filter_limit=2)
+    await store.add_documents(make_documents(10, source="a") + make_documents(10, source="b"))
+
+    results = await store.search("文档内容 7", top_k=2, filter={"source": "a"})
+    assert results[0].metadata == {"source": "a", "index": 7}
+
+    snapshot_dir = str(tmp_path / "index")
+    store.save_snapshot(snapshot_dir)
+    restored = make_store(exact_filter_limit=2)
+    restored.load_snapshot(snapshot_dir)
+    results = await restored.search("文档内容 7", top_k=2, filter={"source": "b"})
+    assert results[0].metadata == {"source": "b", "index": 7}
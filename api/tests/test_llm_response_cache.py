@@ -0,0 +1,139 @@
+import pytest
+from typing import Any, Dict, List, Optional
+from src.core.llm_manager import LLMManager
+from src.core.providers.base_provider import BaseLLMProvider
+from src.core.providers.router import ProviderRouter
+from src.core.response_cache import (
+    LLMResponseCache,
+    MemoryCacheBackend,
+    SQLiteCacheBackend,
+    response_cache_key
+)
+
+def test_cache_key_covers_model_messages_and_params():
+    """测试缓存键随 provider、模型、消息和采样参数变化，参数顺序不影响键"""
+    messages = [{"role": "user", "content": "设计低通滤波器"}]
+    key = response_cache_key("ollama", "llama3", messages, {"temperature": 0, "top_p": 1})
+    assert key == response_cache_key("ollama", "llama3", messages, {"top_p": 1, "temperature": 0})
+    assert key != response_cache_key("ollama", "llama3", messages, {"temperature": 0.7, "top_p": 1})
+    assert key != response_cache_key("ollama", "deepseek-r1", messages, {"temperature": 0, "top_p": 1})
+    assert key != response_cache_key("openai", "llama3", messages, {"temperature": 0, "top_p": 1})
+
+@pytest.mark.asyncio
+async def test_sqlite_tier_survives_restart_and_promotes_to_memory(tmp_path):
+    """测试磁盘层在重启后仍可命中，命中后写回内存层并累计节省的耗时"""
+    path = str(tmp_path / "llm_cache.sqlite3")
+    cache = LLMResponseCache([MemoryCacheBackend(max_size=8), SQLiteCacheBackend(path)])
+    await cache.set("k", "回答", 1.5)
+    cache.close()
+
+    memory = MemoryCacheBackend(max_size=8)
+    cache = LLMResponseCache([memory, SQLiteCacheBackend(path)])
+    try:
+        assert await cache.get("k") == "回答"
+        assert await memory.get("k") == ("回答", 1.5)
+        assert await cache.get("k") == "回答"
+        assert await cache.get("missing") is None
+        stats = cache.stats()
+        assert stats["hits"] == {"memory": 1, "sqlite": 1}
+        assert stats["misses"] == 1
+        assert stats["saved_seconds"] == pytest.approx(3.0)
+    finally:
+        cache.close()
+
+@pytest.mark.asyncio
+async def test_failed_promotion_still_returns_hit():
+    """测试写回较快的缓存层失败时仍返回命中的回答"""
+    class BrokenMemoryBackend(MemoryCacheBackend):
+        async def set(self, key, entry):
+            raise OSError("内存层不可用")
+
+    disk = MemoryCacheBackend(max_size=8)
+    disk.name = "disk"
+    await disk.set("k", ("回答", 0.5))
+    cache = LLMResponseCache([BrokenMemoryBackend(max_size=8), disk])
+
+    assert await cache.get("k") == "回答"
+    assert cache.stats()["hits"] == {"memory": 0, "disk": 1}
+
+@pytest.mark.asyncio
+async def test_memory_tier_expires_and_evicts():
+    """测试内存层过期和 LRU 淘汰"""
+    expired = MemoryCacheBackend(max_size=8, ttl=-1)
+    await expired.set("k", ("回答", 0.1))
+    assert await expired.get("k") is None
+
+    memory = MemoryCacheBackend(max_size=2, ttl=None)
+    for key in ("a", "b"):
+        await memory.set(key, (key, 0.1))
+    await memory.get("a")
+    await memory.set("c", ("c", 0.1))
+    assert await memory.get("b") is None
+    assert await memory.get("a") == ("a", 0.1)
+    assert memory.stats()["evictions"] == 1
+
+class CountingProvider(BaseLLMProvider):
+    """模拟 provider：每次调用返回不同的回答，可设置为抛出异常"""
+    def __init__(self, name: str, error: Optional[Exception] = None):
+        self.name = name
+        self.error = error
+        self.calls = 0
+
+    async def generate(self, prompt: str, context: Optional[Dict[str, Any]] = None, **kwargs: Any) -> str:
+        return await self.chat([{"role": "user", "content": prompt}], context, **kwargs)
+
+    async def chat(self, messages, context=None, **kwargs: Any) -> str:
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return f"{self.name}/{kwargs.get('model')} 第{self.calls}次回答"
+
+    async def list_models(self) -> List[str]:
+        return [self.name]
+
+@pytest.fixture
+def manager():
+    manager = LLMManager()
+    manager.providers = {"ollama": CountingProvider("ollama"), "openai": CountingProvider("openai")}
+    manager.router = ProviderRouter(manager.providers, order=["ollama", "openai"])
+    manager.llm_cache = LLMResponseCache([MemoryCacheBackend(max_size=16)])
+    manager.singleflight = None
+    yield manager
+    manager.close()
+
+@pytest.mark.asyncio
+async def test_chat_caches_only_deterministic_requests(manager):
+    """测试默认只缓存 temperature 为 0 的请求，use_cache=False 既不读取也不写入缓存"""
+    ollama = manager.providers["ollama"]
+    messages = [{"role": "user", "content": "设计低通滤波器"}]
+
+    # llama3 配置的 temperature 为 0.7，采样得到的回答不缓存
+    first = await manager.chat(messages)
+    assert await manager.chat(messages) != first
+    assert await manager.chat(messages, use_cache=True) == await manager.chat(messages, use_cache=True)
+    calls = ollama.calls
+
+    bypassed = await manager.chat(messages, use_cache=False, temperature=0)
+    cached = await manager.chat(messages, temperature=0)
+    assert cached != bypassed
+    assert await manager.chat(messages, temperature=0) == cached
+    assert ollama.calls == calls + 2
+    stats = manager.llm_cache.stats()
+    assert stats["bypassed"] == 3
+    assert stats["hits"]["memory"] == 2
+
+@pytest.mark.asyncio
+async def test_chat_cache_key_follows_serving_provider_and_model(manager):
+    """测试缓存键区分 provider 和模型，故障切换时按实际回答的 provider 写入"""
+    messages = [{"role": "user", "content": "采样定理"}]
+    default_model = await manager.chat(messages, temperature=0)
+    assert await manager.chat(messages, temperature=0, model="deepseek-r1") != default_model
+    assert await manager.chat(messages, temperature=0, provider="openai") != default_model
+    assert await manager.chat(messages, temperature=0, provider="ollama", model="llama3") == default_model
+
+    manager.providers["ollama"].error = RuntimeError("服务不可用")
+    fallback = await manager.chat([{"role": "user", "content": "窗函数"}], temperature=0)
+    assert fallback.startswith("openai/None")
+    calls = manager.providers["openai"].calls
+    assert await manager.chat([{"role": "user", "content": "窗函数"}], temperature=0, provider="openai") == fallback
+    assert manager.providers["openai"].calls == calls
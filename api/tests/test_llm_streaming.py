@@ -0,0 +1,185 @@
+import asyncio
+import json
+import httpx
+import pytest
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+from aiohttp import web
+from fastapi import FastAPI
+from openai import OpenAIError
+from src.api.routes import llm as llm_routes
+from src.core.llm_manager import LLMManager
+from src.core.providers.admission import AdmissionController
+from src.core.providers.base_provider import BaseLLMProvider
+from src.core.providers.ollama_provider import OllamaProvider
+from src.core.providers.openai_provider import OpenAIProvider
+from src.core.providers.router import ProviderRouter
+from src.core.singleflight import SingleFlight
+
+@pytest.fixture
+async def ollama_server():
+    """模拟 Ollama 的流式接口，每行返回一个 JSON 片段"""
+    requests = []
+
+    async def generate(request: web.Request) -> web.StreamResponse:
+        body = await request.json()
+        requests.append(body)
+        response = web.StreamResponse()
+        await response.prepare(request)
+        for token in ("低通", "滤波器", ""):
+            chunk = {"model": body["model"], "response": token, "done": token == ""}
+            await response.write((json.dumps(chunk, ensure_ascii=False) + "\n").encode("utf-8"))
+        await response.write_eof()
+        return response
+
+    app = web.Application()
+    app.router.add_post("/api/generate", generate)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    yield f"http://127.0.0.1:{runner.addresses[0][1]}", requests
+    await runner.cleanup()
+
+@pytest.mark.asyncio
+async def test_ollama_stream_chat_yields_ndjson_chunks(ollama_server):
+    """测试 Ollama 流式对话逐段返回，并复用同一个会话"""
+    base_url, requests = ollama_server
+    provider = OllamaProvider()
+    provider.base_url = base_url
+    try:
+        chunks = [chunk async for chunk in provider.stream_chat([{"role": "user", "content": "你好"}], model="llama3")]
+        assert chunks == ["低通", "滤波器"]
+        assert requests[0]["stream"] is True
+        session = provider._get_session()
+        assert [chunk async for chunk in provider.stream_generate("你好")] == ["低通", "滤波器"]
+        assert provider._get_session() is session
+    finally:
+        await provider.close()
+
+class FakeCompletions:
+    """模拟 OpenAI chat.completions：返回流式片段或抛出异常"""
+    def __init__(self, error: Exception = None):
+        self.error = error
+        self.requests = []
+
+    async def create(self, **kwargs):
+        self.requests.append(kwargs)
+        if self.error is not None:
+            raise self.error
+
+        async def stream():
+            for content in ("低通", None, "滤波器"):
+                yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))])
+        return stream()
+
+def openai_provider(completions: FakeCompletions) -> OpenAIProvider:
+    provider = OpenAIProvider("test-key")
+    provider.client = SimpleNamespace(chat=SimpleNamespace(completions=completions))
+    return provider
+
+@pytest.mark.asyncio
+async def test_openai_stream_chat_yields_deltas_and_wraps_errors():
+    """测试 OpenAI 流式对话跳过空片段，出错时抛出 OpenAIError 并保留原始异常"""
+    completions = FakeCompletions()
+    chunks = [chunk async for chunk in openai_provider(completions).stream_generate("你好", model="gpt-4o")]
+    assert chunks == ["低通", "滤波器"]
+    assert completions.requests[0]["stream"] is True
+    assert completions.requests[0]["model"] == "gpt-4o"
+
+    upstream = RuntimeError("rate limited")
+    with pytest.raises(OpenAIError, match="rate limited") as excinfo:
+        async for _ in openai_provider(FakeCompletions(upstream)).stream_chat([{"role": "user", "content": "你好"}]):
+            pass
+    assert excinfo.value.__cause__ is upstream
+
+class FakeStreamingManager:
+    """模拟 LLMManager.stream_chat，可在若干片段后抛出异常"""
+    def __init__(self, error: Exception = None):
+        self.error = error
+
+    async def stream_chat(self, messages, context=None, provider=None, **kwargs):
+        yield "低通"
+        if self.error is not None:
+            raise self.error
+        yield "滤波器"
+
+def parse_events(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.split("\n"))
+        events.append((fields.get("event", "message"), json.loads(fields["data"])))
+    return events
+
+@pytest.mark.asyncio
+async def test_chat_stream_route_frames_events(monkeypatch):
+    """测试 /chat/stream 按 SSE 格式逐段返回，结束时发送 done 事件，出错时发送 error 事件"""
+    app = FastAPI()
+    app.include_router(llm_routes.router)
+    transport = httpx.ASGITransport(app=app)
+    request = {"messages": [{"role": "user", "content": "你好"}]}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        monkeypatch.setattr(llm_routes, "llm_manager", FakeStreamingManager())
+        response = await client.post("/chat/stream", json=request)
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert parse_events(response.text) == [
+            ("message", {"content": "低通"}),
+            ("message", {"content": "滤波器"}),
+            ("done", {})
+        ]
+
+        monkeypatch.setattr(llm_routes, "llm_manager", FakeStreamingManager(RuntimeError("上游中断")))
+        response = await client.post("/chat/stream", json=request)
+        assert parse_events(response.text) == [
+            ("message", {"content": "低通"}),
+            ("error", {"detail": "上游中断"})
+        ]
+
+class SlowStreamingProvider(BaseLLMProvider):
+    """模拟 provider：持续产生片段，记录流是否被关闭"""
+    def __init__(self):
+        self.produced = 0
+        self.closed = False
+
+    async def generate(self, prompt: str, context: Optional[Dict[str, Any]] = None, **kwargs: Any) -> str:
+        return "回答"
+
+    async def chat(self, messages, context=None, **kwargs: Any) -> str:
+        return "回答"
+
+    async def stream_chat(self, messages, context=None, **kwargs: Any):
+        try:
+            while True:
+                self.produced += 1
+                yield "低通"
+                await asyncio.sleep(0.001)
+        finally:
+            self.closed = True
+
+    async def list_models(self) -> List[str]:
+        return ["ollama"]
+
+@pytest.mark.asyncio
+async def test_sse_events_close_upstream_on_client_disconnect():
+    """测试客户端断开（事件流被关闭）时经由 LLMManager 关闭上游流，并释放准入名额"""
+    manager = LLMManager()
+    provider = SlowStreamingProvider()
+    manager.providers = {"ollama": provider}
+    manager.router = ProviderRouter(manager.providers)
+    manager.admission = AdmissionController({"ollama": {"max_in_flight": 1}})
+    manager.singleflight = SingleFlight()
+    try:
+        events = llm_routes.sse_events(manager.stream_chat([{"role": "user", "content": "你好"}]))
+        assert await events.__anext__() == 'data: {"content": "低通"}\n\n'
+        assert manager.admission.stats()["ollama"]["in_flight"] == 1
+
+        await events.aclose()
+        await asyncio.sleep(0.01)
+        produced = provider.produced
+        await asyncio.sleep(0.01)
+        assert provider.closed
+        assert provider.produced == produced
+        assert manager.admission.stats()["ollama"]["in_flight"] == 0
+    finally:
+        manager.close()
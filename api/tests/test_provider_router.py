@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from typing import Any, Dict, List, Optional
+from src.core.providers.base_provider import BaseLLMProvider
+from src.core.providers.router import ProviderRouter
+
+class StubProvider(BaseLLMProvider):
+    """模拟 provider：固定延迟，可设置为抛出异常，记录调用和被取消的次数"""
+    def __init__(self, name: str, delay: float = 0.0, error: Optional[Exception] = None):
+        self.name = name
+        self.delay = delay
+        self.error = error
+        self.calls: List[Dict[str, Any]] = []
+        self.cancelled = 0
+
+    async def generate(self, prompt: str, context: Optional[Dict[str, Any]] = None, **kwargs: Any) -> str:
+        return await self.chat([{"role": "user", "content": prompt}], context, **kwargs)
+
+    async def chat(self, messages, context=None, **kwargs: Any) -> str:
+        self.calls.append(kwargs)
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error is not None:
+            raise self.error
+        return f"{self.name} 的回答"
+
+    async def list_models(self) -> List[str]:
+        return [self.name]
+
+MESSAGES = [{"role": "user", "content": "你好"}]
+
+@pytest.mark.asyncio
+async def test_router_fails_over_on_error_and_timeout():
+    """测试出错或超时时切换到下一个 provider，未声明模型列表的 provider 使用同一模型"""
+    providers = {
+        "openai": StubProvider("openai", error=RuntimeError("服务不可用")),
+        "slow": StubProvider("slow", delay=1.0),
+        "ollama": StubProvider("ollama")
+    }
+    router = ProviderRouter(providers, order=["openai", "slow", "ollama"], timeout=0.05)
+    assert await router.chat(MESSAGES, model="gpt-4o") == ("ollama", "ollama 的回答")
+    assert providers["openai"].calls == [{"model": "gpt-4o"}]
+    assert providers["ollama"].calls == [{"model": "gpt-4o"}]
+    stats = router.stats()
+    assert stats["providers"]["slow"]["timeouts"] == 1
+    assert stats["failovers"] == 2
+    # 有延迟样本的 provider 排在前面，出错的排在最后
+    assert router.candidates() == ["ollama", "openai", "slow"]
+    assert router.candidates("slow")[0] == "slow"
+
+    with pytest.raises(RuntimeError):
+        await ProviderRouter({"openai": providers["openai"]}).chat(MESSAGES)
+
+@pytest.mark.asyncio
+async def test_router_routes_model_to_providers_serving_it():
+    """测试未指定 provider 时模型只发送给提供该模型的 provider，且不会换成其他模型"""
+    providers = {"openai": StubProvider("openai"), "ollama": StubProvider("ollama", delay=0.01)}
+    router = ProviderRouter(
+        providers,
+        order=["ollama", "openai"],
+        models={"openai": ["gpt-4o"], "ollama": ["llama3", "deepseek-r1"]}
+    )
+    # openai 延迟更低，排在前面
+    assert (await router.chat(MESSAGES, provider="openai"))[0] == "openai"
+    assert (await router.chat(MESSAGES, provider="ollama"))[0] == "ollama"
+    assert router.candidates() == ["openai", "ollama"]
+
+    assert router.candidates(model="llama3") == ["ollama"]
+    assert await router.chat(MESSAGES, model="deepseek-r1") == ("ollama", "ollama 的回答")
+    assert providers["openai"].calls == [{}]
+
+    # 唯一提供该模型的 provider 出错时不会切换到其他模型
+    providers["ollama"].error = RuntimeError("服务不可用")
+    with pytest.raises(RuntimeError):
+        await router.chat(MESSAGES, model="llama3")
+    assert providers["openai"].calls == [{}]
+    assert router.stats()["failovers"] == 0
+
+    with pytest.raises(ValueError):
+        router.candidates(model="unknown")
+
+@pytest.mark.asyncio
+async def test_router_hedges_slow_requests_and_cancels_loser():
+    """测试请求超过 p95 延迟后向下一个 provider 对冲，先返回的生效并取消另一个"""
+    primary = StubProvider("primary", delay=0.01)
+    backup = StubProvider("backup", delay=0.01)
+    router = ProviderRouter(
+        {"primary": primary, "backup": backup},
+        order=["primary", "backup"],
+        hedge=True,
+        hedge_min_samples=3,
+        hedge_min_delay=0.01
+    )
+    for _ in range(3):
+        assert (await router.chat(MESSAGES, provider="primary"))[0] == "primary"
+    assert router.stats()["hedged"] == 0
+
+    primary.delay = 1.0
+    assert await router.chat(MESSAGES, provider="primary") == ("backup", "backup 的回答")
+    await asyncio.sleep(0.01)  # 取消在后台完成
+    assert primary.cancelled == 1
+    stats = router.stats()
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+    assert stats["providers"]["primary"]["failures"] == 0
@@ -0,0 +1,146 @@
+import os
+import pytest
+from typing import List
+from src.core.rag.chunking import TextChunker, count_tokens, split_sentences
+from src.core.rag.context_packer import ContextPacker
+from src.core.rag.document_store import InMemoryDocumentStore, Document
+from src.core.rag.ingestion import IncrementalIngester
+from src.core.rag.utils import load_documents
+
+class RecordingDocumentStore(InMemoryDocumentStore):
+    """记录每次写入批次大小的文档存储"""
+    def __init__(self):
+        super().__init__()
+        self.batches: List[int] = []
+
+    async def add_documents(self, documents: List[Document]) -> None:
+        self.batches.append(len(documents))
+        await super().add_documents(documents)
+
+def test_count_tokens_handles_chinese_and_english():
+    """测试中文按字、英文按词计数"""
+    assert count_tokens("低通滤波器 lowpass filter") == 7
+
+def test_split_sentences_keeps_offsets():
+    """测试句子切分返回原文位置"""
+    text = "第一句。第二句！Third one. Fourth"
+    sentences = [text[start:end].strip() for start, end in split_sentences(text)]
+    assert sentences == ["第一句。", "第二句！", "Third one.", "Fourth"]
+
+def test_sentence_chunker_respects_size_and_overlap():
+    """测试按句子分块不超过长度限制，且相邻块有重叠"""
+    text = "".join(f"这是第{i}句话。" for i in range(20))
+    chunker = TextChunker(chunk_size=20, overlap=8)
+    chunks = list(chunker.chunk(text, {"source": "a.txt"}))
+
+    assert len(chunks) > 1
+    assert all(count_tokens(chunk.content) <= 20 for chunk in chunks)
+    for chunk in chunks:
+        start, end = chunk.metadata["start_offset"], chunk.metadata["end_offset"]
+        assert text[start:end] == chunk.content
+        assert chunk.metadata["source"] == "a.txt"
+    assert chunks[1].metadata["start_offset"] < chunks[0].metadata["end_offset"]
+    assert [chunk.metadata["chunk_index"] for chunk in chunks] == list(range(len(chunks)))
+
+def test_long_sentence_falls_back_to_token_windows():
+    """测试超长句子按 token 窗口切分"""
+    text = " ".join(f"word{i}" for i in range(50))
+    chunks = list(TextChunker(chunk_size=10, overlap=2).chunk(text))
+
+    assert all(count_tokens(chunk.content) <= 10 for chunk in chunks)
+    assert chunks[0].content.startswith("word0")
+    assert chunks[-1].content.endswith("word49")
+
+def test_context_packer_dedupes_and_truncates_at_sentences():
+    """测试上下文组装去掉重叠句子，并在句子边界截断到预算以内"""
+    docs = [
+        Document(content="低通滤波器去除高频。截止频率决定通带。", metadata={}),
+        Document(content="截止频率决定通带。阶数越高过渡带越窄。窗函数影响旁瓣。", metadata={})
+    ]
+    packer = ContextPacker()
+    packed = packer.pack(docs, budget=30)
+    assert packed.text == "低通滤波器去除高频。截止频率决定通带。\n\n阶数越高过渡带越窄。"
+    assert packed.duplicate_sentences == 1
+    assert packed.truncated
+    assert packed.tokens == count_tokens(packed.text) <= 30
+
+    packed = packer.pack(docs, budget=5)
+    assert packed.text == "低通滤波器"
+    assert packed.documents == 1
+
+@pytest.mark.asyncio
+async def test_load_documents_streams_chunks_in_batches(tmp_path):
+    """测试目录加载按批次写入文档块"""
+    for i in range(3):
+        (tmp_path / f"doc{i}.txt").write_text("。".join(f"句子{j}" for j in range(30)), encoding="utf-8")
+    (tmp_path / "ignored.bin").write_bytes(b"\x00")
+
+    store = RecordingDocumentStore()
+    total = await load_documents(store, str(tmp_path), chunker=TextChunker(chunk_size=16, overlap=4), batch_size=5)
+
+    assert total == len(store.documents)
+    assert max(store.batches) <= 5
+    assert {doc.metadata["source"] for doc in store.documents} == {
+        str(tmp_path / f"doc{i}.txt") for i in range(3)
+    }
+
+@pytest.mark.asyncio
+async def test_incremental_ingester_only_processes_changes(tmp_path):
+    """测试增量导入只处理新增、修改和删除的文件"""
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    for name in ("a", "b", "c"):
+        (docs_dir / f"{name}.md").write_text(f"{name} 的内容。", encoding="utf-8")
+    manifest_path = str(tmp_path / "manifest.json")
+    store = RecordingDocumentStore()
+
+    ingester = IncrementalIngester(store, manifest_path, chunker=TextChunker(chunk_size=16, overlap=4))
+    stats = await ingester.sync(str(docs_dir))
+    ingester.save_manifest()
+    assert (stats["new"], stats["unchanged"]) == (3, 0)
+
+    # 修改 a，仅更新 b 的 mtime，删除 c
+    (docs_dir / "a.md").write_text("a 的新内容，更长一些。", encoding="utf-8")
+    os.utime(docs_dir / "b.md", (0, 0))
+    (docs_dir / "c.md").unlink()
+
+    ingester = IncrementalIngester(store, manifest_path, chunker=TextChunker(chunk_size=16, overlap=4))
+    stats = await ingester.sync(str(docs_dir))
+
+    assert (stats["new"], stats["changed"], stats["unchanged"], stats["removed"]) == (0, 1, 1, 1)
+    assert sorted(doc.content for doc in store.documents) == ["a 的新内容，更长一些。", "b 的内容。"]
+
+@pytest.mark.asyncio
+async def test_incremental_ingester_keeps_source_over_user_metadata(tmp_path):
+    """测试导入时的 metadata 不会覆盖 source，修改后的文件不会留下重复的旧文档块"""
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    (docs_dir / "a.md").write_text("a 的内容。", encoding="utf-8")
+    manifest_path = str(tmp_path / "manifest.json")
+    store = RecordingDocumentStore()
+
+    ingester = IncrementalIngester(store, manifest_path, metadata={"source": "手册", "type": "manual"})
+    await ingester.sync(str(docs_dir))
+    ingester.save_manifest()
+    assert store.documents[0].metadata["source"] == str(docs_dir / "a.md")
+    assert store.documents[0].metadata["type"] == "manual"
+
+    (docs_dir / "a.md").write_text("a 的新内容。", encoding="utf-8")
+    ingester = IncrementalIngester(store, manifest_path, metadata={"source": "手册"})
+    await ingester.sync(str(docs_dir))
+    assert [doc.content for doc in store.documents] == ["a 的新内容。"]
+
+@pytest.mark.asyncio
+async def test_incremental_ingester_non_recursive_skips_subdirectories(tmp_path):
+    """测试非递归同步只导入目录下的文件，不处理也不删除子目录中的文件"""
+    (tmp_path / "root.md").write_text("根目录文档。", encoding="utf-8")
+    (tmp_path / "radar").mkdir()
+    (tmp_path / "radar" / "a.md").write_text("雷达文档。", encoding="utf-8")
+    store = RecordingDocumentStore()
+    ingester = IncrementalIngester(store, str(tmp_path / "manifest.json"))
+    ingester.files[str(tmp_path / "radar" / "old.md")] = {"mtime": 0, "size": 0, "sha256": "", "chunks": 1}
+
+    stats = await ingester.sync(str(tmp_path), recursive=False)
+
+    assert (stats["new"], stats["removed"]) == (1, 0)
+    assert [doc.content for doc in store.documents] == ["根目录文档。"]
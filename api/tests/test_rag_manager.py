@@ -0,0 +1,46 @@
+import pytest
+from typing import Any, Dict, List, Optional
+from src.core.llm_manager import LLMManager
+from src.core.providers.base_provider import BaseLLMProvider
+from src.core.providers.router import ProviderRouter
+
+class EchoProvider(BaseLLMProvider):
+    """模拟 provider：返回固定回答"""
+    async def generate(self, prompt: str, context: Optional[Dict[str, Any]] = None, **kwargs: Any) -> str:
+        return "回答"
+
+    async def chat(self, messages, context=None, **kwargs: Any) -> str:
+        return "回答"
+
+    async def list_models(self) -> List[str]:
+        return ["deepseek-r1"]
+
+@pytest.mark.asyncio
+async def test_context_budget_follows_routed_model(make_store, make_documents):
+    """测试未指定模型时按路由到的 provider 的默认模型计算检索上下文预算"""
+    manager = LLMManager()
+    default_store = manager.document_store
+    manager.document_store = make_store()
+    manager.rag_manager.document_store = manager.document_store
+    await manager.document_store.add_documents(make_documents(3))
+    manager.providers = {"ollama": EchoProvider()}
+    manager.router = ProviderRouter(manager.providers, models={"ollama": ["deepseek-r1", "llama3"]})
+    manager.response_cache = None
+    budgets = []
+    context_budget = manager.rag_manager.context_budget
+
+    def spy(template_name, variables, model=None):
+        budget = context_budget(template_name, variables, model)
+        budgets.append((model, budget))
+        return budget
+
+    manager.rag_manager.context_budget = spy
+    try:
+        assert "".join([chunk async for chunk in manager.stream_query("滤波器设计", "s1")]) == "回答"
+        await manager.process_query("滤波器设计", "s1")
+        assert [model for model, _ in budgets] == ["deepseek-r1", "deepseek-r1"]
+        # deepseek-r1 的上下文长度为 8192，大于默认的 4096
+        assert budgets[0][1] > manager.rag_manager.default_context_length
+    finally:
+        default_store.close()
+        manager.close()
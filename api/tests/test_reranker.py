@@ -0,0 +1,36 @@
+import pytest
+from src.core.rag import reranker
+from src.core.rag.document_store import Document
+
+@pytest.mark.asyncio
+async def test_cross_encoder_rerank_uses_score_cache(monkeypatch):
+    """测试交叉编码器按得分重排并截取 top_k，重复查询命中得分缓存"""
+    calls = []
+
+    class FakeCrossEncoder:
+        def __init__(self, *args, **kwargs):
+            pass
+
+        def predict(self, pairs, **kwargs):
+            calls.append(len(pairs))
+            return [float(content.count("相关")) for _, content in pairs]
+
+    monkeypatch.setattr(reranker, "CrossEncoder", FakeCrossEncoder)
+    scorer = reranker.CrossEncoderReranker(model_name="fake-cross-encoder")
+    docs = [
+        Document(content="无关", metadata={"index": 0}),
+        Document(content="相关相关相关", metadata={"index": 1}),
+        Document(content="相关", metadata={"index": 2}),
+        Document(content="相关相关", metadata={"index": 3})
+    ]
+    try:
+        results = await scorer.rerank("查询", docs, top_k=2)
+        assert [doc.metadata["index"] for doc in results] == [1, 3]
+        assert calls == [4]
+
+        results = await scorer.rerank("查询", docs[1:], top_k=3)
+        assert [doc.metadata["index"] for doc in results] == [1, 3, 2]
+        assert calls == [4]
+        assert scorer.stats()["pairs_scored"] == 4
+    finally:
+        scorer.close()
@@ -0,0 +1,60 @@
+import pytest
+from types import SimpleNamespace
+from src.core.llm_manager import LLMManager
+from src.core.rag.semantic_cache import SemanticResponseCache
+
+@pytest.mark.asyncio
+async def test_semantic_response_cache_invalidates_on_document_change(make_store, make_documents):
+    """测试语义缓存命中相似查询，文档增删后失效，超过容量时淘汰最久未用的回答"""
+    store = make_store()
+    await store.add_documents(make_documents(3))
+    cache = SemanticResponseCache(dimension=store.dimension, threshold=0.99, max_size=2)
+    embedding = await store.embed_query("滤波器设计")
+
+    cache.put(embedding, "general", store.generation, "回答", {"intent": {}})
+    entry, similarity = cache.get(embedding * 2, "general", store.generation)
+    assert entry.response == "回答" and similarity > 0.99
+    assert cache.get(embedding, "other", store.generation) is None
+    assert cache.get(await store.embed_query("采样定理"), "general", store.generation) is None
+
+    await store.delete_documents({"index": 0})
+    assert cache.get(embedding, "general", store.generation) is None
+    assert cache.stats()["size"] == 0
+
+    for text in ("问题一", "问题二", "问题三"):
+        cache.put(await store.embed_query(text), "general", store.generation, text)
+    assert cache.get(await store.embed_query("问题一"), "general", store.generation) is None
+    assert cache.get(await store.embed_query("问题三"), "general", store.generation)[0].response == "问题三"
+    assert cache.stats()["evictions"] == 1
+
+@pytest.mark.asyncio
+async def test_process_query_scopes_semantic_cache_by_context(make_store, make_documents):
+    """测试相同问题只在上下文相同时命中语义缓存"""
+    manager = LLMManager()
+    default_store = manager.document_store
+    manager.document_store = make_store()
+    await manager.document_store.add_documents(make_documents(3))
+    manager.response_cache = SemanticResponseCache(dimension=manager.document_store.dimension, threshold=0.99)
+    answers = []
+
+    async def analyze_intent(query, context):
+        return SimpleNamespace(dict=lambda: {"query": query})
+
+    async def answer(query, session_id, domain, search_domains, model):
+        answers.append(query)
+        return f"第{len(answers)}次回答", []
+
+    manager.intent_analyzer.analyze_intent = analyze_intent
+    manager.rag_manager.answer = answer
+    try:
+        first = await manager.process_query("滤波器设计", "s1", context={"unit": "Hz"})
+        assert "cached" not in first
+        cached = await manager.process_query("滤波器设计", "s1", context={"unit": "Hz"})
+        assert cached["cached"] and cached["response"] == first["response"]
+
+        other = await manager.process_query("滤波器设计", "s1", context={"unit": "kHz"})
+        assert "cached" not in other
+        assert other["response"] == "第2次回答"
+    finally:
+        default_store.close()
+        manager.close()
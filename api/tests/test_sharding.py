@@ -0,0 +1,77 @@
+import pytest
+from src.core.rag.document_store import Document
+from src.core.rag.ingestion import IncrementalIngester
+from src.core.rag.snapshot import snapshot_exists
+
+@pytest.mark.asyncio
+async def test_sharded_store_routes_by_domain_and_fans_out(make_sharded_store, make_documents, tmp_path):
+    """测试按领域路由到分片，多领域并行检索后合并结果"""
+    store = make_sharded_store(str(tmp_path))
+    await store.add_documents(make_documents(3, source="radar"), domain="radar")
+    await store.add_documents([
+        Document(content="文档内容 7", metadata={"source": "sonar", "domain": "sonar", "index": 7})
+    ])
+
+    assert [doc.metadata["source"] for doc in await store.search("文档内容 1", domains="radar")] == ["radar"]
+    assert await store.search("文档内容 7", domains="radar") == []
+    results = await store.search("文档内容 7", top_k=2, domains=["radar", "sonar"])
+    assert results[0].metadata["index"] == 7
+    # 所有分片共享同一个嵌入模型
+    assert all(shard.embedding_model is store.embedder.embedding_model for shard in store.shards.values())
+
+    await store.delete_documents({"domain": "radar"})
+    assert await store.search("文档内容 1", domains="radar") == []
+
+@pytest.mark.asyncio
+async def test_sharded_store_evicts_and_reloads_shards(make_sharded_store, make_documents, tmp_path):
+    """测试超出上限的分片被保存并卸载，再次访问时从快照加载"""
+    store = make_sharded_store(str(tmp_path), max_loaded_shards=1)
+    await store.add_documents(make_documents(2, source="a"), domain="a")
+    await store.add_documents(make_documents(2, source="b"), domain="b")
+
+    assert list(store.shards) == ["b"]
+    assert store.known_domains() == ["a", "b"]
+    results = await store.search("文档内容 1", domains="a")
+    assert results[0].metadata["source"] == "a"
+    assert (store.loads, store.evictions) == (3, 2)
+
+@pytest.mark.asyncio
+async def test_sharded_store_ignores_unknown_domains_on_read(make_sharded_store, make_documents, tmp_path):
+    """测试检索和删除不会为未知或无效的领域创建分片，也不会挤出已加载的分片"""
+    store = make_sharded_store(str(tmp_path), max_loaded_shards=1)
+    await store.add_documents(make_documents(2, source="radar"), domain="radar")
+
+    assert await store.search("文档内容 1", domains=["typo", "../etc"]) == []
+    assert await store.search("文档内容 1", filter={"domain": "missing"}) == []
+    await store.delete_documents({"index": 1}, domains="typo")
+    assert list(store.shards) == ["radar"]
+    assert (store.loads, store.evictions) == (1, 0)
+    assert not (tmp_path / "typo").exists()
+    results = await store.search("文档内容 1", domains=["radar", "typo"])
+    assert results[0].metadata["source"] == "radar"
+
+@pytest.mark.asyncio
+async def test_domain_store_ingests_through_sharded_store(make_sharded_store, tmp_path):
+    """测试通过领域视图增量导入时更新领域版本号，并保存修改过的分片"""
+    store = make_sharded_store(str(tmp_path / "shards"))
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    (docs_dir / "a.md").write_text("雷达 的内容。", encoding="utf-8")
+    manifest_path = str(tmp_path / "radar.json")
+
+    ingester = IncrementalIngester(store.domain_store("radar"), manifest_path)
+    await ingester.sync(str(docs_dir))
+    ingester.save_manifest()
+    assert store.generation("radar") == 1
+    assert store.has_domain("radar")
+    store.domain_store("radar").save_snapshot()
+    assert snapshot_exists(store.shard_dir("radar"))
+
+    (docs_dir / "a.md").write_text("雷达 的新内容。", encoding="utf-8")
+    await IncrementalIngester(store.domain_store("radar"), manifest_path).sync(str(docs_dir))
+    assert store.generation("radar") == 3
+    results = await store.search("雷达 的新内容。", top_k=5, domains="radar")
+    assert [doc.content for doc in results] == ["雷达 的新内容。"]
+
+    with pytest.raises(ValueError):
+        store.domain_store("../etc")
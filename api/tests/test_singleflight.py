@@ -0,0 +1,119 @@
+import asyncio
+import pytest
+from typing import Any, Dict, List, Optional
+from src.core.llm_manager import LLMManager
+from src.core.providers.admission import AdmissionController
+from src.core.providers.base_provider import BaseLLMProvider
+from src.core.providers.router import ProviderRouter
+from src.core.singleflight import SingleFlight
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_result_and_error():
+    """测试并发的相同请求只调用一次上游，所有等待者得到相同的结果或异常"""
+    flight = SingleFlight()
+    calls = []
+
+    async def call(value):
+        calls.append(value)
+        await asyncio.sleep(0.01)
+        if value == "error":
+            raise ValueError("上游错误")
+        return value
+
+    results = await asyncio.gather(*[flight.do("k", lambda: call("回答")) for _ in range(10)])
+    assert results == ["回答"] * 10
+    errors = await asyncio.gather(*[flight.do("e", lambda: call("error")) for _ in range(5)], return_exceptions=True)
+    assert all(isinstance(error, ValueError) for error in errors)
+    assert calls == ["回答", "error"]
+    assert flight.stats()["shared"] == 13 and flight.stats()["in_flight"] == 0
+
+    # 上一次调用结束后，相同的请求重新调用上游
+    assert await flight.do("k", lambda: call("新回答")) == "新回答"
+
+@pytest.mark.asyncio
+async def test_stream_subscribers_share_one_upstream_stream():
+    """测试流式订阅者共享一次上游流，后加入的订阅者先收到已产生的片段"""
+    flight = SingleFlight()
+    started = []
+
+    async def upstream():
+        started.append(1)
+        for token in ("低通", "滤波", "器"):
+            await asyncio.sleep(0.005)
+            yield token
+
+    async def consume(delay):
+        await asyncio.sleep(delay)
+        return "".join([chunk async for chunk in flight.stream("s", upstream)])
+
+    results = await asyncio.gather(consume(0), consume(0.008), consume(0.008))
+    assert results == ["低通滤波器"] * 3
+    assert started == [1]
+
+    async def failing():
+        yield "部分"
+        raise RuntimeError("连接中断")
+
+    with pytest.raises(RuntimeError):
+        [chunk async for chunk in flight.stream("f", failing)]
+
+class EndlessProvider(BaseLLMProvider):
+    """模拟 provider：持续产生片段，记录产生的片段数和流是否被关闭"""
+    def __init__(self):
+        self.produced = 0
+        self.closed = False
+
+    async def generate(self, prompt: str, context: Optional[Dict[str, Any]] = None, **kwargs: Any) -> str:
+        return "回答"
+
+    async def chat(self, messages, context=None, **kwargs: Any) -> str:
+        return "回答"
+
+    async def stream_chat(self, messages, context=None, **kwargs: Any):
+        try:
+            while True:
+                self.produced += 1
+                yield f"片段{self.produced}"
+                await asyncio.sleep(0.001)
+        finally:
+            self.closed = True
+
+    async def list_models(self) -> List[str]:
+        return ["ollama"]
+
+@pytest.fixture
+def streaming_manager():
+    manager = LLMManager()
+    provider = EndlessProvider()
+    manager.providers = {"ollama": provider}
+    manager.router = ProviderRouter(manager.providers)
+    manager.admission = AdmissionController({"ollama": {"max_in_flight": 1}})
+    manager.singleflight = SingleFlight()
+    yield manager, provider
+    manager.close()
+
+@pytest.mark.asyncio
+async def test_shared_stream_is_cancelled_when_last_subscriber_leaves(streaming_manager):
+    """测试共享流在最后一个订阅者离开后取消，上游流被关闭且释放准入名额"""
+    manager, provider = streaming_manager
+    messages = [{"role": "user", "content": "你好"}]
+    first = manager.stream_chat(messages, provider="ollama")
+    second = manager.stream_chat(messages, provider="ollama")
+    assert await first.__anext__() == "片段1"
+    assert await second.__anext__() == "片段1"
+    assert manager.singleflight.stats()["shared"] == 1
+
+    # 还有订阅者时上游流继续
+    await first.aclose()
+    await asyncio.sleep(0.01)
+    assert not provider.closed
+    assert (await second.__anext__()).startswith("片段")
+
+    await second.aclose()
+    await asyncio.sleep(0.01)
+    produced = provider.produced
+    await asyncio.sleep(0.01)
+    assert provider.closed
+    assert provider.produced == produced
+    assert manager.admission.stats()["ollama"]["in_flight"] == 0
+    assert manager.singleflight.stats()["in_flight"] == 0